@@ -0,0 +1,123 @@
+import logging
+import os
+import threading
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_IDLE = 4  # idle instances kept per agent type
+
+
+def _default_factories() -> Dict[str, Callable[[], Any]]:
+    # Imported here so autogen is only loaded when an agent is first leased
+    from src.agents.ba_agent import create_ba_agent
+    from src.agents.executor_agent import create_executor_agent
+    from src.agents.jira_agent import create_jira_agent
+    from src.agents.user_agent import create_user_agent
+
+    return {"ba": create_ba_agent, "executor": create_executor_agent, "user": create_user_agent,
+            "jira": create_jira_agent}
+
+
+def reset_agent(agent: Any) -> None:
+    """Clear an agent's chat history and reply counters so its next lease starts clean."""
+    reset = getattr(agent, "reset", None)
+    if callable(reset):
+        reset()
+
+
+class AgentPool:
+    """
+    Leases agent instances to one workflow at a time.
+
+    An instance is never shared by two running workflows: a lease takes an
+    idle instance, or builds one with the agent's create_* factory, and
+    returns it reset when the workflow is done. Up to max_idle instances
+    per agent type are kept for reuse, so leasing is cheap once warm.
+    """
+
+    def __init__(self, factories: Optional[Dict[str, Callable[[], Any]]] = None, max_idle: Optional[int] = None):
+        self._factories = factories
+        self.max_idle = max_idle if max_idle is not None else int(os.getenv("AGENT_POOL_MAX_IDLE", str(DEFAULT_MAX_IDLE)))
+        self._idle: Dict[str, List[Any]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self.created: Counter = Counter()
+        self.leased: Counter = Counter()
+
+    @property
+    def factories(self) -> Dict[str, Callable[[], Any]]:
+        if self._factories is None:
+            self._factories = _default_factories()
+        return self._factories
+
+    def acquire(self, name: str) -> Any:
+        """Take an idle agent of the given type, or build a new one."""
+        if name not in self.factories:
+            raise KeyError(f"No agent factory registered for {name!r}")
+        with self._lock:
+            agent = self._idle[name].pop() if self._idle[name] else None
+            self.leased[name] += 1
+        if agent is None:
+            agent = self.factories[name]()
+            with self._lock:
+                self.created[name] += 1
+            logger.info(f"Agent pool: built a new {name} agent ({self.created[name]} in total)")
+        return agent
+
+    def release(self, name: str, agent: Any) -> None:
+        """Reset an agent and keep it for the next lease, unless the pool is full."""
+        try:
+            reset_agent(agent)
+        except Exception as e:
+            # An agent that cannot be reset is dropped rather than reused dirty
+            logger.warning(f"Agent pool: dropping {name} agent that failed to reset: {e}")
+            agent = None
+        with self._lock:
+            self.leased[name] -= 1
+            if agent is not None and len(self._idle[name]) < self.max_idle:
+                self._idle[name].append(agent)
+
+    @contextmanager
+    def lease(self, name: str) -> Iterator[Any]:
+        """Lease an agent for the duration of a with block."""
+        agent = self.acquire(name)
+        try:
+            yield agent
+        finally:
+            self.release(name, agent)
+
+    @contextmanager
+    def supervisor(self) -> Iterator[Any]:
+        """Lease a supervisor whose BA, executor, User and Jira agents belong to this workflow only."""
+        from src.agents.supervisor_agent import SupervisorAgent
+
+        with ExitStack() as stack:
+            yield SupervisorAgent(
+                ba_agent=stack.enter_context(self.lease("ba")),
+                # The executor keeps chat history and reply counters per sender, so it is leased too
+                executor_agent=stack.enter_context(self.lease("executor")),
+                user_agent=stack.enter_context(self.lease("user")),
+                jira_agent=stack.enter_context(self.lease("jira")),
+            )
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Per agent type: instances built, currently leased and idle."""
+        with self._lock:
+            return {name: {"created": self.created[name], "leased": self.leased[name], "idle": len(self._idle[name])}
+                    for name in sorted(set(self.created) | set(self._idle))}
+
+
+_pool: Optional[AgentPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_agent_pool() -> AgentPool:
+    """Get the process-wide agent pool."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = AgentPool()
+    return _pool
@@ -1,20 +1,61 @@
 import logging
 import requests
-from atlassian import Jira
 import os
-from dotenv import load_dotenv
-from typing import Dict
+from typing import Any, Callable, Dict, Iterator, List, Optional
 import json
+from concurrent.futures import ThreadPoolExecutor
+from .env_config import load_env
+from .http_session import post_json
+from .jira_client import get_jira_client, get_jira_settings
 
 logger = logging.getLogger(__name__)
 
-# Load .env file for environment variables
-load_dotenv()
+_api_base_url: Optional[str] = None
 
-# Get API base URL from environment variable
-API_BASE_URL = os.getenv("TOOL_APP_URL")
-if not API_BASE_URL:
-    raise ValueError("TOOL_APP_URL environment variable is required")
+def get_api_base_url() -> str:
+    """
+    Get the tool service base URL, resolving it on first use.
+
+    Loads the .env file and reads TOOL_APP_URL the first time it is called,
+    so importing this module stays cheap and does not require configuration.
+
+    Raises:
+        ValueError: If TOOL_APP_URL is not set.
+    """
+    global _api_base_url
+    if _api_base_url is None:
+        # Load .env file for environment variables
+        load_env()
+        base_url = os.getenv("TOOL_APP_URL")
+        if not base_url:
+            raise ValueError("TOOL_APP_URL environment variable is required")
+        _api_base_url = base_url
+    return _api_base_url
+
+# Paths sent per bulk request, and parallel single-file calls used when the
+# tool service has no bulk endpoint.
+BULK_CHUNK_SIZE = int(os.getenv("TOOL_BULK_CHUNK_SIZE", "50"))
+BULK_MAX_WORKERS = int(os.getenv("TOOL_BULK_MAX_WORKERS", "8"))
+
+# Remembers, per endpoint, whether the tool service supports bulk calls so we
+# only probe once per process.
+_bulk_supported: Dict[str, bool] = {}
+
+# Whether the tool service has the /append-file/ endpoint; None until the
+# first append probes it.
+_append_supported: Optional[bool] = None
+
+# Characters requested per ranged read when streaming a file.
+READ_CHUNK_SIZE = int(os.getenv("TOOL_READ_CHUNK_SIZE", str(64 * 1024)))
+
+def _parse_read_response(file_path: str, response_data: Dict) -> str:
+    """Extract the file content from a /read-file response body."""
+    # The API returns a JSON object, we need to parse it and get the 'content' field
+    logger.debug(f"Full API Response JSON for {file_path}: {response_data}")
+    content = response_data.get("content")
+    if content is None:
+        raise Exception("API response did not contain a 'content' field.")
+    return content
 
 def read_file_from_api(file_path: str) -> str:
     """
@@ -29,27 +70,63 @@ def read_file_from_api(file_path: str) -> str:
     Raises:
         Exception: For API errors.
     """
-    content = None
+    return read_file_with_meta_from_api(file_path)["content"]
+
+def _response_validator(response, response_data: Dict) -> Optional[str]:
+    """Pick the validator (ETag or mtime) the tool service returned, if any."""
+    etag = response_data.get("etag") or response.headers.get("ETag")
+    if isinstance(etag, str) and etag:
+        return etag
+    mtime = response_data.get("mtime")
+    return f"mtime:{mtime}" if mtime is not None else None
+
+def read_file_with_meta_from_api(file_path: str, if_none_match: Optional[str] = None) -> Dict:
+    """
+    Calls the API to read a file, with conditional-read support.
+
+    Args:
+        file_path (str): Path to the file to read.
+        if_none_match (Optional[str]): Validator (ETag or mtime) of a cached
+            copy. If the file is unchanged, the content is not sent again.
+
+    Returns:
+        Dict: {"content": str or None, "etag": str or None, "not_modified": bool}.
+        "content" is None when "not_modified" is True.
+
+    Raises:
+        Exception: For API errors.
+    """
     try:
-        url = f"{API_BASE_URL}/read-file"
+        url = f"{get_api_base_url()}/read-file"
         logger.info(f"Calling API (POST) to read file: {url} for path: {file_path}")
         # The API expects a POST request with the file path in the body
-        response = requests.post(url, json={"file_path": file_path})
+        payload = {"file_path": file_path}
+        if if_none_match:
+            payload["if_none_match"] = if_none_match
+        response = post_json(url, payload)
         response.raise_for_status()
-        
-        # The API returns a JSON object, we need to parse it and get the 'content' field
+
+        if response.status_code == 304:
+            logger.info(f"File unchanged since last read: {file_path}")
+            return {"content": None, "etag": if_none_match, "not_modified": True}
+
         response_data = response.json()
-        logger.debug(f"Full API Response JSON: {response_data}")
-        
-        content = response_data.get("content")
-        if content is None:
-            raise Exception("API response did not contain a 'content' field.")
+        if if_none_match and response_data.get("not_modified"):
+            logger.info(f"File unchanged since last read: {file_path}")
+            return {"content": None, "etag": if_none_match, "not_modified": True}
 
+        content = _parse_read_response(file_path, response_data)
         logger.info(f"Successfully read file using API: {file_path}")
-        return content
+        return {
+            "content": content,
+            "etag": _response_validator(response, response_data),
+            "not_modified": False,
+        }
     except requests.exceptions.HTTPError as http_err:
+        if http_err.response is not None and http_err.response.status_code == 404:
+            raise FileNotFoundError(f"File not found by the tool service: {file_path}") from http_err
         error_details = f"HTTP error occurred: {http_err}"
-        if http_err.response:
+        if http_err.response is not None:
             error_details += f" - Response Body: {http_err.response.text}"
         logger.error(f"API error reading file {file_path}: {error_details}")
         raise Exception(f"API error reading file {file_path}: {error_details}") from http_err
@@ -75,16 +152,16 @@ def write_file_to_api(file_path: str, content: str) -> bool:
         Exception: For API errors.
     """
     try:
-        url = f"{API_BASE_URL}/write-file/"
+        url = f"{get_api_base_url()}/write-file/"
         logger.info(f"Calling API to write to file: {url} for path: {file_path}")
-        response = requests.post(url, json={"file_path": file_path, "content": content})
+        response = post_json(url, {"file_path": file_path, "content": content})
         response.raise_for_status()
         
         logger.info(f"Successfully wrote to file using API: {file_path}")
         return True
     except requests.exceptions.HTTPError as http_err:
         error_details = f"HTTP error occurred: {http_err}"
-        if http_err.response:
+        if http_err.response is not None:
             error_details += f" - Response Body: {http_err.response.text}"
         logger.error(f"API error writing to file {file_path}: {error_details}")
         raise Exception(f"API error writing to file {file_path}: {error_details}") from http_err
@@ -92,35 +169,300 @@ def write_file_to_api(file_path: str, content: str) -> bool:
         logger.error(f"API error writing to file {file_path}: {req_err}")
         raise Exception(f"API error writing to file {file_path}: {req_err}") from req_err
 
+def append_supported() -> Optional[bool]:
+    """Whether the tool service can append to files natively, or None if not yet known."""
+    return _append_supported
+
+def append_file_to_api(file_path: str, content: str) -> Optional[bool]:
+    """
+    Calls the API to append content to a file, creating it if needed.
+
+    Args:
+        file_path (str): Path to the file to append to.
+        content (str): Content to append.
+
+    Returns:
+        Optional[bool]: True if successful, or None if the tool service has
+        no append endpoint (remembered for the rest of the process).
+
+    Raises:
+        Exception: For API errors.
+    """
+    global _append_supported
+    if _append_supported is False:
+        return None
+    try:
+        url = f"{get_api_base_url()}/append-file/"
+        logger.info(f"Calling API to append to file: {url} for path: {file_path}")
+        response = post_json(url, {"file_path": file_path, "content": content})
+        if response.status_code in (404, 405, 501):
+            logger.info("Tool service has no append endpoint, appends will rewrite the file")
+            _append_supported = False
+            return None
+        response.raise_for_status()
+        _append_supported = True
+        return True
+    except requests.exceptions.RequestException as req_err:
+        logger.error(f"API error appending to file {file_path}: {req_err}")
+        raise Exception(f"API error appending to file {file_path}: {req_err}") from req_err
+
+def list_files_from_api(directory: str) -> Dict[str, str]:
+    """
+    Calls the API to list the files in a directory.
+
+    Args:
+        directory (str): Directory to list, not recursively.
+
+    Returns:
+        Dict[str, str]: Version validator (ETag) of each file, keyed by path.
+
+    Raises:
+        Exception: For API errors, including a tool service without the
+            /list-files/ endpoint.
+    """
+    try:
+        url = f"{get_api_base_url()}/list-files/"
+        response = post_json(url, {"directory": directory})
+        response.raise_for_status()
+        files = response.json().get("files")
+        if not isinstance(files, list):
+            raise Exception("API response did not contain a 'files' list.")
+        return {item["path"]: str(item.get("etag") or "") for item in files}
+    except (requests.exceptions.RequestException, ValueError) as req_err:
+        logger.error(f"API error listing directory {directory}: {req_err}")
+        raise Exception(f"API error listing directory {directory}: {req_err}") from req_err
+
+def read_file_range_from_api(file_path: str, offset: int = 0, length: Optional[int] = None) -> Dict:
+    """
+    Calls the API to read part of a file.
+
+    Args:
+        file_path (str): Path to the file to read.
+        offset (int): Character offset to start reading at.
+        length (Optional[int]): Max characters to read. Reads to the end if None.
+
+    Returns:
+        Dict: {"content": str, "eof": bool, "ranged": bool}. "ranged" is False
+        when the tool service ignored the range and returned the whole file,
+        in which case "content" is the full file.
+
+    Raises:
+        Exception: For API errors.
+    """
+    try:
+        url = f"{get_api_base_url()}/read-file"
+        payload = {"file_path": file_path, "offset": offset}
+        if length is not None:
+            payload["length"] = length
+        logger.debug(f"Calling API (POST) to read range of {file_path}: offset={offset} length={length}")
+        response = post_json(url, payload)
+        response.raise_for_status()
+        response_data = response.json()
+        content = _parse_read_response(file_path, response_data)
+        if "eof" not in response_data:
+            return {"content": content, "eof": True, "ranged": False}
+        return {"content": content, "eof": bool(response_data["eof"]), "ranged": True}
+    except requests.exceptions.RequestException as req_err:
+        logger.error(f"API request error reading range of {file_path}: {req_err}")
+        raise Exception(f"API request error reading file {file_path}: {req_err}") from req_err
+    except (json.JSONDecodeError, KeyError) as e:
+        logger.error(f"Error parsing API response for {file_path}: {str(e)}")
+        raise Exception(f"Error parsing API response for {file_path}: {str(e)}") from e
+
+def iter_file_chunks_from_api(file_path: str, chunk_size: int = READ_CHUNK_SIZE,
+                              offset: int = 0, length: Optional[int] = None) -> Iterator[str]:
+    """
+    Stream a file from the API as a sequence of chunks.
+
+    Each chunk is fetched with its own ranged request, so only one chunk is
+    held in memory at a time. If the tool service does not support ranged
+    reads, the whole file is fetched once and yielded in slices.
+
+    Args:
+        file_path (str): Path to the file to read.
+        chunk_size (int): Max characters per chunk.
+        offset (int): Character offset to start reading at.
+        length (Optional[int]): Max characters to read in total. Reads to the end if None.
+
+    Yields:
+        str: Consecutive chunks of the file.
+    """
+    position = offset
+    end = offset + length if length is not None else None
+    while end is None or position < end:
+        size = chunk_size if end is None else min(chunk_size, end - position)
+        part = read_file_range_from_api(file_path, position, size)
+        content = part["content"]
+
+        if not part["ranged"]:
+            logger.info(f"Tool service does not support ranged reads, slicing {file_path} locally")
+            content = content[position:end]
+            for i in range(0, len(content), chunk_size):
+                yield content[i:i + chunk_size]
+            return
+
+        if content:
+            yield content
+            position += len(content)
+        if part["eof"] or not content:
+            return
+
+def _post_bulk(endpoint: str, payload: Dict) -> Optional[List[Dict]]:
+    """
+    Send one bulk request to the tool service.
+
+    Returns:
+        Optional[List[Dict]]: Per-file results, or None if the service does not
+        support the bulk endpoint.
+    """
+    if _bulk_supported.get(endpoint) is False:
+        return None
+
+    url = f"{get_api_base_url()}{endpoint}"
+    response = post_json(url, payload)
+    if response.status_code in (404, 405, 501):
+        logger.info(f"Tool service has no bulk endpoint {endpoint}, falling back to per-file calls")
+        _bulk_supported[endpoint] = False
+        return None
+    response.raise_for_status()
+    _bulk_supported[endpoint] = True
+
+    results = response.json().get("results")
+    if not isinstance(results, list):
+        raise Exception(f"Bulk API response from {endpoint} did not contain a 'results' list.")
+    return results
+
+
+def _chunks(items: List, size: int) -> List[List]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _fan_out(func, items: List, max_workers: int) -> List[Dict]:
+    """Run a single-file call for each item with bounded concurrency."""
+    def run(item):
+        try:
+            return func(item)
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as executor:
+        return list(executor.map(run, items))
+
+
+def read_files_from_api(file_paths: List[str], max_workers: int = BULK_MAX_WORKERS) -> Dict[str, Dict]:
+    """
+    Calls the API to read several files, batching paths into bulk requests.
+
+    Falls back to concurrent single-file reads if the tool service does not
+    support bulk reads.
+
+    Args:
+        file_paths (List[str]): Paths of the files to read.
+        max_workers (int): Max concurrent requests for the fallback path.
+
+    Returns:
+        Dict[str, Dict]: Per-file result keyed by path, either
+        {"status": "success", "content": ...} or {"status": "error", "message": ...}.
+    """
+    paths = list(dict.fromkeys(file_paths))
+    results: Dict[str, Dict] = {}
+    logger.info(f"Reading {len(paths)} files through the tool service")
+
+    def read_one(path: str) -> Dict:
+        return {"status": "success", "content": read_file_from_api(path)}
+
+    for chunk in _chunks(paths, BULK_CHUNK_SIZE):
+        try:
+            bulk_results = _post_bulk("/read-files", {"file_paths": chunk})
+        except Exception as e:
+            logger.warning(f"Bulk read failed, retrying chunk per file: {e}")
+            bulk_results = None
+
+        if bulk_results is None:
+            for path, result in zip(chunk, _fan_out(read_one, chunk, max_workers)):
+                results[path] = result
+            continue
+
+        by_path = {item.get("file_path"): item for item in bulk_results}
+        for path in chunk:
+            item = by_path.get(path)
+            if item is None:
+                results[path] = {"status": "error", "message": "No result returned for file"}
+            elif item.get("error") or item.get("content") is None:
+                results[path] = {"status": "error", "message": item.get("error") or "No content returned for file"}
+            else:
+                results[path] = {"status": "success", "content": item["content"]}
+
+    return results
+
+
+def write_files_to_api(files: Dict[str, str], max_workers: int = BULK_MAX_WORKERS) -> Dict[str, Dict]:
+    """
+    Calls the API to write several files, batching them into bulk requests.
+
+    Falls back to concurrent single-file writes if the tool service does not
+    support bulk writes.
+
+    Args:
+        files (Dict[str, str]): Mapping of file path to content.
+        max_workers (int): Max concurrent requests for the fallback path.
+
+    Returns:
+        Dict[str, Dict]: Per-file result keyed by path, either
+        {"status": "success"} or {"status": "error", "message": ...}.
+    """
+    paths = list(files)
+    results: Dict[str, Dict] = {}
+    logger.info(f"Writing {len(paths)} files through the tool service")
+
+    def write_one(path: str) -> Dict:
+        write_file_to_api(path, files[path])
+        return {"status": "success"}
+
+    for chunk in _chunks(paths, BULK_CHUNK_SIZE):
+        try:
+            bulk_results = _post_bulk(
+                "/write-files/",
+                {"files": [{"file_path": path, "content": files[path]} for path in chunk]},
+            )
+        except Exception as e:
+            logger.warning(f"Bulk write failed, retrying chunk per file: {e}")
+            bulk_results = None
+
+        if bulk_results is None:
+            for path, result in zip(chunk, _fan_out(write_one, chunk, max_workers)):
+                results[path] = result
+            continue
+
+        by_path = {item.get("file_path"): item for item in bulk_results}
+        for path in chunk:
+            item = by_path.get(path)
+            if item is None:
+                results[path] = {"status": "error", "message": "No result returned for file"}
+            elif item.get("error"):
+                results[path] = {"status": "error", "message": item["error"]}
+            else:
+                results[path] = {"status": "success"}
+
+    return results
+
+def _story_fields(input_dict: Dict, project_key: str) -> Dict:
+    """Build the Jira issue fields for a story."""
+    return {
+        "project": {"key": project_key},
+        "summary": input_dict.get("summary", "New User Story"),
+        "description": input_dict.get("description", ""),
+        "issuetype": {"name": "Story"}
+    }
+
 def create_jira_story_in_api(input_dict: Dict) -> str:
     """Create a Jira story with specified summary and description via API."""
     logger.info(f"API Connector: Received input for Jira: {input_dict}")
     try:
-        jira_url = os.getenv("JIRA_INSTANCE_URL")
-        jira_username = os.getenv("JIRA_USERNAME")
-        jira_api_token = os.getenv("JIRA_API_TOKEN")
-
-        if not all([jira_url, jira_username, jira_api_token]):
-            missing = [v for v, k in {"JIRA_INSTANCE_URL": jira_url, "JIRA_USERNAME": jira_username, "JIRA_API_TOKEN": jira_api_token}.items() if not k]
-            error_msg = f"Missing Jira environment variables: {', '.join(missing)}"
-            logger.error(error_msg)
-            raise ValueError(error_msg)
-
-        jira = Jira(
-            url=jira_url,
-            username=jira_username,
-            password=jira_api_token,
-            cloud=True
-        )
-        logger.info(f"Jira client initialized with URL {jira_url}")
-
-        project_key = os.getenv("JIRA_PROJECT_KEY", "SDLC")
-        fields = {
-            "project": {"key": project_key},
-            "summary": input_dict.get("summary", "New User Story"),
-            "description": input_dict.get("description", ""),
-            "issuetype": {"name": "Story"}
-        }
+        settings = get_jira_settings()
+        jira = get_jira_client(settings)
+
+        fields = _story_fields(input_dict, settings.project_key)
 
         logger.info(f"Creating Jira story with fields: {fields}")
         issue = jira.create_issue(fields=fields)
@@ -129,4 +471,144 @@ def create_jira_story_in_api(input_dict: Dict) -> str:
         return issue_key
     except Exception as e:
         logger.error(f"Error creating Jira story in API connector: {str(e)}")
-        raise Exception(f"Error creating Jira story in API connector: {str(e)}") 
\ No newline at end of file
+        raise Exception(f"Error creating Jira story in API connector: {str(e)}") from e
+
+def _bulk_issue_chunks(issue_updates: List[Dict], max_items: int, max_bytes: int) -> List[List[int]]:
+    """Split issue indexes into chunks within Jira's per-request count and size limits."""
+    chunks: List[List[int]] = []
+    current: List[int] = []
+    current_bytes = 0
+    for index, update in enumerate(issue_updates):
+        size = len(json.dumps(update).encode("utf-8"))
+        if current and (len(current) >= max_items or current_bytes + size > max_bytes):
+            chunks.append(current)
+            current, current_bytes = [], 0
+        current.append(index)
+        current_bytes += size
+    if current:
+        chunks.append(current)
+    return chunks
+
+def _bulk_element_error(error: Dict) -> str:
+    element_errors = error.get("elementErrors", {})
+    messages = list(element_errors.get("errorMessages", []))
+    messages += [f"{field}: {message}" for field, message in element_errors.get("errors", {}).items()]
+    return "; ".join(messages) or f"Jira rejected the story (status {error.get('status')})"
+
+def _bulk_rejected(error: Exception) -> bool:
+    """Whether a failed bulk request was refused outright, so Jira created none of its issues."""
+    while error is not None:
+        response = getattr(error, "response", None)
+        if response is not None and getattr(response, "status_code", None) is not None:
+            # 4xx other than timeouts and throttling means the request was not processed,
+            # which includes 404/405 from a Jira without the bulk endpoint
+            return 400 <= response.status_code < 500 and response.status_code not in (408, 429)
+        error = error.__cause__
+    return False
+
+def find_jira_story_in_api(summary: str) -> Optional[str]:
+    """
+    Look up an existing story in the configured project by exact summary.
+
+    Args:
+        summary (str): Story summary.
+
+    Returns:
+        Optional[str]: Key of the most recently created matching issue, or None.
+    """
+    settings = get_jira_settings()
+    jira = get_jira_client(settings)
+    phrase = summary.replace("\\", "\\\\").replace('"', '\\"')
+    jql = f'project = "{settings.project_key}" AND summary ~ "\\"{phrase}\\"" ORDER BY created DESC'
+    response = jira.jql(jql, limit=20, fields="summary") or {}
+    for issue in response.get("issues", []):
+        if issue.get("fields", {}).get("summary") == summary:
+            return issue.get("key")
+    return None
+
+def _run_request(throttle: Optional[Callable[[Callable[[], Any]], Any]], call: Callable[[], Any]) -> Any:
+    return throttle(call) if throttle is not None else call()
+
+def create_jira_stories_bulk_in_api(stories: List[Dict],
+                                    throttle: Optional[Callable[[Callable[[], Any]], Any]] = None) -> List[Dict]:
+    """
+    Create many Jira stories through Jira's bulk-create endpoint.
+
+    Stories are sent in chunks of at most JIRA_BULK_MAX_ISSUES issues and
+    JIRA_BULK_MAX_BYTES bytes. If Jira refuses a whole chunk (a 4xx such as
+    a validation error, or 404/405 when the endpoint is missing), nothing
+    was created and its stories are retried one at a time. If the outcome
+    of a chunk is unknown (timeout, connection error, 5xx), its stories are
+    never sent again: each is looked up by summary, and reported as
+    "unknown" if Jira has no matching issue yet, since its search index
+    can lag behind a create.
+
+    Args:
+        stories (List[Dict]): Stories with summary and description.
+        throttle (Optional[Callable]): Runs each Jira request, given as a
+            no-argument callable, e.g. under a rate limiter with retries.
+
+    Returns:
+        List[Dict]: One result per story in input order, either
+        {"status": "success", "key": ...}, {"status": "error", "message": ...}
+        or {"status": "unknown", "message": ...}.
+    """
+    if not stories:
+        return []
+
+    settings = get_jira_settings()
+    jira = get_jira_client(settings)
+    max_items = int(os.getenv("JIRA_BULK_MAX_ISSUES", "50"))
+    max_bytes = int(os.getenv("JIRA_BULK_MAX_BYTES", str(1024 * 1024)))
+
+    issue_updates = [{"fields": _story_fields(story, settings.project_key)} for story in stories]
+    results: List[Optional[Dict]] = [None] * len(stories)
+
+    for chunk in _bulk_issue_chunks(issue_updates, max_items, max_bytes):
+        logger.info(f"Creating {len(chunk)} Jira stories in bulk")
+        updates = [issue_updates[i] for i in chunk]
+        try:
+            response = _run_request(throttle, lambda: jira.create_issues(updates)) or {}
+        except Exception as e:
+            if _bulk_rejected(e):
+                logger.warning(f"Bulk Jira creation was rejected, falling back to per-story creation: {e}")
+                for i in chunk:
+                    try:
+                        key = _run_request(throttle, lambda story=stories[i]: create_jira_story_in_api(story))
+                        results[i] = {"status": "success", "key": key}
+                    except Exception as story_err:
+                        results[i] = {"status": "error", "message": str(story_err)}
+                continue
+
+            logger.error(f"Bulk Jira creation failed with an unknown outcome, looking stories up by summary: {e}")
+            for i in chunk:
+                summary = stories[i].get("summary", "New User Story")
+                try:
+                    key = _run_request(throttle, lambda: find_jira_story_in_api(summary))
+                except Exception as lookup_err:
+                    logger.error(f"Could not look up Jira story {summary!r}: {lookup_err}")
+                    key = None
+                if key:
+                    results[i] = {"status": "success", "key": key}
+                else:
+                    results[i] = {"status": "unknown",
+                                  "message": f"Bulk creation failed and no matching issue was found yet; not retried to avoid duplicates: {e}"}
+            continue
+
+        # Jira lists created issues in request order, skipping the failed
+        # elements, which are reported by their position in the chunk.
+        failed = {error.get("failedElementNumber"): error for error in response.get("errors", [])}
+        created = iter(response.get("issues", []))
+        for position, i in enumerate(chunk):
+            if position in failed:
+                results[i] = {"status": "error", "message": _bulk_element_error(failed[position])}
+                continue
+            issue = next(created, None)
+            if issue is None:
+                results[i] = {"status": "error", "message": "Jira did not return an issue for this story"}
+            else:
+                results[i] = {"status": "success", "key": issue.get("key")}
+
+    created_count = sum(1 for r in results if r["status"] == "success")
+    logger.info(f"Bulk Jira creation finished: {created_count}/{len(stories)} stories created")
+    return results
@@ -3,8 +3,15 @@ import os
 from pathlib import Path
 import json
 from datetime import datetime
-from src.orchestrator import initialize_supervisor, run_requirements_processing, run_jira_creation
-from src.tools.file_tools import write_file, read_file
+from src.orchestrator import submit_jira_creation, submit_requirements_processing
+from src.tools.file_tools import write_file, read_file, flush
+from src.tools.story_io import parse_stories, write_stories
+from src.tools.story_index import find_duplicate_stories
+from src.tools.approval_broker import APPROVED, REJECTED, get_approval_broker
+from src.tools.event_stream import EventView
+from src.tools.job_queue import FAILED, FINISHED, SUCCEEDED, get_job_queue
+from src.tools.llm_cache import get_completion_store
+from src.tools.workflow_store import FINAL_PHASES, get_workflow_store
 import logging
 import time
 
@@ -22,6 +29,13 @@ logger = logging.getLogger(__name__)
 # Project root
 project_root = str(Path(__file__).parent.parent)
 
+# Seconds between reruns while a workflow step's job is running
+UI_REFRESH_SECONDS = 0.3
+
+# Session state saved with each workflow checkpoint and restored on resume
+CHECKPOINT_KEYS = ("uploaded_file_path", "requirements_document", "stories_file_path", "job_id",
+                   "duplicate_stories", "stories_diff", "jira_success")
+
 def init_session_state():
     """Initialize Streamlit session state"""
     if "workflow_phase" not in st.session_state:
@@ -34,19 +48,155 @@ def init_session_state():
         st.session_state.stories_file_path = None
     if "current_stories" not in st.session_state:
         st.session_state.current_stories = None
+    if "duplicate_stories" not in st.session_state:
+        st.session_state.duplicate_stories = {}
+    if "job_id" not in st.session_state:
+        st.session_state.job_id = None
+
+def save_checkpoint():
+    """Saves the current workflow phase and its outputs to the workflow store."""
+    workflow_id = st.session_state.get("workflow_id")
+    if workflow_id:
+        get_workflow_store().checkpoint(workflow_id, st.session_state.workflow_phase,
+                                        {key: st.session_state.get(key) for key in CHECKPOINT_KEYS})
+
+def set_phase(phase: str):
+    """Moves the workflow to a new phase and checkpoints it."""
+    st.session_state.workflow_phase = phase
+    save_checkpoint()
+
+def load_stories(stories_path: str):
+    """Reads and parses a stories file, returning None if it cannot be read."""
+    stories_content = read_file(stories_path)
+    if "Error reading file" in stories_content:
+        st.error(f"Failed to load stories: {stories_content}")
+        return None
+    return parse_stories(stories_content)
+
+def resume_workflow(workflow_id: str) -> bool:
+    """Restores a workflow from its last checkpoint into session state.
+
+    Completed phases are not run again: a step whose job was already
+    submitted picks that job back up, and approval reloads the saved stories.
+    """
+    saved = get_workflow_store().load(workflow_id)
+    if saved is None or saved["phase"] in FINAL_PHASES:
+        return False
+    state = saved["state"]
+    for key in CHECKPOINT_KEYS:
+        st.session_state[key] = state.get(key)
+    # JSON object keys are strings; duplicates are keyed by story index
+    st.session_state.duplicate_stories = {int(idx): matches for idx, matches in (state.get("duplicate_stories") or {}).items()}
+    st.session_state.current_stories = None
+    if saved["phase"] == "approval":
+        st.session_state.current_stories = load_stories(state["stories_file_path"])
+        if st.session_state.current_stories is None:
+            return False
+    st.session_state.workflow_id = workflow_id
+    st.session_state.workflow_phase = saved["phase"]
+    st.query_params["workflow"] = workflow_id
+    logger.info(f"Resumed workflow {workflow_id} at phase {saved['phase']}")
+    return True
 
 def reset_workflow():
     """Resets the workflow state."""
+    if st.session_state.get("workflow_id"):
+        # Release any workflow still waiting on this approval
+        get_approval_broker().cancel(st.session_state.workflow_id)
+        if st.session_state.workflow_phase not in FINAL_PHASES:
+            get_workflow_store().checkpoint(st.session_state.workflow_id, "cancelled")
+    st.query_params.pop("workflow", None)
     st.session_state.workflow_phase = "initial"
     st.session_state.workflow_id = None
     st.session_state.uploaded_file_path = None
     st.session_state.stories_file_path = None
     st.session_state.current_stories = None
-    # Keep the supervisor initialized
+    st.session_state.duplicate_stories = {}
+    st.session_state["stories_diff"] = {}
+    st.session_state.jira_success = None
+    if st.session_state.get("job_id"):
+        # Drop the step's job if no worker has started it; a running job finishes and is ignored
+        get_job_queue().cancel(st.session_state.job_id)
+        get_job_queue().release(st.session_state.job_id)
+    st.session_state.job_id = None
+    # Drop any supervisor built for this session
     if 'supervisor' in st.session_state:
         del st.session_state['supervisor']
 
 
+def render_events(view: EventView):
+    """Shows the progress, tool calls and streamed LLM output of a running step."""
+    for stage, progress in view.progress.items():
+        if progress["total"]:
+            st.progress(min(progress["done"] / progress["total"], 1.0),
+                        text=f"{stage}: {progress['done']} of {progress['total']}")
+        else:
+            st.write(f"{stage}: {progress['done']} done")
+    for tool, info in view.tools.items():
+        icon = {"running": "⏳", "done": "✅"}.get(info["status"], "❌")
+        took = f" ({info['seconds']}s)" if info.get("seconds") is not None else ""
+        st.write(f"{icon} {info.get('agent') or 'Agent'}: {tool}{took}")
+    if view.stories is not None:
+        st.json(view.stories, expanded=False)
+    if view.text:
+        st.code(view.text[-1500:], language=None)
+
+def carried_over_stories(stories, diff):
+    """Positions of stories reused unchanged from the last upload of the same document."""
+    if not diff.get("previous_version"):
+        return set()
+    new = set(diff.get("added", [])) | {change["new"] for change in diff.get("changed", [])}
+    return {idx for idx, story in enumerate(stories) if story.get("summary") not in new}
+
+def run_step_as_job(label: str, submit, *args):
+    """Runs a workflow step as a job on the worker pool, rendering its events on each rerun.
+
+    The job ID is kept in session state, so the step carries on across reruns.
+    Reruns the script every UI_REFRESH_SECONDS until the job finishes, then
+    returns its result, or None if it failed.
+    """
+    queue = get_job_queue()
+    job_id = st.session_state.get("job_id")
+    if job_id is None:
+        job_id = submit(*args)
+        st.session_state.job_id = job_id
+        st.session_state.job_view = EventView()
+        # A refreshed page or restarted server picks this job up instead of submitting it again
+        save_checkpoint()
+    job = queue.get(job_id)
+    channel = queue.events(job_id)
+    if channel is None and job is not None and job["status"] not in FINISHED:
+        # Submitted before the server restarted: run it here so its events reach this session
+        queue.adopt(job_id)
+        channel = queue.events(job_id)
+    view = st.session_state.get("job_view") or EventView()
+    if channel is not None:
+        view.update(channel.drain())
+    st.session_state.job_view = view
+
+    finished = job is None or job["status"] in FINISHED
+    with st.status(label, expanded=True, state="complete" if finished else "running"):
+        if job and not job["started_at"]:
+            st.write("Waiting for a free worker...")
+        render_events(view)
+    if not finished:
+        time.sleep(UI_REFRESH_SECONDS)
+        st.rerun()
+
+    st.session_state.job_id = None
+    queue.release(job_id)
+    if job is None or job["status"] != SUCCEEDED:
+        if job and job["status"] == FAILED:
+            logger.error(f"{label} failed: {job['error']}")
+        return None
+    return job["result"]
+
+def resolve_approval(status: str):
+    """Hands the user's decision to a workflow waiting on it, if there is one."""
+    workflow_id = st.session_state.get("workflow_id")
+    if workflow_id and workflow_id in get_approval_broker().pending():
+        get_approval_broker().resolve(workflow_id, status)
+
 def display_approval_ui():
     """Displays the UI for story approval."""
     stories = st.session_state.get("current_stories")
@@ -55,31 +205,63 @@ def display_approval_ui():
         return
 
     st.subheader("Generated Stories for Your Approval")
+    diff = st.session_state.get("stories_diff") or {}
+    if diff.get("previous_version"):
+        st.info(f"Changes since the last upload of {diff['document']}: {len(diff['added'])} added, "
+                f"{len(diff['changed'])} changed, {len(diff['removed'])} removed, {diff['unchanged']} unchanged")
+        with st.expander("Story changes"):
+            for summary in diff["added"]:
+                st.write(f"➕ {summary}")
+            for change in diff["changed"]:
+                st.write(f"✏️ {change['old']} → {change['new']}")
+            for removed in diff["removed"]:
+                issue = f" ({removed['issue_key']} in Jira)" if removed.get("issue_key") else ""
+                st.write(f"➖ {removed['summary']}{issue}")
+    duplicates = st.session_state.get("duplicate_stories") or {}
     if isinstance(stories, list):
         for idx, story in enumerate(stories, 1):
             with st.expander(f"Story {idx}: {story.get('summary', 'No Summary')}", expanded=True):
                 st.write("**Description:**", story.get('description', 'No Description'))
+                for match in duplicates.get(idx - 1, []):
+                    where = match["issue_key"] or os.path.basename(match["source"])
+                    st.warning(f"Possible duplicate ({match['similarity']:.0%} similar) of {where}: {match['summary']}")
     else:
         st.warning("Stories data is not in the expected format.")
 
+    if duplicates and st.button(f"Remove {len(duplicates)} Possible Duplicates"):
+        kept = [story for idx, story in enumerate(stories) if idx not in duplicates]
+        if write_stories(st.session_state.stories_file_path, kept):
+            st.session_state.current_stories = kept
+            st.session_state.duplicate_stories = {}
+            save_checkpoint()
+            st.rerun()
+        else:
+            st.error("Failed to update the stories file.")
+
     col1, col2 = st.columns(2)
     with col1:
         if st.button("Approve Stories"):
-            st.session_state.workflow_phase = "creating_jira"
+            resolve_approval(APPROVED)
+            set_phase("creating_jira")
             st.rerun()
 
     with col2:
         if st.button("Reject Stories"):
-            st.session_state.workflow_phase = "done"
+            resolve_approval(REJECTED)
+            set_phase("done")
             st.warning("Stories rejected. Workflow terminated.")
             st.rerun()
 
 def main():
     st.title("SDLC Automation (Supervisor Orchestrated)")
 
-    # Initialize state and supervisor agent
+    # Initialize state; each job leases its own agents from the agent pool
     init_session_state()
-    supervisor = initialize_supervisor()
+
+    # After a refresh or restart, carry on from the workflow's last checkpoint
+    if st.session_state.workflow_id is None and st.query_params.get("workflow"):
+        if not resume_workflow(st.query_params["workflow"]):
+            st.query_params.pop("workflow", None)
     
     # -- Workflow State Machine --
     
@@ -100,34 +282,62 @@ def main():
             
             if success:
                 st.session_state.uploaded_file_path = file_path
+                # Re-uploads of the same document are diffed against the last version
+                st.session_state["requirements_document"] = uploaded_file.name
                 st.success(f"File uploaded: {new_filename}")
             else:
                 st.error("Failed to upload file. Please try again.")
         
         if st.button("Start Workflow") and st.session_state.uploaded_file_path:
-            st.session_state.workflow_phase = "processing"
-            st.session_state.workflow_id = f"wf_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            st.rerun()
+            # Make sure buffered writes (the upload) are stored before agents read them
+            if not flush():
+                st.error("Failed to save the uploaded file. Please try again.")
+            else:
+                st.session_state.workflow_id = f"wf_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+                st.query_params["workflow"] = st.session_state.workflow_id
+                set_phase("processing")
+                st.rerun()
+
+        unfinished = get_workflow_store().unfinished(limit=5)
+        if unfinished:
+            st.subheader("Unfinished Workflows")
+            for workflow in unfinished:
+                if st.button(f"Resume {workflow['workflow_id']} ({workflow['phase']})",
+                             key=f"resume_{workflow['workflow_id']}"):
+                    if resume_workflow(workflow["workflow_id"]):
+                        st.rerun()
+                    else:
+                        st.error(f"Could not resume workflow {workflow['workflow_id']}.")
 
     # 2. Requirements Processing
     elif st.session_state.workflow_phase == "processing":
-        with st.spinner("Processing requirements..."):
-            stories_path = run_requirements_processing(supervisor, st.session_state.uploaded_file_path)
+        result = run_step_as_job("Processing requirements...", submit_requirements_processing,
+                                 st.session_state.uploaded_file_path, st.session_state.workflow_id,
+                                 st.session_state.get("requirements_document"))
+        stories_path = result and result["stories_file_path"]
         
         if stories_path:
+            st.session_state["stories_diff"] = result["stories_diff"]
             st.session_state.stories_file_path = stories_path
             # Load stories for display using file_tools
             try:
-                stories_content = read_file(stories_path)
-                if "Error reading file" not in stories_content:
-                    st.session_state.current_stories = json.loads(stories_content)
+                st.session_state.current_stories = load_stories(stories_path)
+                if st.session_state.current_stories is not None:
+                    try:
+                        diff = result["stories_diff"] or {}
+                        st.session_state.duplicate_stories = find_duplicate_stories(
+                            st.session_state.current_stories, stories_path,
+                            document_key=diff.get("document") or st.session_state.get("requirements_document"),
+                            skip=carried_over_stories(st.session_state.current_stories, diff))
+                    except Exception as e:
+                        # Duplicate flags are advisory; approval can go ahead without them
+                        logger.warning(f"Duplicate story check failed: {e}")
+                    set_phase("approval")
                 else:
-                    st.error(f"Failed to load stories: {stories_content}")
                     reset_workflow()
             except Exception as e:
                 st.error(f"Failed to load stories: {e}")
                 reset_workflow()
-            st.session_state.workflow_phase = "approval"
         else:
             st.error("Failed to process requirements.")
             reset_workflow()
@@ -139,20 +349,25 @@ def main():
 
     # 4. Jira Ticket Creation
     elif st.session_state.workflow_phase == "creating_jira":
-        with st.spinner("Creating Jira tickets..."):
-            success = run_jira_creation(supervisor, st.session_state.stories_file_path)
+        success = run_step_as_job("Creating Jira tickets...", submit_jira_creation,
+                                  st.session_state.stories_file_path, st.session_state.workflow_id,
+                                  st.session_state.get("stories_diff"))
         
         if success:
             st.success("Jira tickets created successfully!")
         else:
             st.error("Failed to create Jira tickets.")
             
-        st.session_state.workflow_phase = "done"
+        st.session_state.jira_success = bool(success)
+        set_phase("done")
         st.rerun()
         
     # 5. Done State
     elif st.session_state.workflow_phase == "done":
         st.info(f"Workflow {st.session_state.workflow_id} has finished.")
+        cache_stats = get_completion_store().stats()
+        st.caption(f"LLM cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+                   f"({cache_stats['hit_rate']:.0%} hit rate, {cache_stats['entries']} cached completions)")
         if st.button("Start New Workflow"):
             reset_workflow()
             st.rerun()
@@ -0,0 +1,165 @@
+import logging
+import os
+import threading
+from concurrent.futures import CancelledError, Future, InvalidStateError, TimeoutError
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+APPROVED = "approved"
+REJECTED = "rejected"
+TIMEOUT = "timeout"
+CANCELLED = "cancelled"
+
+# Seconds a workflow waits for a decision before giving up; 0 waits forever.
+DEFAULT_APPROVAL_TIMEOUT = float(os.getenv("APPROVAL_TIMEOUT", "3600"))
+
+
+class ApprovalBroker:
+    """
+    Hands user approval decisions from the UI to waiting workflows.
+
+    Each pending approval is a Future keyed by workflow ID. The UI resolves
+    it directly, which wakes a blocked waiter immediately or runs the
+    callbacks registered with on_decision(). Waiting costs no CPU, and
+    callers that register callbacks need no thread at all.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Tuple[Future, str]] = {}
+
+    def request(self, workflow_id: str, stories_file_path: str) -> Future:
+        """
+        Open an approval request, or return the one already pending for the workflow.
+
+        Args:
+            workflow_id (str): Workflow awaiting approval.
+            stories_file_path (str): Stories the user is asked to approve.
+
+        Returns:
+            Future: Resolves to APPROVED or REJECTED, or is cancelled.
+        """
+        with self._lock:
+            entry = self._pending.get(workflow_id)
+            if entry and not entry[0].done():
+                return entry[0]
+            future: Future = Future()
+            future.set_running_or_notify_cancel()
+            self._pending[workflow_id] = (future, stories_file_path)
+        logger.info(f"Approval requested for workflow {workflow_id}: {stories_file_path}")
+        return future
+
+    def resolve(self, workflow_id: str, status: str) -> bool:
+        """
+        Record the user's decision and wake whatever is waiting on it.
+
+        Args:
+            workflow_id (str): Workflow the decision is for.
+            status (str): APPROVED or REJECTED.
+
+        Returns:
+            bool: True if a pending request was resolved.
+        """
+        if status not in (APPROVED, REJECTED):
+            raise ValueError(f"Approval status must be {APPROVED!r} or {REJECTED!r}, got {status!r}")
+        # Resolved requests stay registered until the waiter collects the result
+        with self._lock:
+            entry = self._pending.get(workflow_id)
+        try:
+            if entry is None:
+                raise InvalidStateError()
+            # Outside the lock: done callbacks run here and may call back into the broker
+            entry[0].set_result(status)
+        except InvalidStateError:
+            logger.warning(f"No pending approval for workflow {workflow_id}")
+            return False
+        logger.info(f"Workflow {workflow_id} {status} by user")
+        return True
+
+    def cancel(self, workflow_id: str) -> bool:
+        """Cancel a pending request, e.g. when the user abandons the workflow."""
+        with self._lock:
+            entry = self._pending.pop(workflow_id, None)
+        if entry is None:
+            return False
+        # A running Future cannot be cancel()led; fail it with CancelledError instead
+        try:
+            entry[0].set_exception(CancelledError())
+            logger.info(f"Approval for workflow {workflow_id} cancelled")
+        except InvalidStateError:
+            pass  # already decided
+        return True
+
+    def wait(self, workflow_id: str, timeout: Optional[float] = None) -> str:
+        """
+        Block until the user decides.
+
+        Args:
+            workflow_id (str): Workflow with a pending request.
+            timeout (Optional[float]): Max seconds to wait. Defaults to
+                APPROVAL_TIMEOUT; 0 or None there means no limit.
+
+        Returns:
+            str: APPROVED, REJECTED, TIMEOUT or CANCELLED.
+        """
+        with self._lock:
+            entry = self._pending.get(workflow_id)
+        if entry is None:
+            return CANCELLED
+        if timeout is None:
+            timeout = DEFAULT_APPROVAL_TIMEOUT or None
+        try:
+            status = entry[0].result(timeout=timeout)
+        except TimeoutError:
+            logger.warning(f"Approval for workflow {workflow_id} timed out after {timeout}s")
+            self.cancel(workflow_id)
+            return TIMEOUT
+        except CancelledError:
+            return CANCELLED
+        self._discard(workflow_id, entry[0])
+        return status
+
+    def on_decision(self, workflow_id: str, callback: Callable[[str], None]) -> None:
+        """
+        Call callback(status) once the user decides, without blocking.
+
+        The callback runs on the thread that resolves the request, or right
+        away if it is already resolved. Cancelled requests report CANCELLED.
+        """
+        with self._lock:
+            entry = self._pending.get(workflow_id)
+        if entry is None:
+            callback(CANCELLED)
+            return
+
+        def done(future: Future) -> None:
+            self._discard(workflow_id, future)
+            callback(CANCELLED if future.exception() is not None else future.result())
+
+        entry[0].add_done_callback(done)
+
+    def _discard(self, workflow_id: str, future: Future) -> None:
+        with self._lock:
+            entry = self._pending.get(workflow_id)
+            if entry and entry[0] is future:
+                del self._pending[workflow_id]
+
+    def pending(self) -> Dict[str, str]:
+        """Return {workflow ID: stories file path} for requests awaiting a decision."""
+        with self._lock:
+            return {wid: path for wid, (future, path) in self._pending.items() if not future.done()}
+
+
+_broker: Optional[ApprovalBroker] = None
+_broker_lock = threading.Lock()
+
+
+def get_approval_broker() -> ApprovalBroker:
+    """Get the process-wide approval broker."""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = ApprovalBroker()
+    return _broker
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import os
+import threading
+import weakref
+from typing import Dict, Union
+
+from . import file_tools
+from . import jira_tool
+
+logger = logging.getLogger(__name__)
+
+# Max in-flight tool service / Jira calls per event loop.
+DEFAULT_MAX_CONCURRENCY = 10
+
+# A semaphore is bound to the event loop that created it, so each loop gets
+# its own, dropped when the loop is garbage collected.
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+_semaphores_lock = threading.Lock()
+
+
+def _max_concurrency() -> int:
+    try:
+        return int(os.getenv("TOOL_ASYNC_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY))
+    except ValueError:
+        return DEFAULT_MAX_CONCURRENCY
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    # Loops on other threads use the dictionary concurrently
+    with _semaphores_lock:
+        semaphore = _semaphores.get(loop)
+        if semaphore is None:
+            limit = _max_concurrency()
+            semaphore = _semaphores[loop] = asyncio.Semaphore(limit)
+            logger.info(f"Created async tool semaphore (max_concurrency={limit})")
+    return semaphore
+
+
+async def read_file(file_path: str) -> str:
+    """
+    Read content from a text file without blocking the event loop.
+
+    The read runs file_tools.read_file in a worker thread, so it goes
+    through the same storage backend, read cache and write-behind buffer
+    as sync callers and sees the same content.
+
+    Args:
+        file_path (str): Path to the file to read
+
+    Returns:
+        str: Content of the file
+    """
+    async with _get_semaphore():
+        return await asyncio.to_thread(file_tools.read_file, file_path)
+
+
+async def write_file(file_path: str, content: Union[str, bytes]) -> bool:
+    """
+    Write content to a file without blocking the event loop.
+
+    The write runs file_tools.write_file in a worker thread, so it goes
+    through the same storage backend, write-behind buffer and request
+    compression fallback as sync callers.
+
+    Args:
+        file_path (str): Path to the file to write
+        content (Union[str, bytes]): Content to write to the file
+
+    Returns:
+        bool: True if successful, False if error
+    """
+    async with _get_semaphore():
+        return await asyncio.to_thread(file_tools.write_file, file_path, content)
+
+
+async def create_jira_story(input_dict: Dict) -> str:
+    """
+    Create a Jira story without blocking the event loop.
+
+    The Jira client is synchronous, so the call runs in a worker thread and
+    shares the concurrency limit with the file calls.
+
+    Args:
+        input_dict (Dict): Dictionary containing story details like summary and description.
+
+    Returns:
+        str: The issue key of the created Jira story.
+    """
+    async with _get_semaphore():
+        return await asyncio.to_thread(jira_tool.create_jira_story, input_dict)
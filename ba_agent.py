@@ -1,21 +1,226 @@
-from autogen import ConversableAgent
-from src.config.settings import LLM_CONFIG
-from src.tools.file_read_tool import read_file
+from src.tools.event_stream import PROGRESS, emit
+from src.tools.execution_context import workflow_state
+from src.tools.file_tools import iter_file_lines, read_file, write_file
+from src.tools.story_io import JSONL_EXTENSION, JsonlStoryWriter, write_stories
+from src.tools.story_model import Story
+from src.tools.requirement_store import RequirementStore, diff_requirements, get_requirement_store, requirement_hash
+from src.tools.jira_client import get_jira_settings
+from src.tools.jira_ledger import get_jira_ledger, story_hash
+from src.tools.story_index import get_story_index
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 import logging
 import json
 import os
 from pathlib import Path
-import streamlit as st
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def process_requirements_wrapper(file_path: str) -> str:
+STREAMING_ENABLED = os.getenv("BA_STREAMING", "").lower() in ("1", "true", "yes")
+PROGRESS_LOG_EVERY = 100  # stories between progress log lines in streaming mode
+STORE_BATCH_SIZE = 500  # new stories buffered before saving to the requirement store
+
+def requirement_text(line: str) -> Optional[str]:
+    """Get the requirement from a requirements line, or None if the line is not a requirement."""
+    line = line.strip()
+    if not line:
+        return None
+        
+    # Check if this is a new requirement (starts with a number or dash)
+    if not (line[0].isdigit() and '.' in line or line.startswith('-')):
+        return None
+    
+    if line.startswith('-'):
+        line = line[1:].strip()  # Remove dash
+    return line
+
+def requirement_to_story(line: str) -> Optional[Story]:
+    """Convert one requirements line to a user story.
+    
+    Args:
+        line: A line of the requirements file
+        
+    Returns:
+        Optional[Story]: The story, or None if the line is not a requirement
+    """
+    line = requirement_text(line)
+    if line is None:
+        return None
+    return _build_story(line)
+
+def _build_story(line: str) -> Story:
+    # Convert requirement to user story format with proper format; the description is rendered from
+    # the template when read
+    return Story(
+        summary=f"As a user, I want to {line.lower()}",
+        template_id="user_story",
+        params={"requirement": line}
+    )
+
+class IncrementalStoryBuilder:
+    """Builds stories for requirement lines, reusing stored stories for unchanged requirements.
+    
+    Only requirements whose hash is not in the requirement store are turned
+    into new stories. Call finish() once the document is parsed to store the
+    new stories and compare against the previously processed version.
+    """
+    
+    def __init__(self, store: Optional[RequirementStore] = None):
+        self.store = store or get_requirement_store()
+        self.hashes: List[str] = []
+        self.regenerated = 0
+        self.reused = 0
+        self._new: Dict[str, Tuple[str, str, Story]] = {}
+    
+    def story_for_line(self, line: str) -> Optional[Story]:
+        requirement = requirement_text(line)
+        if requirement is None:
+            return None
+        key = requirement_hash(requirement)
+        self.hashes.append(key)
+        if key in self._new:
+            return self._new[key][2]
+        story = self.store.get_story(key)
+        if story is not None:
+            self.reused += 1
+            return story
+        story = _build_story(requirement)
+        self.regenerated += 1
+        self._new[key] = (key, requirement, story)
+        if len(self._new) >= STORE_BATCH_SIZE:
+            self._save_new()
+        return story
+    
+    def _save_new(self) -> None:
+        if self._new:
+            self.store.put_stories(list(self._new.values()))
+            self._new = {}
+    
+    def finish(self, document_key: str) -> Dict[str, Any]:
+        """Store new stories and diff this version of the document against the last one.
+        
+        Args:
+            document_key: Name identifying the requirements document across uploads
+            
+        Returns:
+            Dict[str, Any]: Summaries of "added", "changed" ({"old", "new"}) and
+            "removed" ({"summary", "issue_key"}) stories, plus counts. The
+            lists are left empty for the first version of a document.
+        """
+        self._save_new()
+        previous = self.store.get_document(document_key)
+        self.store.set_document(document_key, self.hashes)
+        if previous:
+            diff = diff_requirements(previous, self.hashes)
+        else:
+            diff = {"added": [], "changed": [], "removed": [], "unchanged": []}
+        
+        def summary(key: str) -> str:
+            story = self.store.get_story(key)
+            return story.summary if story else ""
+        
+        result = {
+            "document": document_key,
+            "previous_version": bool(previous),
+            "added": [summary(key) for key in diff["added"]],
+            "changed": [{"old": summary(old), "new": summary(new)} for old, new in diff["changed"]],
+            "removed": [{"summary": summary(key), "issue_key": _issue_key_for(self.store.get_story(key))}
+                        for key in diff["removed"]],
+            "unchanged": len(diff["unchanged"]),
+            "regenerated": self.regenerated,
+            "reused": self.reused,
+        }
+        if not previous:
+            logger.info(f"First version of {document_key}: {len(self.hashes)} requirements")
+            return result
+        logger.info(
+            f"Requirements diff for {document_key}: {len(result['added'])} added, "
+            f"{len(result['changed'])} changed, {len(result['removed'])} removed, "
+            f"{result['unchanged']} unchanged ({self.regenerated} stories regenerated, {self.reused} reused)"
+        )
+        return result
+
+def _issue_key_for(story: Optional[Story]) -> Optional[str]:
+    """Jira issue already created for a story, if the Jira ledger has one."""
+    if story is None:
+        return None
+    try:
+        project_key = get_jira_settings().project_key
+        return get_jira_ledger().lookup(story_hash(project_key, story.summary, story.description))
+    except Exception as e:
+        logger.debug(f"Could not look up Jira issue for removed story: {e}")
+        return None
+
+def _tag_stories_file(stories_path: str, document_key: str) -> None:
+    """Record the document a stories file came from, so its later versions are not flagged as duplicates of it."""
+    try:
+        get_story_index().set_document(stories_path, document_key)
+    except Exception as e:
+        # Duplicate flags are advisory; never fail story generation on them
+        logger.warning(f"Could not record the document for {stories_path}: {e}")
+
+def iter_requirement_stories(lines: Iterable[str], builder: Optional[IncrementalStoryBuilder] = None) -> Iterator[Story]:
+    """Yield a user story for each requirement line."""
+    to_story = builder.story_for_line if builder else requirement_to_story
+    for line in lines:
+        story = to_story(line)
+        if story is not None:
+            yield story
+
+def stream_requirements_to_jsonl(file_path: str, stories_path: str,
+                                 on_progress: Optional[Callable[[int, int], None]] = None,
+                                 builder: Optional[IncrementalStoryBuilder] = None) -> int:
+    """Parse a requirements file line by line, appending each story to a JSONL file.
+    
+    Neither the requirements nor the stories are held in memory, and the
+    stories file can be read while it is still being written.
+    
+    Args:
+        file_path: Path to the requirements file
+        stories_path: Path of the JSONL stories file to write
+        on_progress: Called with (lines read, stories written) after each story
+        builder: Reuses stored stories for unchanged requirements if given
+        
+    Returns:
+        int: Number of stories written
+    """
+    to_story = builder.story_for_line if builder else requirement_to_story
+    lines_read = 0
+    stories_written = 0
+    with JsonlStoryWriter(stories_path) as writer:
+        for line in iter_file_lines(file_path):
+            lines_read += 1
+            story = to_story(line)
+            if story is None:
+                continue
+            writer.write(story)
+            stories_written += 1
+            if on_progress:
+                on_progress(lines_read, stories_written)
+            if stories_written % PROGRESS_LOG_EVERY == 0:
+                logger.info(f"Progress: {stories_written} user stories from {lines_read} lines")
+    return stories_written
+
+def _report_progress(lines_read: int, stories_written: int) -> None:
+    workflow_state()["stories_progress"] = {"lines": lines_read, "stories": stories_written}
+    emit(PROGRESS, stage="stories", done=stories_written, lines=lines_read)
+
+def process_requirements_wrapper(file_path: str, streaming: Optional[bool] = None,
+                                 document_key: Optional[str] = None) -> str:
     """Process requirements and generate proper user stories.
     
+    Stories are only generated for requirements not seen before; the rest
+    are reused from the requirement store. The changes since the last
+    version of the same document are saved to the workflow state as "stories_diff".
+    
     Args:
         file_path: Path to the requirements file
+        streaming: Write stories to a JSONL file as they are parsed instead of
+            one JSON array at the end. Defaults to BA_STREAMING.
+        document_key: Name identifying the document across uploads. Defaults
+            to the workflow state's "requirements_document", then the file name.
         
     Returns:
         str: Success message
@@ -24,6 +229,11 @@ def process_requirements_wrapper(file_path: str) -> str:
         logger.info("\n=== BA Agent Starting ===")
         logger.info(f"Processing requirements file: {file_path}")
         
+        if streaming is None:
+            streaming = STREAMING_ENABLED
+        document_key = document_key or workflow_state().get("requirements_document") or os.path.basename(file_path)
+        builder = IncrementalStoryBuilder()
+        
         # Get stories directory
         project_root = str(Path(__file__).parent.parent.parent)
         stories_dir = os.path.join(project_root, "stories")
@@ -32,6 +242,27 @@ def process_requirements_wrapper(file_path: str) -> str:
         # Create stories directory if it doesn't exist
         os.makedirs(stories_dir, exist_ok=True)
         
+        # Name stories file after the actual uploaded filename
+        uploaded_filename = os.path.basename(file_path)
+        if streaming:
+            stories_file = f"stories_{os.path.splitext(uploaded_filename)[0]}{JSONL_EXTENSION}"
+        else:
+            stories_file = f"stories_{uploaded_filename}"
+        stories_path = os.path.join(stories_dir, stories_file)
+        
+        if streaming:
+            logger.info(f"Streaming user stories to: {stories_path}")
+            # Let the UI find the file while it is still being written
+            workflow_state()["stories_file"] = stories_file
+            story_count = stream_requirements_to_jsonl(file_path, stories_path, on_progress=_report_progress,
+                                                       builder=builder)
+            logger.info(f"Successfully saved {story_count} user stories")
+            workflow_state()["stories_diff"] = builder.finish(document_key)
+            _tag_stories_file(stories_path, document_key)
+            workflow_state()["workflow_status"] = "stories_generated"
+            logger.info("\n=== BA Agent Completed ===")
+            return f"Generated and saved {story_count} user stories to {stories_path}"
+        
         # Read requirements file
         logger.info("Reading requirements file...")
         file_content = read_file(file_path)
@@ -40,59 +271,26 @@ def process_requirements_wrapper(file_path: str) -> str:
         # Generate user stories
         logger.info("Converting requirements to user stories...")
         stories = []
-        current_story = None
-        
-        for line in file_content.split('\n'):
-            line = line.strip()
-            if not line:
-                continue
-                
-            # Check if this is a new requirement (starts with a number or dash)
-            if line[0].isdigit() and '.' in line or line.startswith('-'):
-                # Convert requirement to user story format
-                if line.startswith('-'):
-                    line = line[1:].strip()  # Remove dash
-                
-                # Create user story with proper format
-                story = {
-                    "summary": f"As a user, I want to {line.lower()}",
-                    "description": f"""User Story:
-As a user,
-I want to {line.lower()}
-So that I can achieve my goal efficiently
-
-Acceptance Criteria:
-1. The system should implement {line}
-2. The feature should be user-friendly
-3. The implementation should follow best practices
-
-Technical Notes:
-- Priority: Medium
-- Story Points: 3
-- Dependencies: None""",
-                    "priority": "Medium",
-                    "story_points": 3,
-                    "type": "User Story"
-                }
-                stories.append(story)
-                logger.info(f"Generated user story: {story['summary']}")
+        for story in iter_requirement_stories(file_content.split('\n'), builder):
+            stories.append(story)
+            emit(PROGRESS, stage="stories", done=len(stories))
+            logger.info(f"Generated user story: {story['summary']}")
         
         logger.info(f"Total user stories generated: {len(stories)}")
         
-        # Save stories to file using actual uploaded filename
-        uploaded_filename = os.path.basename(file_path)
-        stories_file = f"stories_{uploaded_filename}"
-        stories_path = os.path.join(stories_dir, stories_file)
+        # Save stories to file
         logger.info(f"Saving user stories to: {stories_path}")
         
-        with open(stories_path, 'w') as f:
-            json.dump(stories, f, indent=2)
+        if not write_stories(stories_path, stories):
+            raise Exception(f"Failed to save user stories to {stories_path}")
         
         logger.info(f"Successfully saved {len(stories)} user stories")
         
         # Update session state with stories file and workflow status
-        st.session_state["stories_file"] = stories_file
-        st.session_state["workflow_status"] = "stories_generated"
+        workflow_state()["stories_file"] = stories_file
+        workflow_state()["stories_diff"] = builder.finish(document_key)
+        _tag_stories_file(stories_path, document_key)
+        workflow_state()["workflow_status"] = "stories_generated"
         
         # Log generated stories
         logger.info("\n=== Generated User Stories ===")
@@ -111,10 +309,7 @@ Technical Notes:
         logger.error(f"Error processing requirements: {str(e)}")
         return f"Error processing requirements: {str(e)}"
 
-# Create the BA agent
-ba_agent = ConversableAgent(
-    name="BA_Agent",
-    system_message="""You are a Business Analyst Agent (BA_Agent). Your role is to:
+BA_SYSTEM_MESSAGE = """You are a Business Analyst Agent (BA_Agent). Your role is to:
     1. Read requirements from a file using process_requirements_wrapper
     2. Convert requirements into proper user stories with:
        - Clear "As a user, I want to..." format
@@ -131,20 +326,50 @@ ba_agent = ConversableAgent(
         "priority": "Medium",
         "story_points": 3,
         "type": "User Story"
-    }""",
-    llm_config=LLM_CONFIG,
-    human_input_mode="NEVER",
-    max_consecutive_auto_reply=3,
-    code_execution_config={
-        "last_n_messages": 3,
-        "work_dir": "workspace",
-        "use_docker": False,
-        "timeout": 60
-    }
-)
-
-@ba_agent.register_for_execution()
-@ba_agent.register_for_llm(name="process_requirements_wrapper", description="Process requirements file and generate Jira stories.")
-def process_requirements_wrapper_func(file_path: str) -> str:
-    return process_requirements_wrapper(file_path)
+    }"""
+
+def create_ba_agent():
+    """Build a new BA agent with process_requirements_wrapper registered as its tool."""
+    # Imported here so autogen is only loaded when an agent is first needed
+    from autogen import ConversableAgent
+    from src.config.settings import LLM_CONFIG
+    from src.tools.event_stream import streaming_llm_config
+    from src.tools.history_compaction import add_history_compaction
+    from src.tools.llm_cache import get_llm_cache
+
+    ba_agent = ConversableAgent(
+        name="BA_Agent",
+        system_message=BA_SYSTEM_MESSAGE,
+        llm_config=streaming_llm_config(LLM_CONFIG),
+        human_input_mode="NEVER",
+        max_consecutive_auto_reply=3,
+        code_execution_config={
+            "last_n_messages": 3,
+            "work_dir": "workspace",
+            "use_docker": False,
+            "timeout": 60
+        }
+    )
+
+    @ba_agent.register_for_execution()
+    @ba_agent.register_for_llm(name="process_requirements_wrapper", description="Process requirements file and generate Jira stories.")
+    def process_requirements_wrapper_func(file_path: str) -> str:
+        return process_requirements_wrapper(file_path)
+
+    ba_agent.client_cache = get_llm_cache(ba_agent.name)
+    add_history_compaction(ba_agent)
+    return ba_agent
+
+@lru_cache(maxsize=None)
+def get_ba_agent():
+    """Get the shared BA agent, building it on first use."""
+    return create_ba_agent()
+
+def __getattr__(name):
+    # Keeps `from src.agents.ba_agent import ba_agent` working without building
+    # the agent at import time.
+    if name == "ba_agent":
+        return get_ba_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
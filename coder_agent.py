@@ -2,10 +2,10 @@ import logging
 import json
 import os
 from pathlib import Path
-from autogen import AssistantAgent
-from src.config.settings import LLM_CONFIG
-from src.tools.file_read_tool import read_file
-from src.tools.file_write_tool import write_file
+from functools import lru_cache
+from src.tools.file_tools import read_file, write_file
+from src.tools.execution_context import workflow_state
+from src.tools.story_io import iter_stories
 
 logger = logging.getLogger(__name__)
 
@@ -20,25 +20,22 @@ def process_story_to_code() -> str:
         # Create programs directory
         os.makedirs(programs_dir, exist_ok=True)
         
-        # Get stories file from session state
-        import streamlit as st
-        stories_file = st.session_state.get("stories_file")
+        # Get stories file from the workflow state
+        state = workflow_state()
+        stories_file = state.get("stories_file")
         if not stories_file:
-            raise ValueError("No stories file found in session state. Please ensure BA Agent has generated stories first.")
+            raise ValueError("No stories file found in the workflow state. Please ensure BA Agent has generated stories first.")
             
         # Get full path to stories file
         stories_path = os.path.join(stories_dir, stories_file)
         logger.info(f"Using stories file from workspace: {stories_path}")
         
-        # Read and parse stories
-        stories_content = read_file(stories_path)
-        stories = json.loads(stories_content)
+        # Read only the first story; JSONL files are not loaded whole
+        first_story = next(iter_stories(stories_path), None)
         
-        if not stories:
+        if not first_story:
             raise ValueError("No stories found in file")
             
-        # Get first story
-        first_story = stories[0]
         logger.info(f"Processing story: {first_story['summary']}")
         
         # Generate code based on story
@@ -83,8 +80,8 @@ if __name__ == "__main__":
         # Save code
         write_file(code_file, code)
         
-        # Store path in session state
-        st.session_state["code_file"] = code_file
+        # Store path in the workflow state
+        state["code_file"] = code_file
         
         return code_file
         
@@ -92,10 +89,7 @@ if __name__ == "__main__":
         logger.error(f"Error: {str(e)}")
         raise
 
-# Create Coder Agent
-coder_agent = AssistantAgent(
-    name="Coder_Agent",
-    system_message="""You are a Coder Agent responsible for generating Python code.
+CODER_SYSTEM_MESSAGE = """You are a Coder Agent responsible for generating Python code.
 Your tasks are:
 1. Use the stories file from workspace stories folder (generated by BA Agent)
 2. Generate appropriate Python code based on the stories
@@ -103,13 +97,42 @@ Your tasks are:
 4. Save the code to a .py file in the programs folder
 5. Return the path to the saved file
 
-Use the process_story_to_code function to save your code.""",
-    llm_config=LLM_CONFIG
-)
+Use the process_story_to_code function to save your code."""
 
-# Register function for execution
-@coder_agent.register_for_execution()
-@coder_agent.register_for_llm(name="process_story_to_code", description="Generate code based on stories from workspace stories folder.")
-def process_story_to_code_wrapper() -> str:
-    """Wrapper function that uses workspace stories folder."""
-    return process_story_to_code() 
\ No newline at end of file
+def create_coder_agent():
+    """Build a new Coder agent with process_story_to_code registered as its tool."""
+    # Imported here so autogen is only loaded when an agent is first needed
+    from autogen import AssistantAgent
+    from src.config.settings import LLM_CONFIG
+    from src.tools.event_stream import streaming_llm_config
+    from src.tools.history_compaction import add_history_compaction
+    from src.tools.llm_cache import get_llm_cache
+
+    coder_agent = AssistantAgent(
+        name="Coder_Agent",
+        system_message=CODER_SYSTEM_MESSAGE,
+        llm_config=streaming_llm_config(LLM_CONFIG)
+    )
+
+    # Register function for execution
+    @coder_agent.register_for_execution()
+    @coder_agent.register_for_llm(name="process_story_to_code", description="Generate code based on stories from workspace stories folder.")
+    def process_story_to_code_wrapper() -> str:
+        """Wrapper function that uses workspace stories folder."""
+        return process_story_to_code()
+
+    coder_agent.client_cache = get_llm_cache(coder_agent.name)
+    add_history_compaction(coder_agent)
+    return coder_agent
+
+@lru_cache(maxsize=None)
+def get_coder_agent():
+    """Get the shared Coder agent, building it on first use."""
+    return create_coder_agent()
+
+def __getattr__(name):
+    # Keeps `from src.agents.coder_agent import coder_agent` working without
+    # building the agent at import time.
+    if name == "coder_agent":
+        return get_coder_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
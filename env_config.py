@@ -0,0 +1,21 @@
+import threading
+
+from dotenv import load_dotenv
+
+_loaded = False
+_lock = threading.Lock()
+
+
+def load_env() -> None:
+    """
+    Load the .env file into the environment, once per process.
+
+    Called on first use of a setting rather than at import time, so modules
+    can be imported without any configuration in place.
+    """
+    global _loaded
+    if not _loaded:
+        with _lock:
+            if not _loaded:
+                load_dotenv()
+                _loaded = True
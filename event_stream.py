@@ -0,0 +1,208 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Ask the LLM for streamed responses so token deltas reach the UI. Set LLM_STREAM=0 to disable.
+STREAM_TOKENS = os.getenv("LLM_STREAM", "1").lower() not in ("0", "false", "no")
+MAX_EVENTS = 10000  # events buffered per channel before the oldest are dropped
+MAX_TEXT_CHARS = 4000  # streamed text kept for display
+
+TOKEN = "token"
+TOOL_START = "tool_start"
+TOOL_FINISH = "tool_finish"
+PROGRESS = "progress"
+MESSAGE = "message"
+STORIES = "stories"  # stories for the UI to show, rendered by the script thread
+
+_current_channel: contextvars.ContextVar[Optional["EventChannel"]] = contextvars.ContextVar(
+    "event_channel", default=None)
+
+
+class EventChannel:
+    """
+    Thread-safe buffer of events from a running workflow step to the UI.
+
+    Producers publish from any thread; the UI drains whatever arrived since
+    its last rerun. Publishing never blocks: once max_events are waiting the
+    oldest are dropped.
+    """
+
+    def __init__(self, max_events: int = MAX_EVENTS):
+        self._events: deque = deque(maxlen=max_events)
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        with self._lock:
+            self._events.append(event)
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """Return and remove all buffered events, oldest first."""
+        with self._lock:
+            events = list(self._events)
+            self._events.clear()
+        return events
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def current_channel() -> Optional[EventChannel]:
+    """The channel events emitted in this context go to, if any."""
+    return _current_channel.get()
+
+
+def emit(event_type: str, **data: Any) -> None:
+    """
+    Publish an event to the current context's channel.
+
+    Does nothing when no channel is set, so tools can emit unconditionally.
+    """
+    channel = _current_channel.get()
+    if channel is not None:
+        channel.publish({"type": event_type, "time": time.time(), **data})
+
+
+@contextmanager
+def use_channel(channel: EventChannel) -> Iterator[EventChannel]:
+    """Send events emitted in this context, including autogen output, to channel."""
+    token = _current_channel.set(channel)
+    try:
+        with _autogen_output(channel):
+            yield channel
+    finally:
+        _current_channel.reset(token)
+
+
+class ChannelIOStream:
+    """
+    autogen IOStream that publishes agent output as events.
+
+    Streamed LLM chunks arrive as print(chunk, end="", flush=True) and are
+    published as token deltas; other output becomes message events.
+    """
+
+    def __init__(self, channel: EventChannel):
+        self.channel = channel
+
+    def print(self, *objects: Any, sep: str = " ", end: str = "\n", flush: bool = False) -> None:
+        text = sep.join(str(obj) for obj in objects)
+        event_type = TOKEN if end == "" else MESSAGE
+        self.channel.publish({"type": event_type, "time": time.time(), "text": text + end})
+
+    def input(self, prompt: str = "", *, password: bool = False) -> str:
+        # Agents run with human_input_mode="NEVER"; there is no terminal to read from
+        return ""
+
+
+def _autogen_output(channel: EventChannel):
+    try:
+        from autogen.io import IOStream
+    except ImportError:
+        return nullcontext()
+    return IOStream.set_default(ChannelIOStream(channel))
+
+
+def streaming_llm_config(llm_config: Dict) -> Dict:
+    """Copy of an agent's llm_config that streams responses when LLM_STREAM is on."""
+    if not STREAM_TOKENS or not isinstance(llm_config, dict):
+        return llm_config
+    return {**llm_config, "stream": True}
+
+
+class EventView:
+    """Running summary of a channel's events for display."""
+
+    def __init__(self):
+        self.text = ""
+        self.tools: Dict[str, Dict[str, Any]] = {}
+        self.progress: Dict[str, Dict[str, Any]] = {}
+        self.stories: Optional[List[Dict[str, Any]]] = None
+        self.first_event_at: Optional[float] = None
+
+    def update(self, events: List[Dict[str, Any]]) -> "EventView":
+        for event in events:
+            if self.first_event_at is None:
+                self.first_event_at = event["time"]
+            event_type = event["type"]
+            if event_type in (TOKEN, MESSAGE):
+                self.text = (self.text + event.get("text", ""))[-MAX_TEXT_CHARS:]
+            elif event_type == TOOL_START:
+                self.tools[event["tool"]] = {"status": "running", "agent": event.get("agent")}
+            elif event_type == TOOL_FINISH:
+                self.tools[event["tool"]] = {"status": event.get("status", "done"), "agent": event.get("agent"),
+                                             "seconds": event.get("seconds")}
+            elif event_type == PROGRESS:
+                self.progress[event["stage"]] = {"done": event.get("done", 0), "total": event.get("total")}
+            elif event_type == STORIES:
+                self.stories = event.get("stories", [])
+        return self
+
+
+class BackgroundRun:
+    """A function running on its own thread with an event channel for the UI."""
+
+    def __init__(self, fn: Callable, *args: Any, **kwargs: Any):
+        self.channel = EventChannel()
+        self.view = EventView()
+        self.future: Future = Future()
+        self.started_at = time.time()
+        context = contextvars.copy_context()
+
+        def target() -> None:
+            if not self.future.set_running_or_notify_cancel():
+                return
+            try:
+                with use_channel(self.channel):
+                    result = fn(*args, **kwargs)
+            except BaseException as e:
+                logger.error(f"Background run of {getattr(fn, '__name__', fn)} failed: {e}", exc_info=True)
+                self.future.set_exception(e)
+            else:
+                self.future.set_result(result)
+            finally:
+                self.channel.close()
+
+        self.thread = threading.Thread(target=context.run, args=(target,), daemon=True,
+                                       name=f"background-{getattr(fn, '__name__', 'run')}")
+        _attach_streamlit_context(self.thread)
+        self.thread.start()
+
+    def poll(self) -> EventView:
+        """Fold newly arrived events into the view and return it."""
+        return self.view.update(self.channel.drain())
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def result(self, timeout: Optional[float] = None) -> Any:
+        return self.future.result(timeout)
+
+
+def _attach_streamlit_context(thread: threading.Thread) -> None:
+    # Lets tools on the thread keep using the session's st.session_state
+    try:
+        from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+    except ImportError:
+        return
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is not None:
+        add_script_run_ctx(thread, ctx)
+
+
+def run_in_background(fn: Callable, *args: Any, **kwargs: Any) -> BackgroundRun:
+    """
+    Start fn(*args, **kwargs) on a background thread and return immediately.
+
+    Events emitted while it runs, including streamed LLM tokens, are
+    collected on the returned run's channel.
+    """
+    return BackgroundRun(fn, *args, **kwargs)
@@ -0,0 +1,78 @@
+import contextvars
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, MutableMapping, Optional
+
+_current_context: contextvars.ContextVar[Optional["ExecutionContext"]] = contextvars.ContextVar(
+    "execution_context", default=None)
+
+
+class ExecutionContext(MutableMapping):
+    """
+    State of one workflow run, shared by the agents and tools it calls.
+
+    Tools read and write it like st.session_state, but each workflow gets
+    its own, so concurrent workflows in one process cannot see or
+    overwrite each other's values.
+    """
+
+    def __init__(self, workflow_id: Optional[str] = None, **values: Any):
+        self.workflow_id = workflow_id
+        self._values: Dict[str, Any] = dict(values)
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key: str) -> Any:
+        with self._lock:
+            return self._values[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._values[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        with self._lock:
+            del self._values[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.snapshot())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._values)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """A copy of the current values."""
+        with self._lock:
+            return dict(self._values)
+
+    def __repr__(self) -> str:
+        return f"ExecutionContext(workflow_id={self.workflow_id!r}, {self.snapshot()!r})"
+
+
+@contextmanager
+def use_context(context: ExecutionContext) -> Iterator[ExecutionContext]:
+    """Make context the workflow state for code run in this block, on this thread."""
+    token = _current_context.set(context)
+    try:
+        yield context
+    finally:
+        _current_context.reset(token)
+
+
+def current_context() -> Optional[ExecutionContext]:
+    """The execution context bound to the running code, if any."""
+    return _current_context.get()
+
+
+def workflow_state() -> MutableMapping:
+    """
+    State of the workflow the calling tool is running for.
+
+    This is the bound ExecutionContext. Code called directly from a
+    Streamlit script, with no context bound, gets the session state.
+    """
+    context = _current_context.get()
+    if context is not None:
+        return context
+    import streamlit as st
+    return st.session_state
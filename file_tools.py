@@ -1,12 +1,85 @@
 import logging
-from typing import Union
-from .api_connector import read_file_from_api, write_file_to_api
+import os
+import threading
+from typing import Dict, Iterator, List, Optional, Union
+from .read_cache import get_read_cache
+from .storage import DEFAULT_CHUNK_SIZE, get_storage_backend
+from .write_behind import WriteBehindBuffer
 
 logger = logging.getLogger(__name__)
 
+_write_behind_enabled = os.getenv("FILE_WRITE_BEHIND", "").lower() in ("1", "true", "yes")
+_write_behind: Optional[WriteBehindBuffer] = None
+_write_behind_lock = threading.Lock()
+_last_backend = None
+
+def _backend():
+    """The configured storage backend. Buffered write hashes and cached reads are dropped when it changes."""
+    global _last_backend
+    backend = get_storage_backend()
+    if backend is not _last_backend:
+        if _last_backend is not None:
+            if _write_behind is not None:
+                _write_behind.forget()
+            get_read_cache().clear()
+        _last_backend = backend
+    return backend
+
+def _write_behind_store(file_path: str, content: str) -> bool:
+    try:
+        return _backend().write_file(file_path, content)
+    finally:
+        # Drop anything a reader cached while the write was queued
+        get_read_cache().invalidate(file_path)
+
+def _get_write_behind() -> WriteBehindBuffer:
+    global _write_behind
+    if _write_behind is None:
+        with _write_behind_lock:
+            if _write_behind is None:
+                _write_behind = WriteBehindBuffer(_write_behind_store)
+    return _write_behind
+
+def _forget_written(file_path: str) -> None:
+    # The file is changing outside the write-behind buffer
+    if _write_behind is not None:
+        _write_behind.forget(file_path)
+
+def enable_write_behind(enabled: bool = True) -> None:
+    """
+    Turn write-behind mode on or off for write_file.
+
+    Can also be enabled with FILE_WRITE_BEHIND=1. Turning it off flushes
+    any queued writes first.
+    """
+    global _write_behind_enabled
+    if not enabled and _write_behind is not None:
+        flush()
+    _write_behind_enabled = enabled
+
+def flush(timeout: Optional[float] = None) -> bool:
+    """
+    Durability barrier for write-behind mode: wait until queued writes are stored.
+
+    Args:
+        timeout (Optional[float]): Max seconds to wait, or None to wait indefinitely
+
+    Returns:
+        bool: True if every queued write succeeded, False on failure or timeout
+    """
+    if _write_behind is None:
+        return True
+    return _write_behind.flush(timeout)
+
 def read_file(file_path: str) -> str:
     """
-    Read content from a text file by calling an API.
+    Read content from a text file through the configured storage backend.
+
+    Results are kept in an in-process read-through cache. A cached copy is
+    revalidated against the storage by ETag/mtime on every read, so only
+    changed files are downloaded again. Setting FILE_CACHE_TTL serves cached
+    copies without revalidation for that many seconds, so changes made by
+    other processes can be missed for up to that long.
     
     Args:
         file_path (str): Path to the file to read
@@ -15,7 +88,33 @@ def read_file(file_path: str) -> str:
         str: Content of the file
     """
     try:
-        return read_file_from_api(file_path)
+        if _write_behind is not None:
+            pending = _write_behind.pending_content(file_path)
+            if pending is not None:
+                return pending
+
+        backend = _backend()
+        cache = get_read_cache()
+        token = cache.begin_read()
+        entry = cache.get(file_path)
+        if entry is not None:
+            if cache.is_fresh(entry):
+                cache.hits += 1
+                return entry.content
+            if entry.etag:
+                result = backend.read_file_with_meta(file_path, if_none_match=entry.etag)
+                if result["not_modified"]:
+                    cache.hits += 1
+                    cache.mark_validated(file_path)
+                    return entry.content
+                cache.misses += 1
+                cache.put(file_path, result["content"], result["etag"], token)
+                return result["content"]
+
+        cache.misses += 1
+        result = backend.read_file_with_meta(file_path)
+        cache.put(file_path, result["content"], result["etag"], token)
+        return result["content"]
     except Exception as e:
         logger.error(f"Error reading file {file_path}: {str(e)}")
         # Return a user-friendly error message or re-raise
@@ -23,7 +122,12 @@ def read_file(file_path: str) -> str:
 
 def write_file(file_path: str, content: Union[str, bytes]) -> bool:
     """
-    Write content to a file by calling an API.
+    Write content to a file through the configured storage backend.
+
+    In write-behind mode the write is queued and True is returned
+    immediately; repeated writes to a path are coalesced and unchanged
+    content is skipped. Call flush() before depending on the file being
+    stored.
     
     Args:
         file_path (str): Path to the file to write
@@ -37,7 +141,138 @@ def write_file(file_path: str, content: Union[str, bytes]) -> bool:
         if isinstance(content, bytes):
             content = content.decode('utf-8', errors='ignore')
         
-        return write_file_to_api(file_path, content)
+        backend = _backend()
+        if _write_behind_enabled:
+            get_read_cache().invalidate(file_path)
+            _get_write_behind().submit(file_path, content)
+            return True
+
+        _forget_written(file_path)
+        try:
+            return backend.write_file(file_path, content)
+        finally:
+            get_read_cache().invalidate(file_path)
     except Exception as e:
         logger.error(f"Error writing to file {file_path}: {str(e)}")
-        return False 
\ No newline at end of file
+        return False
+
+def append_file(file_path: str, content: str) -> bool:
+    """
+    Append content to a file through the configured storage backend.
+
+    Queued write-behind writes are flushed first so the append lands after
+    them, and the buffer stops treating the file as unchanged.
+
+    Args:
+        file_path (str): Path to the file to append to
+        content (str): Content to append
+
+    Returns:
+        bool: True if successful, False if error
+    """
+    try:
+        if _write_behind is not None:
+            if not flush():
+                raise Exception("queued writes could not be stored")
+            _forget_written(file_path)
+        try:
+            return _backend().append_file(file_path, content)
+        finally:
+            get_read_cache().invalidate(file_path)
+    except Exception as e:
+        logger.error(f"Error appending to file {file_path}: {str(e)}")
+        return False
+
+def list_files(directory: str) -> Dict[str, str]:
+    """
+    List the files in a directory of the configured storage backend.
+
+    Args:
+        directory (str): Directory to list, not recursively
+
+    Returns:
+        Dict[str, str]: A version string for each file, keyed by path, that
+        changes whenever the file does
+    """
+    if _write_behind is not None:
+        flush()
+    return _backend().list_files(directory)
+
+def supports_append() -> bool:
+    """Whether append_file appends natively rather than rewriting the whole file."""
+    return _backend().supports_append()
+
+def iter_file_chunks(file_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                     offset: int = 0, length: Optional[int] = None) -> Iterator[str]:
+    """
+    Read a file through the configured storage backend, chunk by chunk.
+
+    Args:
+        file_path (str): Path to the file to read
+        chunk_size (int): Max characters per chunk
+        offset (int): Character offset to start reading at
+        length (Optional[int]): Max characters to read, or None for the rest of the file
+
+    Yields:
+        str: Consecutive chunks of the file
+    """
+    return _backend().iter_file_chunks(file_path, chunk_size=chunk_size, offset=offset, length=length)
+
+def iter_file_lines(file_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Read a text file through the configured storage backend, one line at a time.
+
+    Lines are assembled across chunk boundaries and returned without their
+    trailing newline, so the whole file is never held in memory.
+
+    Args:
+        file_path (str): Path to the file to read
+        chunk_size (int): Max characters fetched per request
+
+    Yields:
+        str: Lines of the file
+    """
+    remainder = ""
+    for chunk in iter_file_chunks(file_path, chunk_size=chunk_size):
+        lines = (remainder + chunk).split('\n')
+        remainder = lines.pop()
+        yield from lines
+    if remainder:
+        yield remainder
+
+def read_files(file_paths: List[str]) -> Dict[str, Dict]:
+    """
+    Read several files through the configured storage backend.
+
+    Args:
+        file_paths (List[str]): Paths of the files to read
+
+    Returns:
+        Dict[str, Dict]: Per-file result keyed by path, with "status" and
+        either "content" or an error "message"
+    """
+    if _write_behind is not None:
+        flush()
+    return _backend().read_files(file_paths)
+
+def write_files(files: Dict[str, str]) -> Dict[str, Dict]:
+    """
+    Write several files through the configured storage backend.
+
+    Args:
+        files (Dict[str, str]): Mapping of file path to content
+
+    Returns:
+        Dict[str, Dict]: Per-file result keyed by path, with "status" and an
+        error "message" on failure
+    """
+    if _write_behind is not None:
+        flush()
+        for file_path in files:
+            _forget_written(file_path)
+    cache = get_read_cache()
+    try:
+        return _backend().write_files(files)
+    finally:
+        for file_path in files:
+            cache.invalidate(file_path)
@@ -1,11 +1,14 @@
 import logging
-import os
-from pathlib import Path
+from typing import Union
+from .file_tools import write_file as _write_file
 
 logger = logging.getLogger(__name__)
 
-def write_file(file_path: str, content: str) -> bool:
+def write_file(file_path: str, content: Union[str, bytes]) -> bool:
     """Write content to a file.
+
+    Kept for existing imports; writes go through file_tools and the
+    configured storage backend like every other agent file.
     
     Args:
         file_path: Path to the file to write
@@ -14,17 +17,4 @@ def write_file(file_path: str, content: str) -> bool:
     Returns:
         bool: True if successful, False otherwise
     """
-    try:
-        # Create directory if it doesn't exist
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        
-        # Write content to file
-        with open(file_path, 'w') as f:
-            f.write(content)
-            
-        logger.info(f"Successfully wrote to file: {file_path}")
-        return True
-        
-    except Exception as e:
-        logger.error(f"Error writing to file {file_path}: {str(e)}")
-        return False 
\ No newline at end of file
+    return _write_file(file_path, content)
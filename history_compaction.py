@@ -0,0 +1,235 @@
+import copy
+import hashlib
+import logging
+import os
+from collections import OrderedDict, deque
+from typing import Callable, Dict, List, Optional, Sequence
+
+try:
+    import tiktoken
+except ImportError:  # optional, a characters-per-token estimate is used when tiktoken is not installed
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOKEN_BUDGET = 6000
+DEFAULT_WINDOW = 20  # most recent messages kept by the sliding window
+DEFAULT_ELIDE_CHARS = 2000  # older messages longer than this are cut to a preview
+DEFAULT_CHECKPOINT_EVERY = 12  # messages folded into each summary checkpoint
+DEFAULT_MAX_SUMMARIES = 256  # block summaries memoized per checkpoint transform
+_CHARS_PER_TOKEN = 4
+
+Message = Dict
+
+
+def _content_text(message: Message) -> str:
+    content = message.get("content")
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return ""
+
+
+def estimate_tokens(messages: Sequence[Message], model: str = "gpt-4") -> int:
+    """
+    Estimate the prompt tokens a list of chat messages costs.
+
+    Uses tiktoken when it is installed, otherwise about four characters per token.
+    """
+    text = "".join(_content_text(m) + str(m.get("tool_calls") or "") for m in messages)
+    if tiktoken is not None:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+        return len(encoding.encode(text)) + 4 * len(messages)
+    return len(text) // _CHARS_PER_TOKEN + 4 * len(messages)
+
+
+def _is_tool_result(message: Message) -> bool:
+    return message.get("role") in ("tool", "function") or bool(message.get("tool_responses"))
+
+
+def _safe_start(messages: List[Message], start: int) -> int:
+    # A tool result must follow the assistant message that called the tool
+    while start < len(messages) and _is_tool_result(messages[start]):
+        start += 1
+    return start
+
+
+def _split_system(messages: List[Message]):
+    head = 0
+    while head < len(messages) and messages[head].get("role") == "system":
+        head += 1
+    return messages[:head], messages[head:]
+
+
+class SlidingWindow:
+    """Keeps system messages and the last max_messages other messages."""
+
+    def __init__(self, max_messages: int = DEFAULT_WINDOW):
+        self.max_messages = max_messages
+
+    def apply(self, messages: List[Message]) -> List[Message]:
+        system, rest = _split_system(messages)
+        if len(rest) <= self.max_messages:
+            return messages
+        return system + rest[_safe_start(rest, len(rest) - self.max_messages):]
+
+
+class ToolResultElision:
+    """
+    Cuts large older messages, such as file contents returned by tools,
+    down to a short preview.
+
+    The latest message is never elided, so the agent always sees the result
+    it is replying to. The agent's stored history keeps the full text.
+    """
+
+    def __init__(self, max_chars: int = DEFAULT_ELIDE_CHARS, preview_chars: int = 200):
+        self.max_chars = max_chars
+        self.preview_chars = preview_chars
+
+    def apply(self, messages: List[Message]) -> List[Message]:
+        result = []
+        for i, message in enumerate(messages):
+            text = message.get("content")
+            if (i == len(messages) - 1 or message.get("role") == "system"
+                    or not isinstance(text, str) or len(text) <= self.max_chars):
+                result.append(message)
+                continue
+            elided = copy.copy(message)
+            elided["content"] = f"{text[:self.preview_chars]}\n[... {len(text) - self.preview_chars} more characters elided]"
+            if "tool_responses" in elided:
+                elided["tool_responses"] = [dict(r, content=elided["content"]) for r in elided["tool_responses"]]
+            result.append(elided)
+        return result
+
+
+def extractive_summary(messages: Sequence[Message]) -> str:
+    """Cheap summary without an LLM call: the first line of each message."""
+    lines = []
+    for message in messages:
+        text = _content_text(message).strip()
+        if text:
+            first_line = text.splitlines()[0][:160]
+            lines.append(f"- {message.get('name') or message.get('role', 'unknown')}: {first_line}")
+    return "\n".join(lines)
+
+
+class SummaryCheckpoint:
+    """
+    Folds older messages into summary messages in blocks of every messages.
+
+    Summaries are memoized per block, so each block is summarized once
+    even though the hook runs on every turn. The memo keeps the
+    max_summaries most recently used blocks, so pooled agents that live
+    for many workflows do not grow it without limit. summarizer can be any
+    callable from messages to text, e.g. one that calls an LLM.
+    """
+
+    def __init__(self, every: int = DEFAULT_CHECKPOINT_EVERY, keep_recent: int = DEFAULT_CHECKPOINT_EVERY,
+                 summarizer: Callable[[Sequence[Message]], str] = extractive_summary,
+                 max_summaries: int = DEFAULT_MAX_SUMMARIES):
+        self.every = every
+        self.keep_recent = keep_recent
+        self.summarizer = summarizer
+        self.max_summaries = max_summaries
+        self._summaries: "OrderedDict[str, str]" = OrderedDict()
+
+    def apply(self, messages: List[Message]) -> List[Message]:
+        system, rest = _split_system(messages)
+        foldable = ((len(rest) - self.keep_recent) // self.every) * self.every
+        if foldable <= 0:
+            return messages
+        foldable = _safe_start(rest, foldable)
+        checkpoints = []
+        for start in range(0, foldable, self.every):
+            block = rest[start:min(start + self.every, foldable)]
+            key = hashlib.sha256(repr([(m.get("name"), _content_text(m)) for m in block]).encode("utf-8")).hexdigest()
+            checkpoints.append(self._summary(key, block))
+        summary = {"role": "user", "name": "history_summary",
+                   "content": "Summary of earlier conversation:\n" + "\n".join(checkpoints)}
+        return system + [summary] + rest[foldable:]
+
+    def _summary(self, key: str, block: List[Message]) -> str:
+        if key in self._summaries:
+            self._summaries.move_to_end(key)
+            return self._summaries[key]
+        summary = self.summarizer(block)
+        self._summaries[key] = summary
+        while len(self._summaries) > self.max_summaries:
+            self._summaries.popitem(last=False)
+        return summary
+
+
+class HistoryCompactor:
+    """
+    Compacts the messages an agent sends to its LLM.
+
+    Runs the transforms in order, then drops the oldest non-system messages
+    until the history fits the token budget. The agent's stored history is
+    not changed. Tokens saved per turn are logged and kept in turn_stats.
+    """
+
+    def __init__(self, transforms: Optional[List] = None, token_budget: int = DEFAULT_TOKEN_BUDGET,
+                 agent_name: str = "", model: str = "gpt-4"):
+        self.transforms = transforms if transforms is not None else default_transforms()
+        self.token_budget = token_budget
+        self.agent_name = agent_name
+        self.model = model
+        self.turn_stats: deque = deque(maxlen=100)
+        self.tokens_saved = 0
+
+    def compact(self, messages: List[Message]) -> List[Message]:
+        before = estimate_tokens(messages, self.model)
+        compacted = list(messages)
+        for transform in self.transforms:
+            compacted = transform.apply(compacted)
+
+        tokens = estimate_tokens(compacted, self.model)
+        if tokens > self.token_budget:
+            system, rest = _split_system(compacted)
+            start = 0
+            # Always keep the latest message
+            while start < len(rest) - 1 and tokens > self.token_budget:
+                start = _safe_start(rest, start + 1)
+                tokens = estimate_tokens(system + rest[start:], self.model)
+            compacted = system + rest[min(start, len(rest) - 1):]
+            tokens = estimate_tokens(compacted, self.model)
+
+        saved = before - tokens
+        self.turn_stats.append({"before": before, "after": tokens, "saved": saved})
+        self.tokens_saved += saved
+        if saved > 0:
+            logger.info(f"{self.agent_name}: compacted history {before} -> {tokens} tokens "
+                        f"(saved {saved}, {self.tokens_saved} this session)")
+        return compacted
+
+    def add_to_agent(self, agent) -> None:
+        """Install as an autogen capability via the process_all_messages_before_reply hook."""
+        agent.register_hook(hookable_method="process_all_messages_before_reply", hook=self.compact)
+
+
+def default_transforms() -> List:
+    return [ToolResultElision(), SummaryCheckpoint(), SlidingWindow()]
+
+
+def token_budget_for(agent_name: str) -> int:
+    """Token budget for an agent: HISTORY_TOKEN_BUDGET_<AGENT_NAME>, then HISTORY_TOKEN_BUDGET."""
+    specific = os.getenv(f"HISTORY_TOKEN_BUDGET_{agent_name.upper()}")
+    return int(specific or os.getenv("HISTORY_TOKEN_BUDGET", str(DEFAULT_TOKEN_BUDGET)))
+
+
+def add_history_compaction(agent) -> Optional[HistoryCompactor]:
+    """
+    Give an agent history compaction with its configured token budget.
+
+    Set HISTORY_COMPACTION=0 to leave agents unchanged.
+    """
+    if os.getenv("HISTORY_COMPACTION", "1").lower() in ("0", "false", "no"):
+        return None
+    compactor = HistoryCompactor(token_budget=token_budget_for(agent.name), agent_name=agent.name)
+    compactor.add_to_agent(agent)
+    return compactor
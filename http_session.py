@@ -0,0 +1,196 @@
+import gzip
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Defaults for the shared connection pool. Each can be overridden with the
+# matching environment variable.
+DEFAULT_POOL_CONNECTIONS = 10   # number of distinct hosts kept in the pool
+DEFAULT_POOL_MAXSIZE = 20       # max keep-alive connections per host
+DEFAULT_CONNECT_TIMEOUT = 5.0   # seconds
+DEFAULT_READ_TIMEOUT = 60.0     # seconds
+
+DEFAULT_COMPRESS_MIN_BYTES = 1024  # request bodies smaller than this are sent as-is
+
+try:
+    import zstandard
+except ImportError:  # optional, gzip is used when zstandard is not installed
+    zstandard = None
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+# Hosts that rejected a compressed request body; later requests to them are
+# sent uncompressed without another failed attempt.
+_compression_rejected_hosts: Set[str] = set()
+
+# Statuses a service answers with when it cannot decode Content-Encoding
+_COMPRESSION_REJECTED_STATUSES = (400, 415, 422)
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        logger.warning(f"Invalid integer for {name}: {value!r}, using {default}")
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        logger.warning(f"Invalid number for {name}: {value!r}, using {default}")
+        return default
+
+
+def get_timeout() -> Tuple[float, float]:
+    """
+    Get the (connect, read) timeout used for tool service calls.
+
+    Returns:
+        Tuple[float, float]: Connect and read timeouts in seconds.
+    """
+    return (
+        _env_float("TOOL_HTTP_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT),
+        _env_float("TOOL_HTTP_READ_TIMEOUT", DEFAULT_READ_TIMEOUT),
+    )
+
+
+def _build_session() -> requests.Session:
+    pool_connections = _env_int("TOOL_HTTP_POOL_CONNECTIONS", DEFAULT_POOL_CONNECTIONS)
+    pool_maxsize = _env_int("TOOL_HTTP_POOL_MAXSIZE", DEFAULT_POOL_MAXSIZE)
+
+    session = requests.Session()
+    # pool_block=True caps the number of open connections per host at
+    # pool_maxsize; extra callers wait for a free connection instead of
+    # opening throwaway ones.
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        pool_block=True,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"Connection": "keep-alive"})
+
+    logger.info(
+        f"Created pooled HTTP session (pool_connections={pool_connections}, "
+        f"pool_maxsize={pool_maxsize})"
+    )
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+    Get the process-wide pooled HTTP session for tool service calls.
+
+    The session is created on first use and shared by every caller in the
+    process, including concurrent Streamlit sessions, so keep-alive
+    connections are reused instead of paying a new handshake per call.
+
+    Returns:
+        requests.Session: The shared session.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def close_session() -> None:
+    """Close the shared session and drop its pooled connections."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+            logger.info("Closed pooled HTTP session")
+
+
+def _request_encoding(host: Optional[str] = None) -> Optional[str]:
+    # Off unless enabled: the tool service must be able to decode Content-Encoding
+    encoding = os.getenv("TOOL_HTTP_COMPRESSION", "none").lower()
+    if encoding in ("", "none", "identity") or host in _compression_rejected_hosts:
+        return None
+    if encoding == "zstd" and zstandard is None:
+        logger.warning("zstd compression requested but zstandard is not installed, using gzip")
+        return "gzip"
+    return encoding if encoding in ("gzip", "zstd") else "gzip"
+
+
+def encode_json_body(payload: Any, host: Optional[str] = None) -> Tuple[bytes, Dict[str, str]]:
+    """
+    Serialize a JSON request body, compressing it if it is large enough.
+
+    When TOOL_HTTP_COMPRESSION is set to gzip or zstd (zstd needs
+    zstandard installed), bodies of at least TOOL_HTTP_COMPRESS_MIN_BYTES
+    are compressed; otherwise, and for hosts that rejected a compressed
+    body, they are sent as plain JSON. Compression is off by default.
+
+    Args:
+        payload (Any): JSON-serializable request body.
+        host (Optional[str]): Host the body is sent to.
+
+    Returns:
+        Tuple[bytes, Dict[str, str]]: Body bytes and the headers to send with it.
+    """
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    headers = {"Content-Type": "application/json"}
+
+    encoding = _request_encoding(host)
+    if encoding is None or len(body) < _env_int("TOOL_HTTP_COMPRESS_MIN_BYTES", DEFAULT_COMPRESS_MIN_BYTES):
+        return body, headers
+
+    if encoding == "zstd":
+        body = zstandard.ZstdCompressor(level=3).compress(body)
+    else:
+        body = gzip.compress(body, compresslevel=5)
+    headers["Content-Encoding"] = encoding
+    return body, headers
+
+
+def post_json(url: str, payload: Any) -> requests.Response:
+    """
+    POST a JSON body through the shared session.
+
+    Large bodies are compressed if enabled (see encode_json_body).
+    Responses are decompressed transparently from whatever Accept-Encoding
+    the session negotiated. If the server answers 400, 415 or 422 to a
+    compressed body, the request is retried uncompressed and request
+    compression is turned off for that host for the rest of the process.
+
+    Args:
+        url (str): Request URL.
+        payload (Any): JSON-serializable request body.
+
+    Returns:
+        requests.Response: The response. Status is not checked.
+    """
+    host = urlsplit(url).netloc
+    body, headers = encode_json_body(payload, host)
+    response = get_session().post(url, data=body, headers=headers, timeout=get_timeout())
+
+    if response.status_code in _COMPRESSION_REJECTED_STATUSES and "Content-Encoding" in headers:
+        logger.warning(f"{host} answered {response.status_code} to a compressed request body, "
+                       f"disabling request compression for it")
+        _compression_rejected_hosts.add(host)
+        body, headers = encode_json_body(payload, host)
+        response = get_session().post(url, data=body, headers=headers, timeout=get_timeout())
+    return response
@@ -1,45 +1,68 @@
-from autogen import ConversableAgent
-from src.config.settings import LLM_CONFIG
 import logging
 import json
+from functools import lru_cache
 from pathlib import Path
 import os
-from src.agents.executor_agent import create_jira_stories
 
 logger = logging.getLogger(__name__)
 
-# Define the llm_config with the tool schema for the Jira Agent
-llm_config_with_tool = LLM_CONFIG.copy()
-llm_config_with_tool["tools"] = [
-    {
-        "type": "function",
-        "function": {
-            "name": "create_jira_stories",
-            "description": "Create Jira stories from a JSON file containing user stories.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "stories_file_path": {
-                        "type": "string",
-                        "description": "The absolute path to the JSON file containing the stories."
-                    }
-                },
-                "required": ["stories_file_path"]
-            }
+# Tool schema for create_jira_stories, added to the Jira Agent's llm_config
+CREATE_JIRA_STORIES_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "create_jira_stories",
+        "description": "Create Jira stories from a JSON file containing user stories.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "stories_file_path": {
+                    "type": "string",
+                    "description": "The absolute path to the JSON file containing the stories."
+                }
+            },
+            "required": ["stories_file_path"]
         }
     }
-]
+}
 
-jira_agent = ConversableAgent(
-    name="Jira_Agent",
-    system_message="""You are a Jira agent responsible for creating and managing Jira tickets.
+def create_jira_agent():
+    """Build a new Jira agent wired to the create_jira_stories tool."""
+    # Imported here so autogen and the Jira tooling are only loaded when an
+    # agent is first needed
+    from autogen import ConversableAgent
+    from src.config.settings import LLM_CONFIG
+    from src.tools.event_stream import streaming_llm_config
+    from src.tools.history_compaction import add_history_compaction
+    from src.tools.jira_tool import create_jira_stories_from_file
+    from src.tools.llm_cache import get_llm_cache
+
+    # Define the llm_config with the tool schema for the Jira Agent
+    llm_config_with_tool = LLM_CONFIG.copy()
+    llm_config_with_tool["tools"] = [CREATE_JIRA_STORIES_TOOL]
+
+    jira_agent = ConversableAgent(
+        name="Jira_Agent",
+        system_message="""You are a Jira agent responsible for creating and managing Jira tickets.
     When given a file path to stories, call the create_jira_stories tool to create the tickets.
     Do not ask for confirmation. Call the tool directly with the provided file path.""",
-    llm_config=llm_config_with_tool,
-    human_input_mode="NEVER",
-    max_consecutive_auto_reply=1,
-    code_execution_config=False,
-    function_map={"create_jira_stories": create_jira_stories}  # Register the function from executor agent
-)
+        llm_config=streaming_llm_config(llm_config_with_tool),
+        human_input_mode="NEVER",
+        max_consecutive_auto_reply=1,
+        code_execution_config=False,
+        function_map={"create_jira_stories": create_jira_stories_from_file}
+    )
+    jira_agent.client_cache = get_llm_cache(jira_agent.name)
+    add_history_compaction(jira_agent)
+    return jira_agent
 
+@lru_cache(maxsize=None)
+def get_jira_agent():
+    """Get the shared Jira agent, building it on first use."""
+    return create_jira_agent()
 
+def __getattr__(name):
+    # Keeps `from src.agents.jira_agent import jira_agent` working without
+    # building the agent at import time.
+    if name == "jira_agent":
+        return get_jira_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
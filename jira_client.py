@@ -0,0 +1,139 @@
+import hashlib
+import logging
+import os
+import threading
+from typing import TYPE_CHECKING, Dict, NamedTuple, Optional, Tuple
+
+from .env_config import load_env
+
+if TYPE_CHECKING:
+    from atlassian import Jira
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_MAXSIZE = 20
+DEFAULT_TIMEOUT = 75
+
+
+class JiraSettings(NamedTuple):
+    url: str
+    username: str
+    api_token: str
+    project_key: str
+
+    @property
+    def cache_key(self) -> Tuple[str, str, str]:
+        return (self.url, self.username, self.project_key)
+
+
+def get_jira_settings() -> JiraSettings:
+    """
+    Read Jira connection settings from the environment.
+
+    Returns:
+        JiraSettings: URL, username, API token and project key.
+
+    Raises:
+        ValueError: If a required variable is missing.
+    """
+    load_env()
+    jira_url = os.getenv("JIRA_INSTANCE_URL")
+    jira_username = os.getenv("JIRA_USERNAME")
+    jira_api_token = os.getenv("JIRA_API_TOKEN")
+
+    if not all([jira_url, jira_username, jira_api_token]):
+        missing = [v for v, k in {"JIRA_INSTANCE_URL": jira_url, "JIRA_USERNAME": jira_username, "JIRA_API_TOKEN": jira_api_token}.items() if not k]
+        error_msg = f"Missing Jira environment variables: {', '.join(missing)}"
+        logger.error(error_msg)
+        raise ValueError(error_msg)
+
+    return JiraSettings(
+        url=jira_url,
+        username=jira_username,
+        api_token=jira_api_token,
+        project_key=os.getenv("JIRA_PROJECT_KEY", "SDLC"),
+    )
+
+
+def _token_fingerprint(api_token: str) -> str:
+    return hashlib.sha256(api_token.encode("utf-8")).hexdigest()
+
+
+# cache key -> (token fingerprint, client)
+_clients: Dict[Tuple[str, str, str], Tuple[str, "Jira"]] = {}
+_clients_lock = threading.Lock()
+
+
+def _build_client(settings: JiraSettings) -> "Jira":
+    # Imported here so the atlassian client is only loaded when Jira is used
+    import requests
+    from atlassian import Jira
+    from requests.adapters import HTTPAdapter
+
+    pool_maxsize = int(os.getenv("JIRA_HTTP_POOL_MAXSIZE", DEFAULT_POOL_MAXSIZE))
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    jira = Jira(
+        url=settings.url,
+        username=settings.username,
+        password=settings.api_token,
+        cloud=True,
+        session=session,
+        timeout=int(os.getenv("JIRA_HTTP_TIMEOUT", DEFAULT_TIMEOUT)),
+    )
+    logger.info(f"Jira client initialized with URL {settings.url} (pool_maxsize={pool_maxsize})")
+    return jira
+
+
+def get_jira_client(settings: Optional[JiraSettings] = None) -> "Jira":
+    """
+    Get a cached Jira client for the given settings.
+
+    Clients are created lazily, keyed by URL, username and project, and reused
+    across calls and threads so stories go through one warm connection pool.
+    A client is rebuilt automatically if the API token changed.
+
+    Args:
+        settings (Optional[JiraSettings]): Settings to use. Read from the
+            environment if not given.
+
+    Returns:
+        Jira: The shared client.
+    """
+    settings = settings or get_jira_settings()
+    fingerprint = _token_fingerprint(settings.api_token)
+
+    entry = _clients.get(settings.cache_key)
+    if entry and entry[0] == fingerprint:
+        return entry[1]
+
+    with _clients_lock:
+        entry = _clients.get(settings.cache_key)
+        if entry and entry[0] == fingerprint:
+            return entry[1]
+        if entry:
+            logger.info(f"Jira credentials changed for {settings.url}, rebuilding client")
+            entry[1].session.close()
+        jira = _build_client(settings)
+        _clients[settings.cache_key] = (fingerprint, jira)
+        return jira
+
+
+def invalidate_jira_client(settings: Optional[JiraSettings] = None) -> None:
+    """
+    Drop cached Jira clients, e.g. after credentials were rotated.
+
+    Args:
+        settings (Optional[JiraSettings]): Only drop the client for these
+            settings. Drops every cached client if not given.
+    """
+    with _clients_lock:
+        keys = [settings.cache_key] if settings else list(_clients)
+        for key in keys:
+            entry = _clients.pop(key, None)
+            if entry:
+                entry[1].session.close()
+                logger.info(f"Invalidated Jira client for {key[0]} ({key[1]}, {key[2]})")
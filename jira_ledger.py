@@ -0,0 +1,294 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Reservations older than this are assumed abandoned by a crashed process
+RESERVATION_SECONDS = float(os.getenv("JIRA_RESERVATION_SECONDS", "300"))
+# How long reserve() waits for another workflow creating the same story
+RESERVATION_WAIT = float(os.getenv("JIRA_RESERVATION_WAIT", "120"))
+POLL_SECONDS = 0.2  # reserve() re-checks at least this often for other processes
+
+
+def story_hash(project_key: str, summary: str, description: str) -> str:
+    """
+    Content hash identifying a story within a Jira project.
+
+    Args:
+        project_key (str): Jira project key.
+        summary (str): Story summary.
+        description (str): Story description.
+
+    Returns:
+        str: Hex SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    for part in (project_key, summary, description):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _default_ledger_path() -> str:
+    project_root = str(Path(__file__).parent.parent.parent)
+    return os.getenv("JIRA_LEDGER_PATH", os.path.join(project_root, "data", "jira_ledger.sqlite3"))
+
+
+class JiraLedger:
+    """
+    Persistent record of stories that have already become Jira issues.
+
+    Lets a retried or re-approved workflow skip stories it created before.
+    A story hash is reserved before its issue is created, so two workflows
+    (or two copies of a story in one batch) never both create it. Stories
+    whose create may or may not have reached Jira are kept as unresolved and
+    are not created again until resolve() is called for them.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or _default_ledger_path()
+        if os.path.dirname(self.db_path):
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._changed = threading.Condition()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.executescript(
+            """CREATE TABLE IF NOT EXISTS created_issues (
+                   story_hash TEXT PRIMARY KEY,
+                   issue_key TEXT NOT NULL,
+                   project_key TEXT NOT NULL,
+                   summary TEXT,
+                   created_at TEXT NOT NULL
+               );
+               CREATE TABLE IF NOT EXISTS reservations (
+                   story_hash TEXT PRIMARY KEY,
+                   reserved_at REAL NOT NULL
+               );
+               CREATE TABLE IF NOT EXISTS unresolved (
+                   story_hash TEXT PRIMARY KEY,
+                   project_key TEXT NOT NULL,
+                   summary TEXT,
+                   recorded_at TEXT NOT NULL
+               );"""
+        )
+        logger.info(f"Jira ledger opened at {self.db_path}")
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Return the issue key recorded for a story hash, if any."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT issue_key FROM created_issues WHERE story_hash = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def lookup_many(self, keys: list) -> Dict[str, str]:
+        """Return {story hash: issue key} for the hashes already recorded."""
+        found: Dict[str, str] = {}
+        keys = list(keys)
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT story_hash, issue_key FROM created_issues WHERE story_hash IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                found.update(dict(rows))
+        return found
+
+    def reserve_many(self, keys: list) -> Tuple[Set[str], Dict[str, str]]:
+        """
+        Reserve story hashes that are neither created, reserved nor unresolved, without waiting.
+
+        Returns:
+            Tuple[Set[str], Dict[str, str]]: The hashes this call reserved, and
+            {story hash: issue key} for those already created. The caller must
+            record() or release() every hash it reserved.
+        """
+        won: Set[str] = set()
+        found: Dict[str, str] = {}
+        keys = list(dict.fromkeys(keys))
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM reservations WHERE reserved_at < ?",
+                                   (time.time() - RESERVATION_SECONDS,))
+                for i in range(0, len(keys), 500):
+                    chunk = keys[i:i + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    found.update(self._conn.execute(
+                        f"SELECT story_hash, issue_key FROM created_issues WHERE story_hash IN ({placeholders})",
+                        chunk,
+                    ).fetchall())
+                unresolved = self._unresolved_in(keys)
+                now = time.time()
+                for key in keys:
+                    if key in found or key in unresolved:
+                        continue
+                    cursor = self._conn.execute(
+                        "INSERT OR IGNORE INTO reservations VALUES (?, ?)", (key, now))
+                    if cursor.rowcount:
+                        won.add(key)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return won, found
+
+    def reserve(self, key: str, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Reserve a story hash before creating its issue.
+
+        If another caller holds the reservation, waits until it records the
+        issue or releases the hash.
+
+        Args:
+            key (str): Story hash.
+            timeout (Optional[float]): Max seconds to wait (JIRA_RESERVATION_WAIT by default).
+
+        Returns:
+            Optional[str]: None if the caller now holds the reservation and
+            should create the issue, otherwise the issue key already recorded.
+
+        Raises:
+            Exception: If the hash is still reserved by someone else after
+                timeout, or is unresolved.
+        """
+        deadline = time.monotonic() + (RESERVATION_WAIT if timeout is None else timeout)
+        while True:
+            won, found = self.reserve_many([key])
+            if key in found:
+                return found[key]
+            if won:
+                return None
+            if self.unresolved_many([key]):
+                raise Exception(f"Story {key[:12]} may already exist in Jira; resolve it before creating it again")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise Exception(f"Story {key[:12]} is still being created by another workflow")
+            with self._changed:
+                self._changed.wait(min(remaining, POLL_SECONDS))
+
+    def record(self, key: str, issue_key: str, project_key: str, summary: str = "") -> None:
+        """Record that the story with this hash was created as issue_key, ending its reservation."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO created_issues VALUES (?, ?, ?, ?, ?)",
+                    (key, issue_key, project_key, summary, datetime.now().isoformat()),
+                )
+                self._conn.execute("DELETE FROM reservations WHERE story_hash = ?", (key,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        with self._changed:
+            self._changed.notify_all()
+
+    def _unresolved_in(self, keys: list) -> Set[str]:
+        # Callers hold self._lock
+        unresolved: Set[str] = set()
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            unresolved.update(key for key, in self._conn.execute(
+                f"SELECT story_hash FROM unresolved WHERE story_hash IN ({placeholders})", chunk))
+        return unresolved
+
+    def unresolved_many(self, keys: list) -> Set[str]:
+        """Return the story hashes that are unresolved."""
+        with self._lock:
+            return self._unresolved_in(list(keys))
+
+    def unresolved(self) -> List[Dict[str, str]]:
+        """Unresolved stories, oldest first, for a reconcile step or an operator to check in Jira."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT story_hash, project_key, summary, recorded_at FROM unresolved ORDER BY recorded_at"
+            ).fetchall()
+        return [{"story_hash": key, "project_key": project_key, "summary": summary, "recorded_at": recorded_at}
+                for key, project_key, summary, recorded_at in rows]
+
+    def mark_unresolved(self, key: str, project_key: str, summary: str = "") -> None:
+        """
+        Record that a reserved story may or may not have been created, ending its reservation.
+
+        The story is not created again until resolve() is called for it.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO unresolved VALUES (?, ?, ?, ?)",
+                    (key, project_key, summary, datetime.now().isoformat()),
+                )
+                self._conn.execute("DELETE FROM reservations WHERE story_hash = ?", (key,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        with self._changed:
+            self._changed.notify_all()
+
+    def resolve(self, key: str, issue_key: Optional[str] = None, project_key: str = "", summary: str = "") -> None:
+        """
+        Settle an unresolved story.
+
+        Args:
+            key (str): Story hash.
+            issue_key (Optional[str]): The issue found in Jira, recorded as
+                created. None if Jira has no such issue, so the story may be
+                created again.
+            project_key (str): Jira project key, when recording an issue.
+            summary (str): Story summary, when recording an issue.
+        """
+        if issue_key:
+            self.record(key, issue_key, project_key, summary)
+        with self._lock:
+            self._conn.execute("DELETE FROM unresolved WHERE story_hash = ?", (key,))
+        with self._changed:
+            self._changed.notify_all()
+
+    def refresh(self, keys) -> None:
+        """Renew reservations still held, so a long batch keeps them past JIRA_RESERVATION_SECONDS."""
+        keys = list(keys)
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                self._conn.execute(
+                    f"UPDATE reservations SET reserved_at = ? WHERE story_hash IN ({placeholders})", [now, *chunk])
+
+    def release(self, key: str) -> None:
+        """Give up a reservation without recording an issue, e.g. after a failed create."""
+        with self._lock:
+            self._conn.execute("DELETE FROM reservations WHERE story_hash = ?", (key,))
+        with self._changed:
+            self._changed.notify_all()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_ledger: Optional[JiraLedger] = None
+_ledger_lock = threading.Lock()
+
+
+def get_jira_ledger() -> JiraLedger:
+    """Get the process-wide Jira ledger, opening it on first use."""
+    global _ledger
+    if _ledger is None:
+        with _ledger_lock:
+            if _ledger is None:
+                _ledger = JiraLedger()
+    return _ledger
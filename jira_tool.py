@@ -1,13 +1,69 @@
+import json
 import logging
-from typing import Dict
-from .api_connector import create_jira_story_in_api
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+import requests
+from .api_connector import create_jira_story_in_api, create_jira_stories_bulk_in_api, find_jira_story_in_api
+from .event_stream import PROGRESS, emit
+from .jira_client import get_jira_settings
+from .jira_ledger import get_jira_ledger, story_hash
+from .rate_limiter import AdaptiveRateLimiter, get_jira_rate_limiter, parse_retry_after
+from .story_index import get_story_index
+from .story_io import iter_stories
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Batches at least this large are created through Jira's bulk endpoint
+BULK_MIN_STORIES = int(os.getenv("JIRA_BULK_MIN_STORIES", "20"))
+
+def _ledger_key(input_dict: Dict, project_key: str) -> str:
+    return story_hash(project_key, input_dict.get("summary", "New User Story"), input_dict.get("description", ""))
+
+def _record_created(ledger, key: str, issue_key: str, project_key: str, story: Dict) -> None:
+    """Record a created story in the ledger and the near-duplicate story index."""
+    ledger.record(key, issue_key, project_key, story.get("summary", ""))
+    _index_created(issue_key, story)
+
+def _index_created(issue_key: str, story: Dict) -> None:
+    try:
+        get_story_index().add(story, source="jira", issue_key=issue_key)
+    except Exception as e:
+        # The index only drives duplicate warnings; never fail a created story on it
+        logger.warning(f"Tool: Could not add {issue_key} to the story index: {e}")
+
+def _create_reserved(ledger, key: str, project_key: str, story: Dict, create: Callable[[Dict], str]) -> Dict:
+    """
+    Create a story unless the ledger already has it.
+
+    The story's ledger hash is reserved first and held while Jira is called,
+    so concurrent callers with the same story wait and reuse the issue key.
+    """
+    existing_key = ledger.reserve(key)
+    if existing_key:
+        return {"status": "success", "key": existing_key, "reused": True}
+    try:
+        issue_key = create(story)
+    except Exception:
+        ledger.release(key)
+        raise
+    _record_created(ledger, key, issue_key, project_key, story)
+    return {"status": "success", "key": issue_key}
+
+def _create_one(story: Dict) -> str:
+    return _create_with_backoff(story, get_jira_rate_limiter(), _max_retries())
+
 def create_jira_story(input_dict: Dict) -> str:
     """
     Create a Jira story by calling the API connector.
+
+    The call waits on the shared Jira rate limiter and is retried on 429/503,
+    honouring Retry-After (up to JIRA_MAX_RETRIES times). Stories already
+    recorded in the Jira ledger are not created again; the existing issue
+    key is returned instead. If another workflow is creating the same story,
+    this waits for its issue key.
     
     Args:
         input_dict (Dict): Dictionary containing story details like summary and description.
@@ -17,10 +73,293 @@ def create_jira_story(input_dict: Dict) -> str:
     """
     logger.info(f"Tool: Received request to create Jira story with data: {input_dict}")
     try:
-        issue_key = create_jira_story_in_api(input_dict)
-        logger.info(f"Tool: Successfully created Jira story: {issue_key}")
-        return issue_key
+        project_key = get_jira_settings().project_key
+        ledger = get_jira_ledger()
+        result = _create_reserved(ledger, _ledger_key(input_dict, project_key), project_key, input_dict, _create_one)
+        if result.get("reused"):
+            logger.info(f"Tool: Story already created as {result['key']}, skipping")
+        else:
+            logger.info(f"Tool: Successfully created Jira story: {result['key']}")
+        return result["key"]
     except Exception as e:
         logger.error(f"Tool: Error creating Jira story: {str(e)}")
         # Re-raise the exception to be handled by the agent
-        raise
\ No newline at end of file
+        raise
+
+def create_jira_stories_bulk(stories: List[Dict]) -> List[Dict]:
+    """
+    Create many Jira stories using Jira's bulk-create endpoint.
+
+    Use this for large batches; create_jira_story remains the per-story path.
+    Requests share the Jira rate limiter and are retried on 429/503. Stories
+    already in the Jira ledger are skipped and returned with their existing
+    key and "reused": True. Stories whose bulk request had an unknown outcome
+    are left unresolved in the ledger and reported with status "unknown";
+    they are looked up again on later runs and never re-created until found
+    missing by reconcile_unresolved_stories or resolved by an operator.
+
+    Args:
+        stories (List[Dict]): Stories with summary and description.
+
+    Returns:
+        List[Dict]: One result per story in input order, each with a "status"
+        ("success", "error" or "unknown") and either the created "key" or a
+        "message".
+    """
+    logger.info(f"Tool: Received request to create {len(stories)} Jira stories in bulk")
+    project_key = get_jira_settings().project_key
+    ledger = get_jira_ledger()
+    keys = [_ledger_key(story, project_key) for story in stories]
+    # Stories left unresolved by an earlier run may have shown up in Jira's search since
+    unresolved = ledger.unresolved_many(keys)
+    if unresolved:
+        _find_unresolved(ledger, project_key, [(key, story) for key, story in zip(keys, stories) if key in unresolved])
+    reserved, existing = ledger.reserve_many(keys)
+    unresolved = ledger.unresolved_many(keys)
+    # Reservations this call still holds; any left when it stops are released
+    held = set(reserved)
+
+    results: List[Optional[Dict]] = [None] * len(stories)
+    pending = []
+    # Stories reserved by another workflow, or repeated in this batch, are
+    # created one at a time afterwards, which waits for the first creator
+    later = []
+    for i, key in enumerate(keys):
+        if key in existing:
+            results[i] = {"status": "success", "key": existing[key], "reused": True}
+        elif key in reserved:
+            reserved.discard(key)
+            pending.append(i)
+        elif key in unresolved:
+            results[i] = {"status": "unknown",
+                          "message": "An earlier bulk request may have created this story; not retried to avoid duplicates"}
+        else:
+            later.append(i)
+    if existing:
+        logger.info(f"Tool: {len(existing)} stories already created, skipping them")
+
+    limiter = get_jira_rate_limiter()
+    max_retries = _max_retries()
+
+    def throttle(call: Callable[[], Any]) -> Any:
+        # Renewed before every Jira request so batches longer than the reservation TTL keep theirs
+        ledger.refresh(held)
+        return _call_with_backoff(call, limiter, max_retries)
+
+    try:
+        created = create_jira_stories_bulk_in_api([stories[i] for i in pending], throttle=throttle)
+        for i, result in zip(pending, created):
+            if result["status"] == "success":
+                _record_created(ledger, keys[i], result["key"], project_key, stories[i])
+            elif result["status"] == "unknown":
+                ledger.mark_unresolved(keys[i], project_key, stories[i].get("summary", ""))
+            else:
+                ledger.release(keys[i])
+            held.discard(keys[i])
+            results[i] = result
+    finally:
+        for key in held:
+            ledger.release(key)
+
+    for i in later:
+        try:
+            results[i] = _create_reserved(ledger, keys[i], project_key, stories[i], _create_one)
+        except Exception as e:
+            results[i] = {"status": "error", "message": str(e)}
+    emit(PROGRESS, stage="jira", done=len(stories), total=len(stories))
+
+    failed = [i for i, result in enumerate(results) if result["status"] == "error"]
+    if failed:
+        logger.error(f"Tool: {len(failed)} of {len(stories)} Jira stories failed: indexes {failed}")
+    unknown = [i for i, result in enumerate(results) if result["status"] == "unknown"]
+    if unknown:
+        logger.error(f"Tool: {len(unknown)} Jira stories may or may not exist and are left unresolved: indexes {unknown}")
+    return results
+
+def _find_unresolved(ledger, project_key: str, entries: List) -> List[str]:
+    """Record each unresolved (story hash, story) found in Jira by summary; return the hashes still missing."""
+    missing = []
+    for key, story in entries:
+        summary = story.get("summary", "New User Story")
+        try:
+            issue_key = _call_with_backoff(lambda: find_jira_story_in_api(summary), get_jira_rate_limiter(),
+                                           _max_retries())
+        except Exception as e:
+            logger.warning(f"Tool: Could not look up unresolved story {summary!r}: {e}")
+            issue_key = None
+        if issue_key:
+            logger.info(f"Tool: Unresolved story {summary!r} found in Jira as {issue_key}")
+            ledger.resolve(key, issue_key, project_key, summary)
+            _index_created(issue_key, story)
+        else:
+            missing.append(key)
+    return missing
+
+def reconcile_unresolved_stories(release_missing: bool = False) -> Dict:
+    """
+    Look up every story left unresolved by a bulk request with an unknown outcome.
+
+    Stories found in Jira are recorded in the ledger. Stories still missing
+    stay unresolved, unless release_missing is True, which lets them be
+    created again; only pass it once Jira's search index has caught up.
+
+    Args:
+        release_missing (bool): Release stories that are not found.
+
+    Returns:
+        Dict: "found" and "missing" counts, and "missing_summaries".
+    """
+    ledger = get_jira_ledger()
+    entries = ledger.unresolved()
+    by_key = {entry["story_hash"]: entry for entry in entries}
+    missing = []
+    for project_key in {entry["project_key"] for entry in entries}:
+        missing += _find_unresolved(ledger, project_key, [
+            (entry["story_hash"], {"summary": entry["summary"]}) for entry in entries
+            if entry["project_key"] == project_key])
+    if release_missing:
+        for key in missing:
+            ledger.resolve(key)
+    logger.info(f"Tool: Reconciled {len(entries)} unresolved Jira stories, {len(missing)} not found")
+    return {"found": len(entries) - len(missing), "missing": len(missing),
+            "missing_summaries": [by_key[key]["summary"] for key in missing]}
+
+THROTTLE_STATUS_CODES = (429, 503)
+
+def _throttle_response(error: Exception) -> Optional[requests.Response]:
+    """Return the HTTP response if the error (or its cause) is a 429/503 from Jira."""
+    while error is not None:
+        response = getattr(error, "response", None)
+        if response is not None and response.status_code in THROTTLE_STATUS_CODES:
+            return response
+        error = error.__cause__
+    return None
+
+def _max_retries() -> int:
+    return int(os.getenv("JIRA_MAX_RETRIES", "5"))
+
+def _call_with_backoff(call: Callable[[], Any], limiter: AdaptiveRateLimiter, max_retries: int) -> Any:
+    """Make one Jira request, waiting on the limiter and retrying throttled calls."""
+    for attempt in range(max_retries + 1):
+        limiter.acquire()
+        try:
+            result = call()
+        except Exception as e:
+            response = _throttle_response(e)
+            if response is None or attempt == max_retries:
+                raise
+            limiter.on_throttle(parse_retry_after(response.headers.get("Retry-After")))
+            continue
+        limiter.on_success()
+        return result
+
+def _create_with_backoff(input_dict: Dict, limiter: AdaptiveRateLimiter, max_retries: int) -> str:
+    """Create one story, waiting on the limiter and retrying throttled calls."""
+    return _call_with_backoff(lambda: create_jira_story_in_api(input_dict), limiter, max_retries)
+
+def create_jira_stories_parallel(stories: List[Dict], max_workers: Optional[int] = None,
+                                 limiter: Optional[AdaptiveRateLimiter] = None) -> Dict:
+    """
+    Create Jira stories concurrently under a shared rate limit.
+
+    Calls go through a token-bucket limiter that halves its rate on 429/503
+    responses and honours Retry-After before retrying. Stories already in the
+    Jira ledger are reported with their existing key and not created again;
+    identical stories in the batch are created once.
+
+    Args:
+        stories (List[Dict]): Stories with summary and description.
+        max_workers (Optional[int]): Worker threads (JIRA_MAX_WORKERS, default 4).
+        limiter (Optional[AdaptiveRateLimiter]): Limiter to use. Defaults to the
+            process-wide Jira limiter.
+
+    Returns:
+        Dict: "results" with one {"status", "key" | "message"} entry per story in
+        input order, plus "created", "reused", "failed", "throttled", "elapsed_seconds"
+        and "stories_per_second".
+    """
+    limiter = limiter or get_jira_rate_limiter()
+    max_workers = max_workers or int(os.getenv("JIRA_MAX_WORKERS", "4"))
+    max_retries = _max_retries()
+    throttled_before = limiter.throttled
+    logger.info(f"Tool: Creating {len(stories)} Jira stories with {max_workers} workers")
+
+    project_key = get_jira_settings().project_key
+    ledger = get_jira_ledger()
+
+    def create(story: Dict) -> Dict:
+        try:
+            return _create_reserved(ledger, _ledger_key(story, project_key), project_key, story,
+                                    lambda s: _create_with_backoff(s, limiter, max_retries))
+        except Exception as e:
+            logger.error(f"Tool: Error creating Jira story: {str(e)}")
+            return {"status": "error", "message": str(e)}
+
+    started = time.monotonic()
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        # Results arrive in input order; progress is reported from this thread
+        for result in executor.map(create, stories):
+            results.append(result)
+            emit(PROGRESS, stage="jira", done=len(results), total=len(stories))
+    elapsed = time.monotonic() - started
+
+    reused = sum(1 for result in results if result.get("reused"))
+    created = sum(1 for result in results if result["status"] == "success") - reused
+    report = {
+        "results": results,
+        "created": created,
+        "reused": reused,
+        "failed": len(results) - created - reused,
+        "throttled": limiter.throttled - throttled_before,
+        "elapsed_seconds": round(elapsed, 3),
+        "stories_per_second": round(created / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+    logger.info(
+        f"Tool: Created {created}/{len(stories)} Jira stories ({reused} already existed) in {report['elapsed_seconds']}s "
+        f"({report['stories_per_second']}/s, {report['throttled']} throttled responses)"
+    )
+    return report
+
+def create_jira_stories_from_file(stories_file_path: str) -> str:
+    """
+    Create a Jira story for every story in a stories file.
+
+    This is the Jira agent's create_jira_stories tool. The file is read with
+    story_io, so compact templated stories are created with their full
+    description. Batches of at least JIRA_BULK_MIN_STORIES stories go
+    through create_jira_stories_bulk, smaller ones through
+    create_jira_stories_parallel; both share the Jira rate limiter and
+    ledger.
+
+    Args:
+        stories_file_path (str): Path to a JSON or JSON Lines stories file.
+
+    Returns:
+        str: JSON with "status" ("success" only if every story was created),
+        "created_stories" (issue keys), "failed" (summary and message of each
+        failed story), "unresolved" (summaries of stories that may already
+        exist in Jira and were not retried) and "message".
+    """
+    try:
+        stories = [story.to_dict() for story in iter_stories(stories_file_path)]
+    except Exception as e:
+        logger.error(f"Tool: Could not read stories from {stories_file_path}: {str(e)}")
+        return json.dumps({"status": "error", "message": f"Could not read stories: {e}"})
+
+    if len(stories) >= BULK_MIN_STORIES:
+        results = create_jira_stories_bulk(stories)
+    else:
+        results = create_jira_stories_parallel(stories)["results"]
+
+    created = [result["key"] for result in results if result["status"] == "success"]
+    failed = [{"summary": story.get("summary", ""), "message": result.get("message", "")}
+              for story, result in zip(stories, results) if result["status"] == "error"]
+    unresolved = [story.get("summary", "") for story, result in zip(stories, results) if result["status"] == "unknown"]
+    message = f"Created {len(created)} of {len(stories)} Jira stories"
+    if failed:
+        message += f"; {len(failed)} failed"
+    if unresolved:
+        message += f"; {len(unresolved)} may already exist in Jira and were not retried"
+    return json.dumps({"status": "error" if failed or unresolved else "success", "created_stories": created,
+                       "failed": failed, "unresolved": unresolved, "message": message})
@@ -0,0 +1,467 @@
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .event_stream import EventChannel, use_channel
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+DEFAULT_WORKERS = 4
+POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "0.5"))  # idle workers check for jobs from other processes
+# Running jobs hold a lease that a heartbeat renews every third of this; a job
+# whose lease runs out (its process died) is retried, up to MAX_ATTEMPTS runs
+LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "30"))
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "2"))
+RETENTION_DAYS = float(os.getenv("JOB_RETENTION_DAYS", "7"))  # finished jobs are kept this long
+
+# Identifies this process as the submitter and owner of jobs
+PROCESS_ID = f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _default_queue_path() -> str:
+    project_root = str(Path(__file__).parent.parent.parent)
+    return os.getenv("JOB_QUEUE_PATH", os.path.join(project_root, "data", "jobs.sqlite3"))
+
+
+def resolve_target(target: str) -> Callable:
+    """Import the function a job runs, given as "module:function"."""
+    module_name, _, function_name = target.partition(":")
+    if not function_name:
+        raise ValueError(f"Job target must be 'module:function', got {target!r}")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+class JobQueue:
+    """
+    Persistent queue of workflow jobs backed by SQLite.
+
+    A job names a function as "module:function" plus JSON keyword arguments,
+    so it can be stored in the database and run later. Jobs outlive
+    Streamlit reruns; the UI keeps only the job ID and polls get().
+
+    Each job records the process that submitted it, and workers only claim
+    jobs submitted by their own process, so the events a job emits are
+    collected in the submitting process and available from events(). A
+    process that restarted takes over its earlier jobs with adopt().
+    """
+
+    def __init__(self, db_path: Optional[str] = None, process_id: Optional[str] = None):
+        self.db_path = db_path or _default_queue_path()
+        self.process_id = process_id or PROCESS_ID
+        if os.path.dirname(self.db_path):
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._work = threading.Condition()
+        self._channels: Dict[str, EventChannel] = {}
+        self._done: Dict[str, threading.Event] = {}
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                   id TEXT PRIMARY KEY,
+                   target TEXT NOT NULL,
+                   arguments TEXT NOT NULL,
+                   status TEXT NOT NULL,
+                   result TEXT,
+                   error TEXT,
+                   attempts INTEGER NOT NULL DEFAULT 0,
+                   worker TEXT,
+                   created_at REAL NOT NULL,
+                   started_at REAL,
+                   finished_at REAL,
+                   lease_until REAL,
+                   submitter TEXT
+               );
+               CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);"""
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "submitter" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN submitter TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_submitter ON jobs (submitter, status, created_at)")
+        logger.info(f"Job queue opened at {self.db_path}")
+
+    def submit(self, target: str, **arguments: Any) -> str:
+        """
+        Queue a job.
+
+        Args:
+            target (str): Function to run, as "module:function".
+            **arguments: JSON-serializable keyword arguments for it.
+
+        Returns:
+            str: The job ID.
+        """
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, target, arguments, status, created_at, submitter) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, target, json.dumps(arguments), QUEUED, time.time(), self.process_id),
+            )
+            self._channels[job_id] = EventChannel()
+            self._done[job_id] = threading.Event()
+        with self._work:
+            self._work.notify()
+        logger.info(f"Queued job {job_id}: {target}")
+        return job_id
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Take the oldest job this process submitted that is queued, or running with an expired lease.
+
+        Running jobs whose lease expired MAX_ATTEMPTS times, from any
+        process, are marked failed.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                abandoned = [job_id for job_id, in self._conn.execute(
+                    "SELECT id FROM jobs WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                    (RUNNING, now, MAX_ATTEMPTS),
+                )]
+                self._conn.executemany(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ?, lease_until = NULL WHERE id = ?",
+                    [(FAILED, "The worker running the job stopped", now, job_id) for job_id in abandoned],
+                )
+                row = self._conn.execute(
+                    """SELECT id, target, arguments, attempts FROM jobs
+                       WHERE submitter = ? AND (status = ? OR (status = ? AND lease_until < ?))
+                       ORDER BY created_at LIMIT 1""",
+                    (self.process_id, QUEUED, RUNNING, now),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        """UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1,
+                           started_at = ?, lease_until = ? WHERE id = ?""",
+                        (RUNNING, worker_id, now, now + LEASE_SECONDS, row[0]),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        for job_id in abandoned:
+            logger.error(f"Job {job_id} failed: its worker stopped {MAX_ATTEMPTS} times")
+            self._signal(job_id)
+        if row is None:
+            return None
+        return {"id": row[0], "target": row[1], "arguments": json.loads(row[2]), "attempts": row[3] + 1,
+                "worker": worker_id}
+
+    def renew(self, job_id: str, worker_id: str) -> bool:
+        """Extend a running job's lease. Returns False if the worker no longer holds it."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND status = ?",
+                (time.time() + LEASE_SECONDS, job_id, worker_id, RUNNING),
+            )
+        return cursor.rowcount > 0
+
+    def adopt(self, job_id: str) -> bool:
+        """
+        Take over an unfinished job submitted by another process, such as this server before a restart.
+
+        Only queued jobs and running jobs whose lease expired are taken over;
+        they then run here and their events reach this process.
+
+        Returns:
+            bool: Whether this process now receives the job's events.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                """UPDATE jobs SET submitter = ? WHERE id = ? AND submitter IS NOT ?
+                   AND (status = ? OR (status = ? AND lease_until < ?))""",
+                (self.process_id, job_id, self.process_id, QUEUED, RUNNING, time.time()),
+            )
+            if cursor.rowcount:
+                self._channels.setdefault(job_id, EventChannel())
+                self._done.setdefault(job_id, threading.Event())
+            adopted = job_id in self._channels
+        if cursor.rowcount:
+            logger.info(f"Took over job {job_id} from another process")
+            with self._work:
+                self._work.notify()
+        return adopted
+
+    def _signal(self, job_id: str) -> None:
+        with self._lock:
+            channel = self._channels.get(job_id)
+            done = self._done.get(job_id)
+        if channel is not None:
+            channel.close()
+        if done is not None:
+            done.set()
+
+    def _finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None,
+                worker_id: Optional[str] = None) -> None:
+        with self._lock:
+            if worker_id is None:
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_until = NULL WHERE id = ?",
+                    (status, json.dumps(result), error, time.time(), job_id),
+                )
+            else:
+                # A worker that lost its lease must not overwrite the job's new run
+                cursor = self._conn.execute(
+                    """UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_until = NULL
+                       WHERE id = ? AND worker = ? AND status = ?""",
+                    (status, json.dumps(result), error, time.time(), job_id, worker_id, RUNNING),
+                )
+        if cursor.rowcount == 0:
+            logger.warning(f"Job {job_id} was taken over by another worker; dropping this run's {status} result")
+            return
+        self._signal(job_id)
+
+    def complete(self, job_id: str, result: Any, worker_id: Optional[str] = None) -> None:
+        self._finish(job_id, SUCCEEDED, result=result, worker_id=worker_id)
+
+    def fail(self, job_id: str, error: str, worker_id: Optional[str] = None) -> None:
+        self._finish(job_id, FAILED, error=error, worker_id=worker_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job that has not started yet."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+                (CANCELLED, time.time(), job_id, QUEUED),
+            )
+            self._channels.pop(job_id, None)
+            done = self._done.pop(job_id, None)
+        if done is not None:
+            done.set()
+        return cursor.rowcount > 0
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a job's status, result and error, or None if unknown."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, result, error, worker, attempts, created_at, started_at, finished_at FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        status, result, error, worker, attempts, created_at, started_at, finished_at = row
+        return {
+            "id": job_id,
+            "status": status,
+            "result": json.loads(result) if result is not None else None,
+            "error": error,
+            "worker": worker,
+            "attempts": attempts,
+            "created_at": created_at,
+            "started_at": started_at,
+            "finished_at": finished_at,
+        }
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Block until a job finishes or timeout seconds pass, then return get(job_id).
+
+        Jobs submitted by this process wake the caller as soon as they
+        finish; others are polled every JOB_POLL_SECONDS.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        done = self._done.get(job_id)
+        while True:
+            job = self.get(job_id)
+            if job is None or job["status"] in FINISHED:
+                return job
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return job
+            if done is not None:
+                # Re-checked at least once per lease in case another process failed the job
+                done.wait(LEASE_SECONDS if remaining is None else min(remaining, LEASE_SECONDS))
+            else:
+                time.sleep(POLL_SECONDS if remaining is None else min(remaining, POLL_SECONDS))
+
+    def events(self, job_id: str) -> Optional[EventChannel]:
+        """Event channel of a job submitted from this process."""
+        return self._channels.get(job_id)
+
+    def release(self, job_id: str) -> None:
+        """Forget a finished job's in-process event channel."""
+        with self._lock:
+            self._channels.pop(job_id, None)
+            self._done.pop(job_id, None)
+
+    def prune(self, retention_days: Optional[float] = None) -> int:
+        """
+        Delete finished jobs older than retention_days (JOB_RETENTION_DAYS by default).
+
+        Returns:
+            int: Number of jobs deleted.
+        """
+        retention_days = RETENTION_DAYS if retention_days is None else retention_days
+        placeholders = ", ".join("?" for _ in FINISHED)
+        with self._lock:
+            cursor = self._conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({placeholders}) AND finished_at < ?",
+                (*FINISHED, time.time() - retention_days * 86400),
+            )
+            if cursor.rowcount:
+                # Hand the freed pages back from the write-ahead log
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        if cursor.rowcount:
+            logger.info(f"Deleted {cursor.rowcount} jobs finished more than {retention_days:g} days ago")
+        return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per status."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def wait_for_work(self, timeout: float) -> None:
+        """Sleep until a job is submitted in this process or timeout seconds pass."""
+        with self._work:
+            self._work.wait(timeout)
+
+    def notify_all(self) -> None:
+        with self._work:
+            self._work.notify_all()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _heartbeat(queue: JobQueue, job_id: str, worker_id: str, stopped: threading.Event) -> None:
+    while not stopped.wait(LEASE_SECONDS / 3):
+        try:
+            if not queue.renew(job_id, worker_id):
+                logger.warning(f"Worker {worker_id} lost the lease on job {job_id}")
+                return
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Could not renew the lease on job {job_id}: {e}")
+
+
+def run_job(queue: JobQueue, job: Dict[str, Any]) -> None:
+    """Run a claimed job, renewing its lease while it runs and recording its result or error."""
+    job_id = job["id"]
+    worker_id = job.get("worker")
+    channel = queue.events(job_id) or EventChannel()
+    stopped = threading.Event()
+    if worker_id is not None:
+        threading.Thread(target=_heartbeat, args=(queue, job_id, worker_id, stopped), daemon=True,
+                         name=f"job-heartbeat-{job_id[:8]}").start()
+    started = time.monotonic()
+    try:
+        with use_channel(channel):
+            result = resolve_target(job["target"])(**job["arguments"])
+    except Exception as e:
+        logger.error(f"Job {job_id} ({job['target']}) failed: {e}", exc_info=True)
+        queue.fail(job_id, str(e), worker_id)
+    else:
+        queue.complete(job_id, result, worker_id)
+        logger.info(f"Job {job_id} ({job['target']}) finished in {time.monotonic() - started:.2f}s")
+    finally:
+        stopped.set()
+
+
+def _worker_loop(queue: JobQueue, worker_id: str, stopped) -> None:
+    while not stopped.is_set():
+        try:
+            job = queue.claim(worker_id)
+        except sqlite3.OperationalError as e:
+            # Another process holds the write lock; try again shortly
+            logger.warning(f"Worker {worker_id} could not claim a job: {e}")
+            job = None
+        if job is None:
+            queue.wait_for_work(POLL_SECONDS)
+            continue
+        run_job(queue, job)
+
+
+def _process_worker(db_path: str, process_id: str, worker_id: str, stopped) -> None:
+    # Runs the jobs submitted by the process that started this worker
+    _worker_loop(JobQueue(db_path, process_id=process_id), worker_id, stopped)
+
+
+class WorkerPool:
+    """
+    Workers that run jobs from a JobQueue.
+
+    Workers only run jobs submitted by the pool's own process. Thread
+    workers share this process, pick up new jobs immediately, and deliver
+    their jobs' events to the submitting session. Jobs must not rely on
+    Streamlit session state; workflow jobs bind their own execution context.
+    Process workers (mode="process") run jobs on other CPU cores; they see
+    new jobs within JOB_POLL_SECONDS, and events from their jobs do not
+    reach this process.
+    """
+
+    def __init__(self, queue: JobQueue, workers: Optional[int] = None, mode: Optional[str] = None):
+        self.queue = queue
+        self.workers = workers or int(os.getenv("JOB_WORKERS", str(DEFAULT_WORKERS)))
+        self.mode = mode or os.getenv("JOB_WORKER_MODE", "thread")
+        if self.mode not in ("thread", "process"):
+            raise ValueError(f"JOB_WORKER_MODE must be 'thread' or 'process', got {self.mode!r}")
+        self._workers: List[Any] = []
+        self._stopped = None
+
+    def start(self) -> "WorkerPool":
+        if self._workers:
+            return self
+        try:
+            self.queue.prune()
+        except sqlite3.OperationalError as e:
+            # Another process may be pruning or writing; it is retried on the next start
+            logger.warning(f"Could not prune finished jobs: {e}")
+        prefix = f"{self.queue.process_id}-{self.mode}"
+        if self.mode == "process":
+            context = multiprocessing.get_context("spawn")
+            self._stopped = context.Event()
+            self._workers = [context.Process(target=_process_worker, daemon=True, name=f"job-worker-{i}",
+                                             args=(self.queue.db_path, self.queue.process_id, f"{prefix}-{i}",
+                                                   self._stopped))
+                             for i in range(self.workers)]
+        else:
+            self._stopped = threading.Event()
+            self._workers = [threading.Thread(target=_worker_loop, daemon=True, name=f"job-worker-{i}",
+                                              args=(self.queue, f"{prefix}-{i}", self._stopped))
+                             for i in range(self.workers)]
+        for worker in self._workers:
+            worker.start()
+        logger.info(f"Started {self.workers} {self.mode} job workers")
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        if not self._workers:
+            return
+        self._stopped.set()
+        self.queue.notify_all()
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+
+
+_queue: Optional[JobQueue] = None
+_pool: Optional[WorkerPool] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Get the process-wide job queue, starting its worker pool on first use."""
+    global _queue, _pool
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                queue = JobQueue()
+                _pool = WorkerPool(queue).start()
+                _queue = queue
+    return _queue
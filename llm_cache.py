@@ -0,0 +1,279 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+try:
+    from openai.types.chat import ChatCompletion
+except ImportError:  # cached completions are returned as plain dicts without openai
+    ChatCompletion = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 7 * 24 * 3600  # seconds a cached completion stays valid
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+_EVICTION_CHECK_EVERY = 50  # writes between size checks
+
+# Request fields that decide the completion; anything else (cache seeds,
+# API keys, timeouts) is left out of the key.
+_KEY_FIELDS = ("model", "messages", "tools", "functions", "tool_choice", "temperature", "top_p",
+               "max_tokens", "response_format", "stop")
+_MESSAGE_FIELDS = ("role", "name", "content", "tool_calls", "tool_call_id", "function_call")
+
+
+def _normalize_content(content: str) -> str:
+    # Only line endings and trailing whitespace; indentation and line breaks
+    # change the meaning of code, lists and YAML
+    lines = content.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).rstrip("\n")
+
+
+def _normalize_message(message: Dict) -> Dict:
+    normalized = {field: message[field] for field in _MESSAGE_FIELDS if message.get(field) is not None}
+    if isinstance(normalized.get("content"), str):
+        normalized["content"] = _normalize_content(normalized["content"])
+    return normalized
+
+
+def encode_value(value: Any) -> str:
+    """
+    Serialize a completion as JSON for the shared store.
+
+    Values are never pickled, so a cache file written by another process
+    cannot run code when read. autogen's ChatCompletion objects are stored
+    as their field dicts.
+    """
+    if hasattr(value, "model_dump"):
+        data = value.model_dump(exclude={"message_retrieval_function"})
+        return json.dumps({"chat_completion": data}, default=str)
+    return json.dumps({"value": value}, default=str)
+
+
+def decode_value(stored: Any) -> Any:
+    """Rebuild a completion stored by encode_value()."""
+    data = json.loads(stored)
+    if "chat_completion" in data:
+        if ChatCompletion is None:
+            return data["chat_completion"]
+        return ChatCompletion.model_validate(data["chat_completion"])
+    return data["value"]
+
+
+def cache_key(request: Any) -> str:
+    """
+    Normalized hash of an LLM request.
+
+    Args:
+        request (Any): The request parameters as a dict, or the JSON key
+            string autogen builds from them.
+
+    Returns:
+        str: Hex SHA-256 of the model, messages, tools and sampling settings.
+    """
+    if isinstance(request, str):
+        try:
+            request = json.loads(request)
+        except ValueError:
+            return hashlib.sha256(request.encode("utf-8")).hexdigest()
+    if not isinstance(request, dict):
+        return hashlib.sha256(repr(request).encode("utf-8")).hexdigest()
+    normalized = {field: request[field] for field in _KEY_FIELDS if request.get(field) is not None}
+    if "messages" in normalized:
+        normalized["messages"] = [_normalize_message(m) if isinstance(m, dict) else m for m in normalized["messages"]]
+    payload = json.dumps(normalized, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _default_cache_path() -> str:
+    project_root = str(Path(__file__).parent.parent.parent)
+    return os.getenv("LLM_CACHE_PATH", os.path.join(project_root, "data", "llm_cache.sqlite3"))
+
+
+class CompletionStore:
+    """
+    Disk-backed store of LLM completions shared by every agent and process.
+
+    SQLite in WAL mode lets several Streamlit processes read and write the
+    same file. Values are stored as JSON. Entries expire after ttl seconds,
+    and the least recently used entries are evicted once the store grows
+    past max_bytes.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, ttl: Optional[float] = None,
+                 max_bytes: Optional[int] = None):
+        self.db_path = db_path or _default_cache_path()
+        self.ttl = ttl if ttl is not None else float(os.getenv("LLM_CACHE_TTL", str(DEFAULT_TTL)))
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv("LLM_CACHE_MAX_BYTES", str(DEFAULT_MAX_BYTES)))
+        if os.path.dirname(self.db_path):
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """CREATE TABLE IF NOT EXISTS completions (
+                   key TEXT PRIMARY KEY,
+                   value BLOB NOT NULL,
+                   size INTEGER NOT NULL,
+                   created_at REAL NOT NULL,
+                   accessed_at REAL NOT NULL
+               );
+               CREATE INDEX IF NOT EXISTS completions_accessed ON completions (accessed_at);"""
+        )
+        self._conn.commit()
+        self._writes = 0
+        self.hits: Dict[str, int] = defaultdict(int)
+        self.misses: Dict[str, int] = defaultdict(int)
+        self.evictions = 0
+        logger.info(f"LLM completion cache opened at {self.db_path}")
+
+    def get(self, key: str, agent_name: str = "") -> Optional[Any]:
+        """Return the cached completion for a key, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.ttl and now - row[1] > self.ttl):
+                if row is not None:
+                    self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                    self._conn.commit()
+                    self.evictions += 1
+                self.misses[agent_name] += 1
+                return None
+            self._conn.execute("UPDATE completions SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits[agent_name] += 1
+        try:
+            return decode_value(row[0])
+        except Exception as e:
+            logger.warning(f"Dropping unreadable LLM cache entry: {e}")
+            self.delete(key)
+            return None
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a completion."""
+        blob = encode_value(value).encode("utf-8")
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?, ?)",
+                (key, blob, len(blob), now, now),
+            )
+            self._conn.commit()
+            self._writes += 1
+            if self._writes % _EVICTION_CHECK_EVERY == 1:
+                self._evict(now)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        if self.ttl:
+            cursor = self._conn.execute("DELETE FROM completions WHERE created_at < ?", (now - self.ttl,))
+            self.evictions += cursor.rowcount
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+        if total > self.max_bytes:
+            # Drop least recently used entries down to 90% of the budget
+            target = total - int(self.max_bytes * 0.9)
+            freed = 0
+            keys = []
+            for key, size in self._conn.execute("SELECT key, size FROM completions ORDER BY accessed_at"):
+                if freed >= target:
+                    break
+                keys.append((key,))
+                freed += size
+            self._conn.executemany("DELETE FROM completions WHERE key = ?", keys)
+            self.evictions += len(keys)
+            logger.info(f"LLM cache evicted {len(keys)} entries ({freed} bytes)")
+        self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counts (per agent and total), evictions and stored size."""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions").fetchone()
+        hits, misses = sum(self.hits.values()), sum(self.misses.values())
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+            "by_agent": {agent: {"hits": self.hits[agent], "misses": self.misses[agent]}
+                         for agent in sorted(set(self.hits) | set(self.misses))},
+            "evictions": self.evictions,
+            "entries": entries,
+            "size_bytes": size,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class LLMCompletionCache:
+    """
+    Cache for autogen's LLM client, bound to one agent for metrics.
+
+    Implements autogen's cache protocol (get/set/close and context manager),
+    so it can be set as an agent's client_cache or passed as
+    initiate_chat(cache=...). Keys are re-hashed with cache_key().
+    """
+
+    def __init__(self, store: CompletionStore, agent_name: str = ""):
+        self.store = store
+        self.agent_name = agent_name
+
+    def get(self, key: str, default: Optional[Any] = None) -> Optional[Any]:
+        value = self.store.get(cache_key(key), self.agent_name)
+        return default if value is None else value
+
+    def set(self, key: str, value: Any) -> None:
+        self.store.set(cache_key(key), value)
+
+    def close(self) -> None:
+        # The store is shared; it stays open for other agents
+        pass
+
+    def __enter__(self) -> "LLMCompletionCache":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+_store: Optional[CompletionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_completion_store() -> CompletionStore:
+    """Get the process-wide completion store, opening it on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = CompletionStore()
+    return _store
+
+
+def get_llm_cache(agent_name: str) -> Optional[LLMCompletionCache]:
+    """
+    Get the completion cache for an agent.
+
+    Returns None when caching is off (LLM_CACHE=0) or the agent opted out
+    through LLM_CACHE_DISABLED_AGENTS, a comma-separated list of agent names.
+    """
+    if os.getenv("LLM_CACHE", "1").lower() in ("0", "false", "no"):
+        return None
+    disabled = {name.strip() for name in os.getenv("LLM_CACHE_DISABLED_AGENTS", "").split(",") if name.strip()}
+    if agent_name in disabled:
+        logger.info(f"LLM cache disabled for {agent_name}")
+        return None
+    return LLMCompletionCache(get_completion_store(), agent_name)
@@ -1,25 +1,39 @@
-from src.agents.ba_agent import ba_agent
-from src.agents.executor_agent import executor_agent
-from src.agents.user_agent import user_agent
-from src.agents.supervisor_agent import SupervisorAgent
 import logging
+from typing import TYPE_CHECKING, Callable, Dict, Optional
 import streamlit as st
+from src.tools.execution_context import ExecutionContext, use_context
+
+if TYPE_CHECKING:
+    from src.agents.supervisor_agent import SupervisorAgent
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+def _create_supervisor() -> "SupervisorAgent":
+    """Builds a supervisor with its own BA, executor, User and Jira agents."""
+    # Agents (and autogen) are imported here rather than at module level so the
+    # Streamlit app can render before any agent is constructed.
+    from src.agents.ba_agent import create_ba_agent
+    from src.agents.executor_agent import create_executor_agent
+    from src.agents.jira_agent import create_jira_agent
+    from src.agents.user_agent import create_user_agent
+    from src.agents.supervisor_agent import SupervisorAgent
+
+    return SupervisorAgent(
+        ba_agent=create_ba_agent(),
+        executor_agent=create_executor_agent(),
+        user_agent=create_user_agent(),
+        jira_agent=create_jira_agent()
+    )
+
 def initialize_supervisor():
     """Initializes and returns the supervisor agent, caching it in session state."""
     if 'supervisor' not in st.session_state:
-        st.session_state.supervisor = SupervisorAgent(
-            ba_agent=ba_agent,
-            executor_agent=executor_agent,
-            user_agent=user_agent
-        )
+        st.session_state.supervisor = _create_supervisor()
     return st.session_state.supervisor
 
-def run_requirements_processing(supervisor: SupervisorAgent, file_path: str) -> str:
+def run_requirements_processing(supervisor: "SupervisorAgent", file_path: str) -> str:
     """Runs the requirements processing step and returns the path to the stories file."""
     logger.info("Orchestrator: Running requirements processing...")
     stories_file_path = supervisor.process_requirements(file_path)
@@ -31,7 +45,7 @@ def run_requirements_processing(supervisor: SupervisorAgent, file_path: str) ->
     logger.info(f"Orchestrator: Requirements processing successful. Stories at: {stories_file_path}")
     return stories_file_path
 
-def run_jira_creation(supervisor: SupervisorAgent, stories_file_path: str) -> bool:
+def run_jira_creation(supervisor: "SupervisorAgent", stories_file_path: str) -> bool:
     """Runs the Jira ticket creation step."""
     logger.info(f"Orchestrator: Creating Jira tickets for {stories_file_path}...")
     result = supervisor.create_jira_tickets(stories_file_path)
@@ -43,24 +57,84 @@ def run_jira_creation(supervisor: SupervisorAgent, stories_file_path: str) -> bo
     logger.info("Orchestrator: Jira ticket creation successful.")
     return True
 
-def start_supervisor_workflow(file_path: str, workflow_id: str) -> bool:
-    """Starts the definitive, LLM-driven supervisor workflow."""
+def requirements_processing_job(file_path: str, workflow_id: Optional[str] = None,
+                                document_key: Optional[str] = None) -> Dict:
+    """Job target: runs requirements processing on leased agents in the workflow's own context.
+    
+    Returns the stories file path (None on failure) and the story changes
+    the BA tool recorded in the execution context.
+    """
+    from src.agents.agent_pool import get_agent_pool
+
+    context = ExecutionContext(workflow_id, requirements_document=document_key)
+    with use_context(context), get_agent_pool().supervisor() as supervisor:
+        stories_file_path = run_requirements_processing(supervisor, file_path)
+    return {"stories_file_path": stories_file_path, "stories_diff": context.get("stories_diff") or {}}
+
+def jira_creation_job(stories_file_path: str, workflow_id: Optional[str] = None,
+                      stories_diff: Optional[Dict] = None) -> bool:
+    """Job target: runs Jira ticket creation on leased agents in the workflow's own context."""
+    from src.agents.agent_pool import get_agent_pool
+
+    context = ExecutionContext(workflow_id, stories_diff=stories_diff or {})
+    with use_context(context), get_agent_pool().supervisor() as supervisor:
+        return run_jira_creation(supervisor, stories_file_path)
+
+def submit_requirements_processing(file_path: str, workflow_id: Optional[str] = None,
+                                   document_key: Optional[str] = None) -> str:
+    """Queues requirements processing on the worker pool and returns the job ID."""
+    from src.tools.job_queue import get_job_queue
+    return get_job_queue().submit(f"{__name__}:requirements_processing_job", file_path=file_path,
+                                  workflow_id=workflow_id, document_key=document_key)
+
+def submit_jira_creation(stories_file_path: str, workflow_id: Optional[str] = None,
+                         stories_diff: Optional[Dict] = None) -> str:
+    """Queues Jira ticket creation on the worker pool and returns the job ID."""
+    from src.tools.job_queue import get_job_queue
+    return get_job_queue().submit(f"{__name__}:jira_creation_job", stories_file_path=stories_file_path,
+                                  workflow_id=workflow_id, stories_diff=stories_diff)
+
+def start_supervisor_workflow(file_path: str, workflow_id: str,
+                              on_complete: Optional[Callable[[bool], None]] = None) -> bool:
+    """Starts the definitive, LLM-driven supervisor workflow.
+    
+    Without on_complete this blocks until the workflow finishes and returns
+    whether it succeeded. With on_complete it returns once the stories are
+    waiting for approval; the Jira step then runs when the user decides and
+    on_complete(success) is called, with nothing waiting in between.
+    """
     try:
         # Create the supervisor agent with direct access to other agents
-        supervisor = SupervisorAgent(
-            ba_agent=ba_agent,
-            executor_agent=executor_agent,
-            user_agent=user_agent
-        )
+        supervisor = _create_supervisor()
+        # Tools of this workflow keep their state here rather than in the shared session
+        context = ExecutionContext(workflow_id)
         
         logger.info(f"Orchestrator: Starting DEFINITIVE workflow {workflow_id}")
         
         # Process requirements
-        stories_file_path = supervisor.process_requirements(file_path)
+        with use_context(context):
+            stories_file_path = supervisor.process_requirements(file_path)
         if stories_file_path.startswith("Error:"):
             logger.error(f"Orchestrator: Requirements processing failed: {stories_file_path}")
             return False
             
+        if on_complete is not None:
+            def resume(approval_status: str) -> None:
+                if approval_status != "approved":
+                    logger.error(f"Orchestrator: User rejected stories: {approval_status}")
+                    on_complete(False)
+                    return
+                try:
+                    with use_context(context):
+                        success = run_jira_creation(supervisor, stories_file_path)
+                    on_complete(success)
+                except Exception as e:
+                    logger.error(f"Orchestrator: Critical error during workflow execution: {str(e)}", exc_info=True)
+                    on_complete(False)
+            
+            supervisor.on_user_approval(stories_file_path, workflow_id, resume)
+            return True
+        
         # Request user approval
         approval_status = supervisor.request_user_approval(stories_file_path, workflow_id)
         if approval_status != "approved":
@@ -68,7 +142,8 @@ def start_supervisor_workflow(file_path: str, workflow_id: str) -> bool:
             return False
             
         # Create Jira tickets
-        result = supervisor.create_jira_tickets(stories_file_path)
+        with use_context(context):
+            result = supervisor.create_jira_tickets(stories_file_path)
         if "successfully" not in result.lower():
             logger.error(f"Orchestrator: Jira ticket creation failed: {result}")
             return False
@@ -0,0 +1,123 @@
+import email.utils
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header value.
+
+    Args:
+        value (Optional[str]): Either a number of seconds or an HTTP date.
+
+    Returns:
+        Optional[float]: Seconds to wait, or None if the value is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class AdaptiveRateLimiter:
+    """
+    Thread-safe token bucket whose rate adapts to server throttling.
+
+    The rate is halved on every throttled response (down to min_rate) and
+    grows back by increase_step per successful call (up to max_rate). A
+    Retry-After hint pauses all callers until the server's retry time.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None,
+                 min_rate: float = 0.5, max_rate: Optional[float] = None,
+                 increase_step: float = 0.1):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.min_rate = min_rate
+        self.max_rate = max_rate if max_rate is not None else rate
+        self.increase_step = increase_step
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.throttled = 0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def acquire(self) -> None:
+        """Block until the caller may send one request."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                else:
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def on_success(self) -> None:
+        """Record a successful call and probe a slightly higher rate."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> float:
+        """
+        Record a throttled (429/503) response and back off.
+
+        Args:
+            retry_after (Optional[float]): Server retry hint in seconds.
+
+        Returns:
+            float: Seconds callers will be paused for.
+        """
+        with self._lock:
+            self.throttled += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0
+            pause = retry_after if retry_after is not None else 1.0 / self.rate
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+            logger.warning(f"Throttled by server, backing off {pause:.1f}s (rate now {self.rate:.2f}/s)")
+            return pause
+
+
+_jira_limiter: Optional[AdaptiveRateLimiter] = None
+_jira_limiter_lock = threading.Lock()
+
+
+def get_jira_rate_limiter() -> AdaptiveRateLimiter:
+    """
+    Get the process-wide limiter for Jira calls.
+
+    Shared by all sessions so their combined traffic stays under Jira's
+    limits. Configured with JIRA_RATE_LIMIT (requests/second) and
+    JIRA_RATE_BURST, and may climb to JIRA_RATE_LIMIT_MAX while Jira keeps
+    accepting requests.
+    """
+    global _jira_limiter
+    if _jira_limiter is None:
+        with _jira_limiter_lock:
+            if _jira_limiter is None:
+                rate = float(os.getenv("JIRA_RATE_LIMIT", "5"))
+                burst = float(os.getenv("JIRA_RATE_BURST", str(rate)))
+                max_rate = float(os.getenv("JIRA_RATE_LIMIT_MAX", str(rate * 2)))
+                _jira_limiter = AdaptiveRateLimiter(rate=rate, capacity=burst, max_rate=max_rate)
+    return _jira_limiter
@@ -0,0 +1,129 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Seconds a cached copy is served without revalidation. 0 revalidates every
+# read; a positive FILE_CACHE_TTL accepts that much staleness for fewer calls.
+DEFAULT_TTL = 0.0
+
+
+class CacheEntry(NamedTuple):
+    content: str
+    etag: Optional[str]
+    size: int
+    validated_at: float
+
+
+class ReadCache:
+    """
+    Thread-safe LRU cache of file contents, capped at a byte budget.
+
+    Entries remember the validator (ETag or mtime) the storage returned so a
+    stale entry can be revalidated with a conditional read instead of a full
+    download. Readers take a token from begin_read() before fetching and pass
+    it to put(), so content fetched before an invalidation is never cached
+    after it.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, ttl: float = DEFAULT_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._invalidations = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, file_path: str) -> Optional[CacheEntry]:
+        """Return the entry for a path (fresh or not) and mark it recently used."""
+        with self._lock:
+            entry = self._entries.get(file_path)
+            if entry is not None:
+                self._entries.move_to_end(file_path)
+            return entry
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return time.monotonic() - entry.validated_at < self.ttl
+
+    def begin_read(self) -> int:
+        """Token to pass to put() for content about to be fetched from storage."""
+        with self._lock:
+            return self._invalidations
+
+    def put(self, file_path: str, content: str, etag: Optional[str], token: Optional[int] = None) -> None:
+        """
+        Cache content for a path, evicting least recently used entries as needed.
+
+        If token is given and any entry was invalidated since begin_read()
+        returned it, the content may be out of date and is not cached.
+        """
+        size = len(content.encode("utf-8"))
+        with self._lock:
+            if token is not None and token != self._invalidations:
+                self._remove(file_path)
+                return
+            self._remove(file_path)
+            if size > self.max_bytes:
+                return
+            self._entries[file_path] = CacheEntry(content, etag, size, time.monotonic())
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                evicted_path, _ = next(iter(self._entries.items()))
+                self._remove(evicted_path)
+                logger.debug(f"Evicted {evicted_path} from read cache")
+
+    def mark_validated(self, file_path: str) -> None:
+        """Restart the freshness window after the storage confirmed the entry is current."""
+        with self._lock:
+            entry = self._entries.get(file_path)
+            if entry is not None:
+                self._entries[file_path] = entry._replace(validated_at=time.monotonic())
+
+    def invalidate(self, file_path: str) -> None:
+        with self._lock:
+            self._invalidations += 1
+            self._remove(file_path)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._invalidations += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, file_path: str) -> None:
+        entry = self._entries.pop(file_path, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+
+_read_cache: Optional[ReadCache] = None
+_read_cache_lock = threading.Lock()
+
+
+def get_read_cache() -> ReadCache:
+    """
+    Get the process-wide read cache.
+
+    Sized by FILE_CACHE_MAX_BYTES (0 disables caching). Every read is
+    revalidated unless FILE_CACHE_TTL sets a freshness window in seconds.
+    """
+    global _read_cache
+    if _read_cache is None:
+        with _read_cache_lock:
+            if _read_cache is None:
+                _read_cache = ReadCache(
+                    max_bytes=int(os.getenv("FILE_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+                    ttl=float(os.getenv("FILE_CACHE_TTL", DEFAULT_TTL)),
+                )
+    return _read_cache
@@ -0,0 +1,152 @@
+import difflib
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .story_io import dumps, loads
+from .story_model import Story
+
+logger = logging.getLogger(__name__)
+
+
+def requirement_hash(requirement: str) -> str:
+    """
+    Content hash of a single requirement line.
+
+    Args:
+        requirement (str): Requirement text.
+
+    Returns:
+        str: Hex SHA-256 digest of the stripped text.
+    """
+    return hashlib.sha256(requirement.strip().encode("utf-8")).hexdigest()
+
+
+def diff_requirements(old_hashes: Sequence[str], new_hashes: Sequence[str]) -> Dict[str, List]:
+    """
+    Compare two versions of a requirements document by requirement hash.
+
+    Args:
+        old_hashes (Sequence[str]): Requirement hashes of the previous version, in order.
+        new_hashes (Sequence[str]): Requirement hashes of the new version, in order.
+
+    Returns:
+        Dict[str, List]: "added" and "removed" hash lists, "changed" as
+        (old hash, new hash) pairs for requirements edited in place, and
+        "unchanged" hashes.
+    """
+    diff: Dict[str, List] = {"added": [], "changed": [], "removed": [], "unchanged": []}
+    matcher = difflib.SequenceMatcher(a=old_hashes, b=new_hashes, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        old, new = list(old_hashes[i1:i2]), list(new_hashes[j1:j2])
+        if tag == "equal":
+            diff["unchanged"].extend(new)
+        elif tag == "replace":
+            # Pair edited lines up in order; any surplus is an add or a removal
+            paired = min(len(old), len(new))
+            diff["changed"].extend(zip(old[:paired], new[:paired]))
+            diff["removed"].extend(old[paired:])
+            diff["added"].extend(new[paired:])
+        elif tag == "delete":
+            diff["removed"].extend(old)
+        elif tag == "insert":
+            diff["added"].extend(new)
+    return diff
+
+
+def _default_store_path() -> str:
+    project_root = str(Path(__file__).parent.parent.parent)
+    return os.getenv("REQUIREMENT_STORE_PATH", os.path.join(project_root, "data", "requirements.sqlite3"))
+
+
+class RequirementStore:
+    """
+    Persistent map from requirement hash to the story generated for it.
+
+    Also remembers the requirement hashes of the last processed version of
+    each requirements document, so a re-upload only regenerates stories for
+    added or edited requirements.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or _default_store_path()
+        if os.path.dirname(self.db_path):
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.executescript(
+            """CREATE TABLE IF NOT EXISTS requirement_stories (
+                   requirement_hash TEXT PRIMARY KEY,
+                   requirement TEXT NOT NULL,
+                   story TEXT NOT NULL,
+                   created_at TEXT NOT NULL
+               );
+               CREATE TABLE IF NOT EXISTS documents (
+                   document_key TEXT NOT NULL,
+                   position INTEGER NOT NULL,
+                   requirement_hash TEXT NOT NULL,
+                   PRIMARY KEY (document_key, position)
+               );"""
+        )
+        self._conn.commit()
+        logger.info(f"Requirement store opened at {self.db_path}")
+
+    def get_story(self, key: str) -> Optional[Story]:
+        """Return the story stored for a requirement hash, if any."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT story FROM requirement_stories WHERE requirement_hash = ?", (key,)
+            ).fetchone()
+        return Story.from_dict(loads(row[0])) if row else None
+
+    def put_stories(self, entries: Sequence[Tuple[str, str, Story]]) -> None:
+        """Store generated stories, given (requirement hash, requirement, story) entries."""
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO requirement_stories VALUES (?, ?, ?, ?)",
+                [(key, requirement, dumps(story.to_compact()), now) for key, requirement, story in entries],
+            )
+            self._conn.commit()
+
+    def get_document(self, document_key: str) -> List[str]:
+        """Return the requirement hashes of the last processed version of a document."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT requirement_hash FROM documents WHERE document_key = ? ORDER BY position",
+                (document_key,),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def set_document(self, document_key: str, hashes: Sequence[str]) -> None:
+        """Record the requirement hashes of the latest version of a document."""
+        with self._lock:
+            self._conn.execute("DELETE FROM documents WHERE document_key = ?", (document_key,))
+            self._conn.executemany(
+                "INSERT INTO documents VALUES (?, ?, ?)",
+                [(document_key, position, key) for position, key in enumerate(hashes)],
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_store: Optional[RequirementStore] = None
+_store_lock = threading.Lock()
+
+
+def get_requirement_store() -> RequirementStore:
+    """Get the process-wide requirement store, opening it on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = RequirementStore()
+    return _store
@@ -0,0 +1,294 @@
+import codecs
+import logging
+import mmap
+import os
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, List, Optional
+
+from .env_config import load_env
+
+logger = logging.getLogger(__name__)
+
+# Characters per chunk when streaming a file.
+DEFAULT_CHUNK_SIZE = int(os.getenv("TOOL_READ_CHUNK_SIZE", str(64 * 1024)))
+
+
+class StorageBackend(ABC):
+    """
+    Interface for where agent files (uploads, stories, programs) live.
+
+    Every file read and write in the app goes through one backend, selected
+    by get_storage_backend().
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def read_file_with_meta(self, file_path: str, if_none_match: Optional[str] = None) -> Dict:
+        """
+        Read a file, skipping the content if it still matches a cached validator.
+
+        Returns:
+            Dict: {"content": str or None, "etag": str or None, "not_modified": bool}
+        """
+
+    @abstractmethod
+    def write_file(self, file_path: str, content: str) -> bool:
+        """Write a file, returning True on success. Raises on failure."""
+
+    @abstractmethod
+    def iter_file_chunks(self, file_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                         offset: int = 0, length: Optional[int] = None) -> Iterator[str]:
+        """Yield a file as consecutive text chunks, starting at a character offset."""
+
+    @abstractmethod
+    def list_files(self, directory: str) -> Dict[str, str]:
+        """
+        List the files directly in a directory.
+
+        Returns:
+            Dict[str, str]: A version string for each file, keyed by path,
+            that changes whenever the file does. Empty if the directory does
+            not exist.
+        """
+
+    def read_file(self, file_path: str) -> str:
+        return self.read_file_with_meta(file_path)["content"]
+
+    def supports_append(self) -> bool:
+        """Whether append_file appends natively instead of rewriting the whole file."""
+        return False
+
+    def append_file(self, file_path: str, content: str) -> bool:
+        """
+        Append to a file, creating it if needed. Returns True on success.
+
+        Backends without a native append (see supports_append) rewrite the
+        whole file, so callers streaming many records should buffer them and
+        write once.
+        """
+        try:
+            existing = self.read_file(file_path)
+        except FileNotFoundError:
+            existing = ""
+        return self.write_file(file_path, existing + content)
+
+    def read_files(self, file_paths: List[str]) -> Dict[str, Dict]:
+        """Read several files, returning a per-file {"status", "content" | "message"} result."""
+        results = {}
+        for file_path in file_paths:
+            try:
+                results[file_path] = {"status": "success", "content": self.read_file(file_path)}
+            except Exception as e:
+                results[file_path] = {"status": "error", "message": str(e)}
+        return results
+
+    def write_files(self, files: Dict[str, str]) -> Dict[str, Dict]:
+        """Write several files, returning a per-file {"status", "message"} result."""
+        results = {}
+        for file_path, content in files.items():
+            try:
+                self.write_file(file_path, content)
+                results[file_path] = {"status": "success"}
+            except Exception as e:
+                results[file_path] = {"status": "error", "message": str(e)}
+        return results
+
+
+class RemoteStorageBackend(StorageBackend):
+    """Files stored by the tool service at TOOL_APP_URL."""
+
+    name = "remote"
+
+    def read_file_with_meta(self, file_path: str, if_none_match: Optional[str] = None) -> Dict:
+        from .api_connector import read_file_with_meta_from_api
+        return read_file_with_meta_from_api(file_path, if_none_match=if_none_match)
+
+    def write_file(self, file_path: str, content: str) -> bool:
+        from .api_connector import write_file_to_api
+        return write_file_to_api(file_path, content)
+
+    def list_files(self, directory: str) -> Dict[str, str]:
+        from .api_connector import list_files_from_api
+        return list_files_from_api(directory)
+
+    def supports_append(self) -> bool:
+        # Assumed until the first append finds the endpoint missing
+        from .api_connector import append_supported
+        return append_supported() is not False
+
+    def append_file(self, file_path: str, content: str) -> bool:
+        from .api_connector import append_file_to_api
+        appended = append_file_to_api(file_path, content)
+        if appended is None:
+            return super().append_file(file_path, content)
+        return appended
+
+    def iter_file_chunks(self, file_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                         offset: int = 0, length: Optional[int] = None) -> Iterator[str]:
+        from .api_connector import iter_file_chunks_from_api
+        return iter_file_chunks_from_api(file_path, chunk_size=chunk_size, offset=offset, length=length)
+
+    def read_files(self, file_paths: List[str]) -> Dict[str, Dict]:
+        from .api_connector import read_files_from_api
+        return read_files_from_api(file_paths)
+
+    def write_files(self, files: Dict[str, str]) -> Dict[str, Dict]:
+        from .api_connector import write_files_to_api
+        return write_files_to_api(files)
+
+
+class LocalStorageBackend(StorageBackend):
+    """Files on the local filesystem, with no network hop."""
+
+    name = "local"
+
+    @staticmethod
+    def _etag(stat: os.stat_result) -> str:
+        return f"mtime:{stat.st_mtime_ns}:{stat.st_size}"
+
+    def read_file_with_meta(self, file_path: str, if_none_match: Optional[str] = None) -> Dict:
+        etag = self._etag(os.stat(file_path))
+        if if_none_match and if_none_match == etag:
+            return {"content": None, "etag": etag, "not_modified": True}
+        with open(file_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        return {"content": content, "etag": etag, "not_modified": False}
+
+    def write_file(self, file_path: str, content: str) -> bool:
+        directory = os.path.dirname(file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Write to a temp file and rename so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=directory or ".", prefix=".tmp_")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(tmp_path, file_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        logger.info(f"Successfully wrote to file: {file_path}")
+        return True
+
+    def list_files(self, directory: str) -> Dict[str, str]:
+        if not os.path.isdir(directory):
+            return {}
+        files = {}
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file() and not entry.name.startswith(".tmp_"):
+                    files[os.path.join(directory, entry.name)] = self._etag(entry.stat())
+        return files
+
+    def supports_append(self) -> bool:
+        return True
+
+    def append_file(self, file_path: str, content: str) -> bool:
+        directory = os.path.dirname(file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(file_path, 'a', encoding='utf-8') as f:
+            f.write(content)
+        return True
+
+    def iter_file_chunks(self, file_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                         offset: int = 0, length: Optional[int] = None) -> Iterator[str]:
+        remaining = length
+        with open(file_path, 'r', encoding='utf-8') as f:
+            # Text files cannot seek to a character offset, so skip forward in chunks
+            while offset > 0:
+                skipped = f.read(min(offset, chunk_size))
+                if not skipped:
+                    return
+                offset -= len(skipped)
+            while remaining is None or remaining > 0:
+                chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    return
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+
+class MmapStorageBackend(LocalStorageBackend):
+    """
+    Local files read through memory maps.
+
+    Large files are decoded straight from the page cache instead of being
+    copied through Python file buffers. Writes behave like LocalStorageBackend.
+    """
+
+    name = "mmap"
+
+    def read_file_with_meta(self, file_path: str, if_none_match: Optional[str] = None) -> Dict:
+        stat = os.stat(file_path)
+        etag = self._etag(stat)
+        if if_none_match and if_none_match == etag:
+            return {"content": None, "etag": etag, "not_modified": True}
+        if stat.st_size == 0:
+            return {"content": "", "etag": etag, "not_modified": False}
+        with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            content = str(mapped, 'utf-8')
+        return {"content": content, "etag": etag, "not_modified": False}
+
+    def iter_file_chunks(self, file_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                         offset: int = 0, length: Optional[int] = None) -> Iterator[str]:
+        if offset or length is not None or os.path.getsize(file_path) == 0:
+            # Character offsets don't map to byte offsets; use the text-mode reader
+            yield from super().iter_file_chunks(file_path, chunk_size, offset, length)
+            return
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for start in range(0, len(mapped), chunk_size):
+                chunk = decoder.decode(mapped[start:start + chunk_size])
+                if chunk:
+                    yield chunk
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+
+
+_BACKENDS = {
+    "remote": RemoteStorageBackend,
+    "local": LocalStorageBackend,
+    "mmap": MmapStorageBackend,
+}
+
+_backend: Optional[StorageBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_storage_backend() -> StorageBackend:
+    """
+    Get the configured storage backend.
+
+    STORAGE_BACKEND selects "remote" (tool service), "local" (filesystem) or
+    "mmap" (filesystem with memory-mapped reads). Defaults to "remote", which
+    needs TOOL_APP_URL; the local backends must be chosen explicitly.
+
+    Raises:
+        ValueError: If STORAGE_BACKEND names an unknown backend.
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                load_env()
+                name = os.getenv("STORAGE_BACKEND") or "remote"
+                backend_class = _BACKENDS.get(name.lower())
+                if backend_class is None:
+                    raise ValueError(f"Unknown STORAGE_BACKEND {name!r}, expected one of {', '.join(_BACKENDS)}")
+                _backend = backend_class()
+                logger.info(f"Using {_backend.name} storage backend")
+    return _backend
+
+
+def set_storage_backend(backend: Optional[StorageBackend]) -> None:
+    """Replace the storage backend, or reset to configuration when given None."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
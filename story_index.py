@@ -0,0 +1,362 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import struct
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Collection, Dict, List, Optional, Sequence, Set
+
+from .file_tools import list_files
+from .story_io import iter_stories
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 128  # MinHash signature length
+BANDS = 32  # LSH bands; NUM_PERM / BANDS rows per band
+SHINGLE_SIZE = 5  # characters per shingle
+DEFAULT_THRESHOLD = 0.8  # estimated Jaccard similarity that counts as a duplicate
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def _make_permutations():
+    # Fixed seeds so signatures stay comparable across processes and restarts
+    perms = []
+    for i in range(NUM_PERM):
+        seed = hashlib.blake2b(f"minhash-{i}".encode("utf-8"), digest_size=16).digest()
+        a, b = struct.unpack("<QQ", seed)
+        perms.append((a % (_MERSENNE_PRIME - 1) + 1, b % _MERSENNE_PRIME))
+    return perms
+
+
+_PERMUTATIONS = _make_permutations()
+
+# Generated stories share "As a user, I want to ..." phrasing and list numbering
+_STORY_PREFIX_RE = re.compile(r"^as an? [^,]*, i want to\s*")
+_LIST_MARKER_RE = re.compile(r"^(\d+[.)]|-)\s*")
+
+
+def story_text(story: Dict) -> str:
+    """
+    Normalized text that stories are compared on.
+
+    Descriptions are generated from a shared template, so only the summary is
+    used, with the common user-story phrasing and list numbering removed.
+    """
+    text = " ".join(story.get("summary", "").lower().split())
+    text = _STORY_PREFIX_RE.sub("", text)
+    text = _LIST_MARKER_RE.sub("", text)
+    return " ".join(re.findall(r"\w+", text))
+
+
+def minhash_signature(text: str) -> List[int]:
+    """
+    MinHash signature of a text's character shingles.
+
+    Args:
+        text (str): Normalized text.
+
+    Returns:
+        List[int]: NUM_PERM 32-bit hash minimums.
+    """
+    shingles = {text[i:i + SHINGLE_SIZE] for i in range(max(1, len(text) - SHINGLE_SIZE + 1))}
+    hashes = [
+        int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+        for s in shingles
+    ]
+    return [
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def estimate_similarity(sig_a: Sequence[int], sig_b: Sequence[int]) -> float:
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+
+def _band_keys(signature: Sequence[int]) -> List[str]:
+    rows = NUM_PERM // BANDS
+    return [
+        hashlib.blake2b(struct.pack(f"<{rows}I", *signature[band * rows:(band + 1) * rows]),
+                        digest_size=8).hexdigest()
+        for band in range(BANDS)
+    ]
+
+
+def _content_key(story: Dict) -> str:
+    digest = hashlib.sha256()
+    for part in (story.get("summary", ""), story.get("description", "")):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _default_index_path() -> str:
+    project_root = str(Path(__file__).parent.parent.parent)
+    return os.getenv("STORY_INDEX_PATH", os.path.join(project_root, "data", "story_index.sqlite3"))
+
+
+class StoryIndex:
+    """
+    Persistent MinHash/LSH index of stories, for near-duplicate detection.
+
+    Holds stories from the stories directory and stories already sent to
+    Jira. Lookups only compare against stories sharing an LSH band, so their
+    cost does not grow with the size of the corpus.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, threshold: Optional[float] = None):
+        self.db_path = db_path or _default_index_path()
+        self.threshold = threshold if threshold is not None else float(
+            os.getenv("STORY_DUPLICATE_THRESHOLD", str(DEFAULT_THRESHOLD)))
+        if os.path.dirname(self.db_path):
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.executescript(
+            """CREATE TABLE IF NOT EXISTS stories (
+                   id INTEGER PRIMARY KEY,
+                   content_key TEXT NOT NULL,
+                   source TEXT NOT NULL,
+                   summary TEXT,
+                   issue_key TEXT,
+                   signature BLOB NOT NULL,
+                   added_at TEXT NOT NULL,
+                   UNIQUE (content_key, source)
+               );
+               CREATE TABLE IF NOT EXISTS lsh_buckets (
+                   band INTEGER NOT NULL,
+                   bucket TEXT NOT NULL,
+                   story_id INTEGER NOT NULL,
+                   PRIMARY KEY (band, bucket, story_id)
+               ) WITHOUT ROWID;
+               CREATE TABLE IF NOT EXISTS indexed_versions (
+                   path TEXT PRIMARY KEY,
+                   version TEXT NOT NULL
+               );
+               CREATE TABLE IF NOT EXISTS file_documents (
+                   path TEXT PRIMARY KEY,
+                   document_key TEXT NOT NULL
+               );"""
+        )
+        self._conn.commit()
+        logger.info(f"Story index opened at {self.db_path}")
+
+    def add(self, story: Dict, source: str, issue_key: Optional[str] = None) -> None:
+        """
+        Add a story to the index.
+
+        Args:
+            story (Dict): Story with a summary.
+            source (str): Where the story lives: a stories file path, or "jira".
+            issue_key (Optional[str]): Jira issue key, for stories sent to Jira.
+        """
+        with self._lock:
+            self._add(story, source, issue_key)
+            self._conn.commit()
+
+    def _add(self, story: Dict, source: str, issue_key: Optional[str]) -> None:
+        text = story_text(story)
+        if not text:
+            return
+        content_key = _content_key(story)
+        row = self._conn.execute(
+            "SELECT id FROM stories WHERE content_key = ? AND source = ?", (content_key, source)
+        ).fetchone()
+        if row:
+            if issue_key:
+                self._conn.execute("UPDATE stories SET issue_key = ? WHERE id = ?", (issue_key, row[0]))
+            return
+        signature = minhash_signature(text)
+        cursor = self._conn.execute(
+            "INSERT INTO stories (content_key, source, summary, issue_key, signature, added_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (content_key, source, story.get("summary", ""), issue_key,
+             struct.pack(f"<{NUM_PERM}I", *signature), datetime.now().isoformat()),
+        )
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO lsh_buckets VALUES (?, ?, ?)",
+            [(band, key, cursor.lastrowid) for band, key in enumerate(_band_keys(signature))],
+        )
+
+    def find_similar(self, story: Dict, exclude_source: Optional[str] = None,
+                     threshold: Optional[float] = None) -> List[Dict]:
+        """
+        Find indexed stories that are near-duplicates of a story.
+
+        Args:
+            story (Dict): Story with a summary.
+            exclude_source (Optional[str]): Ignore stories from this source,
+                e.g. the file the story itself was written to.
+            threshold (Optional[float]): Minimum estimated similarity. Defaults
+                to the index threshold.
+
+        Returns:
+            List[Dict]: Matches, most similar first, each with "summary",
+            "source", "issue_key" and "similarity".
+        """
+        text = story_text(story)
+        if not text:
+            return []
+        return self._find_similar(minhash_signature(text), {exclude_source}, threshold)
+
+    def set_document(self, path: str, document_key: str) -> None:
+        """Record which requirements document a stories file was generated from."""
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO file_documents VALUES (?, ?)", (path, document_key))
+            self._conn.commit()
+
+    def document_files(self, document_key: str) -> Set[str]:
+        """Stories files generated from any version of a requirements document."""
+        with self._lock:
+            rows = self._conn.execute("SELECT path FROM file_documents WHERE document_key = ?",
+                                      (document_key,)).fetchall()
+        return {path for path, in rows}
+
+    def _find_similar(self, signature: List[int], exclude_sources: Collection[str],
+                      threshold: Optional[float]) -> List[Dict]:
+        threshold = self.threshold if threshold is None else threshold
+        bands = _band_keys(signature)
+        placeholders = " OR ".join(["(band = ? AND bucket = ?)"] * len(bands))
+        params = [value for band, key in enumerate(bands) for value in (band, key)]
+        with self._lock:
+            rows = self._conn.execute(
+                f"""SELECT id, source, summary, issue_key, signature FROM stories WHERE id IN (
+                        SELECT DISTINCT story_id FROM lsh_buckets WHERE {placeholders})""",
+                params,
+            ).fetchall()
+
+        matches = []
+        for _, source, summary, issue_key, blob in rows:
+            if source in exclude_sources:
+                continue
+            similarity = estimate_similarity(signature, struct.unpack(f"<{NUM_PERM}I", blob))
+            if similarity >= threshold:
+                matches.append({"summary": summary, "source": source, "issue_key": issue_key,
+                                "similarity": round(similarity, 3)})
+        matches.sort(key=lambda match: match["similarity"], reverse=True)
+        return matches
+
+    def sync_directory(self, stories_dir: str) -> int:
+        """
+        Index stories files in a directory that are new or changed since the last sync.
+
+        The directory is listed through the storage backend, so it is the
+        same store the stories are written to.
+
+        Returns:
+            int: Number of files indexed.
+        """
+        try:
+            files = list_files(stories_dir)
+        except Exception as e:
+            logger.warning(f"Could not list stories in {stories_dir}, skipping the sync: {e}")
+            return 0
+        indexed = 0
+        for path in sorted(files):
+            if not os.path.basename(path).startswith("stories_"):
+                continue
+            version = files[path]
+            with self._lock:
+                row = self._conn.execute("SELECT version FROM indexed_versions WHERE path = ?", (path,)).fetchone()
+            if row and row[0] == version:
+                continue
+            try:
+                stories = list(iter_stories(path))
+            except Exception as e:
+                logger.warning(f"Skipping unreadable stories file {path}: {e}")
+                continue
+            with self._lock:
+                # Replace whatever was indexed for an older version of the file
+                self._conn.execute(
+                    "DELETE FROM lsh_buckets WHERE story_id IN (SELECT id FROM stories WHERE source = ?)", (path,))
+                self._conn.execute("DELETE FROM stories WHERE source = ?", (path,))
+                for story in stories:
+                    self._add(story, path, None)
+                self._conn.execute("INSERT OR REPLACE INTO indexed_versions VALUES (?, ?)", (path, version))
+                self._conn.commit()
+            indexed += 1
+        if indexed:
+            logger.info(f"Indexed {indexed} stories files from {stories_dir}")
+        return indexed
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def find_duplicate_stories(stories: List[Dict], source: str, index: Optional["StoryIndex"] = None,
+                           stories_dir: Optional[str] = None, document_key: Optional[str] = None,
+                           skip: Collection[int] = ()) -> Dict[int, List[Dict]]:
+    """
+    Flag stories that duplicate each other, earlier stories files or Jira issues.
+
+    Stories files from earlier versions of the same document are not
+    compared against, since a re-upload reuses their unchanged stories.
+
+    Args:
+        stories (List[Dict]): Newly generated stories.
+        source (str): Path of the stories file they were written to.
+        index (Optional[StoryIndex]): Index to use. Defaults to the shared one.
+        stories_dir (Optional[str]): Directory to sync into the index first.
+            Defaults to the directory containing source.
+        document_key (Optional[str]): Requirements document the stories were
+            generated from.
+        skip (Collection[int]): Positions of stories carried over unchanged
+            from an earlier version of the document. They are not flagged,
+            but later stories in the batch are still compared with them.
+
+    Returns:
+        Dict[int, List[Dict]]: Matches keyed by story position, for flagged stories only.
+    """
+    index = index or get_story_index()
+    index.sync_directory(stories_dir or os.path.dirname(source))
+    excluded = {source} | (index.document_files(document_key) if document_key else set())
+
+    duplicates: Dict[int, List[Dict]] = {}
+    # Stories earlier in the batch, by LSH band bucket
+    batch_buckets: Dict[tuple, List[int]] = {}
+    signatures: Dict[int, List[int]] = {}
+    for i, story in enumerate(stories):
+        text = story_text(story)
+        if not text:
+            continue
+        signature = signatures[i] = minhash_signature(text)
+        if i in skip:
+            for bucket in enumerate(_band_keys(signature)):
+                batch_buckets.setdefault(bucket, []).append(i)
+            continue
+        matches = index._find_similar(signature, excluded, None)
+
+        candidates = set()
+        for bucket in enumerate(_band_keys(signature)):
+            candidates.update(batch_buckets.get(bucket, ()))
+            batch_buckets.setdefault(bucket, []).append(i)
+        for j in sorted(candidates):
+            similarity = estimate_similarity(signature, signatures[j])
+            if similarity >= index.threshold:
+                matches.append({"summary": stories[j].get("summary", ""), "source": source,
+                                "issue_key": None, "similarity": round(similarity, 3)})
+        if matches:
+            duplicates[i] = sorted(matches, key=lambda match: match["similarity"], reverse=True)
+    if duplicates:
+        logger.info(f"Flagged {len(duplicates)} of {len(stories)} stories as possible duplicates")
+    return duplicates
+
+
+_index: Optional[StoryIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_story_index() -> StoryIndex:
+    """Get the process-wide story index, opening it on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = StoryIndex()
+    return _index
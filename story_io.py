@@ -0,0 +1,158 @@
+import json
+import logging
+import os
+from typing import Any, Dict, Iterator, List, Union
+
+from .file_tools import append_file, iter_file_lines, read_file, supports_append, write_file
+from .story_model import Story
+
+try:
+    import orjson
+except ImportError:  # optional, the standard json module is used when orjson is not installed
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+JSONL_EXTENSION = ".jsonl"
+# Stories buffered before each append to the stories file
+DEFAULT_BATCH_SIZE = int(os.getenv("STORIES_STREAM_BATCH_SIZE", "50"))
+# Write templated stories as template ID + parameters instead of the full
+# description. Off by default: only readers that go through this module can
+# render the description, so enable STORIES_COMPACT=1 only when every consumer
+# of the stories files does.
+COMPACT_ENABLED = os.getenv("STORIES_COMPACT", "0").lower() in ("1", "true", "yes")
+
+
+def dumps(obj: Any) -> str:
+    """Serialize to compact JSON, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+def loads(content: Union[str, bytes]) -> Any:
+    """Parse JSON, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def encode_story(story: Union[Story, Dict]) -> Dict:
+    """Dict form of a story for writing to a stories file."""
+    if isinstance(story, Story):
+        return story.to_compact() if COMPACT_ENABLED else story.to_dict()
+    return story
+
+
+def is_jsonl(file_path: str) -> bool:
+    """Whether a stories file is in JSON Lines format (one story per line)."""
+    return file_path.lower().endswith(JSONL_EXTENSION)
+
+
+def parse_stories(content: str) -> List[Story]:
+    """
+    Parse stories from either a JSON array or JSON Lines content.
+
+    Accepts both full stories and the compact templated form.
+
+    Args:
+        content (str): Content of a stories file
+
+    Returns:
+        List[Story]: The stories
+    """
+    if content.lstrip().startswith('['):
+        return [Story.from_dict(data) for data in loads(content)]
+    return [Story.from_dict(loads(line)) for line in content.splitlines() if line.strip()]
+
+
+def iter_stories(file_path: str) -> Iterator[Story]:
+    """
+    Read stories from a stories file one at a time.
+
+    JSON Lines files are streamed line by line, so reading can start while
+    the file is still being written and memory stays flat. JSON array files
+    are read whole.
+
+    Args:
+        file_path (str): Path to the stories file
+
+    Yields:
+        Story: Stories in file order
+    """
+    if is_jsonl(file_path):
+        for line in iter_file_lines(file_path):
+            if line.strip():
+                yield Story.from_dict(loads(line))
+        return
+    content = read_file(file_path)
+    if content.startswith("Error reading file"):
+        raise Exception(content)
+    yield from parse_stories(content)
+
+
+def write_stories(file_path: str, stories: List[Union[Story, Dict]]) -> bool:
+    """
+    Replace a stories file, keeping its format (JSON Lines or JSON array).
+
+    Args:
+        file_path (str): Path to the stories file
+        stories (List[Union[Story, Dict]]): Stories to write
+
+    Returns:
+        bool: True if successful, False if error
+    """
+    if is_jsonl(file_path):
+        content = "".join(dumps(encode_story(story)) + "\n" for story in stories)
+    else:
+        content = dumps([encode_story(story) for story in stories])
+    return write_file(file_path, content)
+
+
+class JsonlStoryWriter:
+    """
+    Writes stories to a JSON Lines file as they are produced.
+
+    Stories are buffered and appended in batches of batch_size. The first
+    batch replaces any existing file. If the storage backend cannot append
+    natively, every append would resend the whole file, so the rest of the
+    stream is kept in memory and written once on close(). Use as a context
+    manager, or call close() to write the final batch.
+    """
+
+    def __init__(self, file_path: str, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.file_path = file_path
+        self.batch_size = max(1, batch_size)
+        self.written = 0
+        self._buffer: List[str] = []
+        self._started = False
+
+    def write(self, story: Union[Story, Dict]) -> None:
+        """Queue a story, writing the batch out once it is full."""
+        self._buffer.append(dumps(encode_story(story)) + "\n")
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self, final: bool = False) -> None:
+        """Write buffered stories to the file, unless they are being held for close()."""
+        if not self._buffer and self._started:
+            return
+        if not final and not supports_append():
+            return
+        content = "".join(self._buffer)
+        ok = append_file(self.file_path, content) if self._started else write_file(self.file_path, content)
+        if not ok:
+            raise Exception(f"Failed to write stories to {self.file_path}")
+        self._started = True
+        self.written += len(self._buffer)
+        self._buffer = []
+
+    def close(self) -> None:
+        self.flush(final=True)
+
+    def __enter__(self) -> "JsonlStoryWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
@@ -0,0 +1,134 @@
+from typing import Any, Dict, Iterator, Optional
+
+DEFAULT_PRIORITY = "Medium"
+DEFAULT_STORY_POINTS = 3
+DEFAULT_TYPE = "User Story"
+
+# Description templates by ID. Every parameter is also available lower-cased
+# as {<name>_lower}.
+STORY_TEMPLATES = {
+    "user_story": """User Story:
+As a user,
+I want to {requirement_lower}
+So that I can achieve my goal efficiently
+
+Acceptance Criteria:
+1. The system should implement {requirement}
+2. The feature should be user-friendly
+3. The implementation should follow best practices
+
+Technical Notes:
+- Priority: Medium
+- Story Points: 3
+- Dependencies: None""",
+}
+
+FIELDS = ("summary", "description", "priority", "story_points", "type")
+
+
+def render_description(template_id: str, params: Dict[str, str]) -> str:
+    """
+    Render a description template.
+
+    Raises:
+        KeyError: If the template ID is unknown.
+    """
+    values = dict(params)
+    values.update({f"{name}_lower": value.lower() for name, value in params.items()})
+    return STORY_TEMPLATES[template_id].format(**values)
+
+
+class Story:
+    """
+    A user story.
+
+    Templated stories keep only the template ID and its parameters; the
+    description is rendered each time it is read. Supports read-only mapping
+    access (story["summary"], story.get("description")) so code written for
+    story dicts keeps working. Like a dict, a story is mutable and compares
+    equal to dicts with the same fields, so it is deliberately unhashable.
+    """
+
+    __slots__ = ("summary", "priority", "story_points", "type", "template_id", "params", "_description")
+
+    def __init__(self, summary: str, description: Optional[str] = None, template_id: Optional[str] = None,
+                 params: Optional[Dict[str, str]] = None, priority: str = DEFAULT_PRIORITY,
+                 story_points: int = DEFAULT_STORY_POINTS, type: str = DEFAULT_TYPE):
+        if template_id is not None and template_id not in STORY_TEMPLATES:
+            raise ValueError(f"Unknown story template {template_id!r}")
+        self.summary = summary
+        self.priority = priority
+        self.story_points = story_points
+        self.type = type
+        self.template_id = template_id
+        self.params = params
+        self._description = description
+
+    @property
+    def description(self) -> str:
+        if self._description is not None:
+            return self._description
+        if self.template_id is not None:
+            return render_description(self.template_id, self.params or {})
+        return ""
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Story":
+        """Build a story from its full or compact dict form."""
+        return cls(
+            summary=data.get("summary", ""),
+            description=data.get("description"),
+            template_id=data.get("template"),
+            params=data.get("params"),
+            priority=data.get("priority", DEFAULT_PRIORITY),
+            story_points=data.get("story_points", DEFAULT_STORY_POINTS),
+            type=data.get("type", DEFAULT_TYPE),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Full form, with the description rendered."""
+        return {field: getattr(self, field) for field in FIELDS}
+
+    def to_compact(self) -> Dict[str, Any]:
+        """Compact form: template and parameters instead of the description, defaults left out."""
+        data: Dict[str, Any] = {"summary": self.summary}
+        if self._description is not None or self.template_id is None:
+            data["description"] = self.description
+        else:
+            data["template"] = self.template_id
+            data["params"] = self.params or {}
+        if self.priority != DEFAULT_PRIORITY:
+            data["priority"] = self.priority
+        if self.story_points != DEFAULT_STORY_POINTS:
+            data["story_points"] = self.story_points
+        if self.type != DEFAULT_TYPE:
+            data["type"] = self.type
+        return data
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key: object) -> bool:
+        return key in FIELDS
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(FIELDS)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in FIELDS else default
+
+    def keys(self):
+        return FIELDS
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (Story, dict)):
+            return self.to_dict() == {field: other.get(field) for field in FIELDS}
+        return NotImplemented
+
+    # Equality follows the mutable fields and matches plain dicts, so there is no stable hash
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"Story(summary={self.summary!r}, template_id={self.template_id!r})"
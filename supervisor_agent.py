@@ -1,22 +1,60 @@
-from autogen import ConversableAgent
+from autogen import ChatResult, ConversableAgent
 from src.config.settings import LLM_CONFIG
 import logging
 import json
-import time
-import streamlit as st
+import re
 import os
-from src.agents.jira_agent import jira_agent
+import time
+from typing import Callable, Optional
+from src.agents.jira_agent import get_jira_agent
+from src.tools.approval_broker import get_approval_broker
+from src.tools.event_stream import TOOL_FINISH, TOOL_START, emit, streaming_llm_config
+from src.tools.execution_context import workflow_state
 from src.tools.file_tools import read_file
+from src.tools.history_compaction import add_history_compaction
+from src.tools.llm_cache import get_llm_cache
+from src.tools.story_io import parse_stories
 
 logger = logging.getLogger(__name__)
 
+# Call registered tools in-process instead of via an LLM chat when the
+# arguments are already known. Set SUPERVISOR_DIRECT_DISPATCH=0 to disable.
+DIRECT_DISPATCH = os.getenv("SUPERVISOR_DIRECT_DISPATCH", "1").lower() not in ("0", "false", "no")
+
+# Matches the BA tool's "Generated and saved N user stories to PATH" reply
+_SAVED_STORIES_RE = re.compile(r"saved \d+ user stories to (.+)$")
+
+# Longest message content written to the log in full
+LOG_MESSAGE_CHARS = 500
+
+def extract_stories_path(message: str) -> str:
+    """Get the stories file path from a BA tool reply.
 
+    Accepts either a JSON reply with a "file_path" key or the
+    "Generated and saved N user stories to PATH" message.
+
+    Raises:
+        ValueError: If no path can be found.
+    """
+    start, end = message.find('{'), message.rfind('}')
+    if start != -1 and end > start:
+        try:
+            file_path = json.loads(message[start:end + 1]).get("file_path")
+            if file_path:
+                return file_path
+        except json.JSONDecodeError:
+            pass
+    match = _SAVED_STORIES_RE.search(message.strip())
+    if match:
+        return match.group(1).strip()
+    raise ValueError("Could not find 'file_path' in the response.")
 
 class SupervisorAgent(ConversableAgent):
     """
     The central, LLM-driven supervisor that orchestrates the workflow by directly interacting with other agents.
     """
-    def __init__(self, ba_agent=None, executor_agent=None, user_agent=None, **kwargs):
+    def __init__(self, ba_agent=None, executor_agent=None, user_agent=None, direct_dispatch=None, jira_agent=None,
+                 **kwargs):
         super().__init__(
             name="Supervisor_Agent",
             system_message="""You are the SDLC supervisor. Your job is to orchestrate the workflow by:
@@ -29,15 +67,83 @@ When you receive approval, proceed with Jira ticket creation.
 If any step fails, reply with {"TERMINATE": "<reason>"}.
 When all steps complete successfully, reply with {"TERMINATE": "success"}.
 """,
-            llm_config=LLM_CONFIG,
+            llm_config=streaming_llm_config(LLM_CONFIG),
             human_input_mode="NEVER",
             **kwargs
         )
         self.ba_agent = ba_agent
         self.executor_agent = executor_agent
         self.user_agent = user_agent
+        # Defaults to the shared Jira agent when not given one
+        self.jira_agent = jira_agent
+        self.direct_dispatch = DIRECT_DISPATCH if direct_dispatch is None else direct_dispatch
+        self.client_cache = get_llm_cache(self.name)
+        self.history_compactor = add_history_compaction(self)
         logger.info("SupervisorAgent initialized.")
 
+    def _find_tool(self, agent, tool_name: str):
+        """Look up a tool registered for execution on the agent or the executor."""
+        for candidate in (agent, self.executor_agent):
+            function_map = getattr(candidate, "function_map", None) or {}
+            if tool_name in function_map:
+                return function_map[tool_name]
+        return None
+
+    def _run_tool(self, agent, tool_name: str, arguments: dict, message: str) -> ChatResult:
+        """Run a tool step, calling the tool directly when possible.
+
+        With direct dispatch on and the tool registered, the tool is called
+        in-process and its reply wrapped in a ChatResult, saving the LLM round
+        trips. Otherwise the agent is asked to call it through a chat.
+
+        Args:
+            agent: Agent that owns the tool
+            tool_name: Name the tool is registered under
+            arguments: Keyword arguments for the tool
+            message: Chat message used when falling back to the LLM
+
+        Returns:
+            ChatResult: The chat result, with the tool reply as its summary
+        """
+        tool = self._find_tool(agent, tool_name) if self.direct_dispatch else None
+        emit(TOOL_START, agent=agent.name, tool=tool_name)
+        started = time.monotonic()
+        status = "error"
+        try:
+            if tool is None:
+                chat_result = agent.initiate_chat(
+                    recipient=self.executor_agent,
+                    message=message,
+                    clear_history=True,
+                    max_turns=4,
+                    # initiate_chat swaps in this cache for both agents for the chat
+                    cache=get_llm_cache(agent.name)
+                )
+                status = "done"
+                return chat_result
+
+            logger.info(f"Supervisor: Calling {tool_name} directly with {arguments}")
+            try:
+                reply = tool(**arguments)
+                status = "done"
+            except Exception as e:
+                logger.error(f"Error executing {tool_name}: {e}")
+                reply = f"Error executing {tool_name}: {e}"
+        finally:
+            emit(TOOL_FINISH, agent=agent.name, tool=tool_name, status=status,
+                 seconds=round(time.monotonic() - started, 2))
+        summary = reply if isinstance(reply, str) else json.dumps(reply)
+        no_cost = {"total_cost": 0}
+        return ChatResult(
+            chat_history=[
+                {"role": "assistant", "name": agent.name, "content": message},
+                {"role": "tool", "name": tool_name, "content": summary},
+            ],
+            summary=summary,
+            cost={"usage_including_cached_inference": no_cost, "usage_excluding_cached_inference": no_cost},
+            human_input=[],
+        )
+
     def process_requirements(self, file_path: str) -> str:
         """Process requirements by having BA Agent work with Executor Agent."""
         logger.info(f"Processing requirements from: {file_path}")
@@ -45,23 +151,25 @@ When all steps complete successfully, reply with {"TERMINATE": "success"}.
         if not self.ba_agent:
             return "Error: BA Agent not initialized"
             
-        chat_result = self.ba_agent.initiate_chat(
-            recipient=self.executor_agent,
-            message=f"Please process the requirements file at: {file_path}. Call process_requirements_wrapper with this file path.",
-            clear_history=True,
-            max_turns=4
+        chat_result = self._run_tool(
+            self.ba_agent,
+            "process_requirements_wrapper",
+            {"file_path": file_path},
+            f"Please process the requirements file at: {file_path}. Call process_requirements_wrapper with this file path."
         )
         
         if not chat_result or not chat_result.summary:
             logger.error("No response received from BA Agent")
             return "Error: Requirements processing failed. No response from the BA Agent."
         
-        # Log the full BA-Agent chat history for debugging
+        # Log the BA-Agent chat history for debugging, truncating long messages
         logger.info("BA-Agent chat history:")
         for msg in chat_result.chat_history:
             # Handle different message formats safely
             sender = msg.get('name', msg.get('role', 'Unknown'))
-            content = msg.get('content', 'No content')
+            content = str(msg.get('content') or 'No content')
+            if len(content) > LOG_MESSAGE_CHARS:
+                content = f"{content[:LOG_MESSAGE_CHARS]}... ({len(content)} chars)"
             logger.info(f"{sender}: {content}")
         
         last_message_str = chat_result.summary
@@ -70,23 +178,18 @@ When all steps complete successfully, reply with {"TERMINATE": "success"}.
             return f"Error: Requirements processing failed: {last_message_str}"
         
         try:
-            # Try to find and parse the JSON response
-            json_part = last_message_str[last_message_str.find('{'):last_message_str.rfind('}')+1]
-            tool_output = json.loads(json_part)
-            stories_file_path = tool_output.get("file_path")
-            if not stories_file_path:
-                raise ValueError("Could not find 'file_path' in the response.")
+            stories_file_path = extract_stories_path(last_message_str)
             
-            # Set the stories file in session state for the User Agent to display
-            st.session_state["stories_file"] = os.path.basename(stories_file_path)
+            # Set the stories file in the workflow state for the User Agent to display
+            workflow_state()["stories_file"] = os.path.basename(stories_file_path)
             
             # Have User Agent work with Executor Agent to display the stories
             if self.user_agent and self.executor_agent:
-                display_result = self.user_agent.initiate_chat(
-                    recipient=self.executor_agent,
-                    message=f"Please display the stories from {stories_file_path} for user approval. Call display_stories_from_folder to show them.",
-                    clear_history=True,
-                    max_turns=4
+                display_result = self._run_tool(
+                    self.user_agent,
+                    "display_stories_from_folder",
+                    {},
+                    f"Please display the stories from {stories_file_path} for user approval. Call display_stories_from_folder to show them."
                 )
                 logger.info(f"User Agent display result: {display_result.summary if display_result else 'No response'}")
                 
@@ -95,7 +198,7 @@ When all steps complete successfully, reply with {"TERMINATE": "success"}.
                     try:
                         display_json = json.loads(display_result.summary)
                         if display_json.get("status") == "success" and "stories" in display_json:
-                            st.session_state["current_stories"] = display_json["stories"]
+                            workflow_state()["current_stories"] = display_json["stories"]
                     except Exception as e:
                         logger.error(f"Error parsing display result: {e}")
             
@@ -104,50 +207,65 @@ When all steps complete successfully, reply with {"TERMINATE": "success"}.
             logger.error(f"Error parsing BA Agent response: {e}")
             return f"Error: {e}. Full response: {last_message_str}"
 
-    def request_user_approval(self, stories_file_path: str, workflow_id: str) -> str:
-        """Request user approval via the Streamlit UI."""
-        if not workflow_id:
-            return "Error: Cannot request approval because workflow_id is not set."
-        
+    def _open_approval(self, stories_file_path: str, workflow_id: str) -> None:
+        """Register an approval request and make the stories available to the UI."""
         logger.info("Requesting user approval via UI.")
-        # Store both the file path and the current stories in the session state
-        st.session_state["stories_for_approval"][workflow_id] = stories_file_path
-        st.session_state["user_approval_status"][workflow_id] = "pending"
+        get_approval_broker().request(workflow_id, stories_file_path)
         
         # If we have stories in memory, make sure they're available for display
-        if "current_stories" not in st.session_state and os.path.exists(stories_file_path):
+        state = workflow_state()
+        if "current_stories" not in state and os.path.exists(stories_file_path):
             try:
                 # Use file_tools.read_file instead of direct file operation
                 stories_content = read_file(stories_file_path)
                 if "Error reading file" not in stories_content:
-                    st.session_state["current_stories"] = json.loads(stories_content)
+                    state["current_stories"] = parse_stories(stories_content)
                 else:
                     logger.error(f"Error loading stories from file: {stories_content}")
             except Exception as e:
                 logger.error(f"Error loading stories from file: {e}")
-        
-        while st.session_state.get("user_approval_status", {}).get(workflow_id) == "pending":
-            time.sleep(2)
 
-        approval_status = st.session_state.get("user_approval_status", {}).get(workflow_id, "rejected")
+    def request_user_approval(self, stories_file_path: str, workflow_id: str, timeout: Optional[float] = None) -> str:
+        """Request user approval via the Streamlit UI and wait for the decision.
+        
+        The UI resolves the request through the approval broker, so this
+        returns as soon as the user clicks, without polling.
+        
+        Args:
+            stories_file_path: Stories the user is asked to approve
+            workflow_id: Workflow awaiting approval
+            timeout: Max seconds to wait, defaults to APPROVAL_TIMEOUT
+            
+        Returns:
+            str: "approved", "rejected", "timeout" or "cancelled"
+        """
+        if not workflow_id:
+            return "Error: Cannot request approval because workflow_id is not set."
         
-        # Only clean up approval-related state, keep stories for Jira ticket creation
-        if workflow_id in st.session_state.get("stories_for_approval", {}):
-            del st.session_state["stories_for_approval"][workflow_id]
-        if workflow_id in st.session_state.get("user_approval_status", {}):
-            del st.session_state["user_approval_status"][workflow_id]
+        self._open_approval(stories_file_path, workflow_id)
+        return get_approval_broker().wait(workflow_id, timeout)
+
+    def on_user_approval(self, stories_file_path: str, workflow_id: str, callback: Callable[[str], None]) -> None:
+        """Request user approval and call callback(status) once the user decides.
         
-        return approval_status
+        Nothing waits in the meantime: the callback runs on the thread that
+        resolves the request. Cancel with the approval broker to abandon it.
+        """
+        if not workflow_id:
+            callback("Error: Cannot request approval because workflow_id is not set.")
+            return
+        self._open_approval(stories_file_path, workflow_id)
+        get_approval_broker().on_decision(workflow_id, callback)
 
     def create_jira_tickets(self, stories_file_path: str) -> str:
         """Create Jira tickets using the Jira Agent."""
         logger.info(f"Supervisor: Delegating Jira ticket creation for {stories_file_path}")
         
-        chat_result = jira_agent.initiate_chat(
-            recipient=self.executor_agent,
-            message=f"Please create Jira stories from the file at: {stories_file_path}. Call create_jira_stories with this file path.",
-            clear_history=True,
-            max_turns=4
+        chat_result = self._run_tool(
+            self.jira_agent or get_jira_agent(),
+            "create_jira_stories",
+            {"stories_file_path": stories_file_path},
+            f"Please create Jira stories from the file at: {stories_file_path}. Call create_jira_stories with this file path."
         )
         
         if not chat_result or not chat_result.summary:
@@ -159,7 +277,15 @@ When all steps complete successfully, reply with {"TERMINATE": "success"}.
             result = json.loads(chat_result.summary)
             if result.get("status") == "success":
                 logger.info(f"Successfully created Jira tickets: {result.get('created_stories', [])}")
-                return f"Successfully created {len(result.get('created_stories', []))} Jira tickets"
+                message = f"Successfully created {len(result.get('created_stories', []))} Jira tickets"
+                # Issues created for requirements that have since been removed are
+                # left in Jira; point them out rather than deleting them
+                diff = workflow_state().get("stories_diff") or {}
+                stale = [removed["issue_key"] for removed in diff.get("removed", []) if removed.get("issue_key")]
+                if stale:
+                    logger.warning(f"Jira issues for removed requirements: {', '.join(stale)}")
+                    message += f". Requirements removed since the last upload still have issues: {', '.join(stale)}"
+                return message
             else:
                 error_msg = result.get("message", "Unknown error")
                 logger.error(f"Error creating Jira tickets: {error_msg}")
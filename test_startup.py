@@ -0,0 +1,51 @@
+"""Import-time budget checks for the Streamlit entry points."""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+# Modules that must not be loaded just by importing the app's entry points
+HEAVY_MODULES = ["autogen", "atlassian", "requests", "httpx"]
+
+# Generous enough for slow CI machines, tight enough to catch an eager
+# agent or client being built at import time
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "500"))
+
+def _measure_import(module: str) -> dict:
+    """Import a module in a fresh interpreter and report its cost."""
+    code = f"""
+import json, sys, time
+import streamlit  # loaded by the app before our modules; not counted
+before = set(sys.modules)
+start = time.perf_counter()
+import {module}
+elapsed_ms = (time.perf_counter() - start) * 1000
+loaded = set(sys.modules) - before
+heavy = sorted({{name.split('.')[0] for name in loaded}} & set({HEAVY_MODULES!r}))
+print(json.dumps({{"elapsed_ms": elapsed_ms, "heavy": heavy}}))
+"""
+    env = dict(os.environ)
+    env.pop("TOOL_APP_URL", None)
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True, text=True, env=env,
+        cwd=str(Path(__file__).parent.parent),
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+@pytest.mark.parametrize("module", ["src.orchestrator", "src.tools.file_tools"])
+def test_import_is_lazy(module):
+    """Test that importing an entry point does not pull in agents or HTTP clients."""
+    report = _measure_import(module)
+    assert report["heavy"] == []
+
+@pytest.mark.parametrize("module", ["src.orchestrator", "src.tools.file_tools"])
+def test_import_time_budget(module):
+    """Test that importing an entry point stays within the cold-start budget."""
+    report = _measure_import(module)
+    assert report["elapsed_ms"] < IMPORT_BUDGET_MS
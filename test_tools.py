@@ -3,6 +3,7 @@
 import pytest
 import os
 import json
+import time
 from pathlib import Path
 from unittest.mock import MagicMock
 from src.tools.jira_create_tool import create_jira_story
@@ -105,4 +106,1024 @@ def test_jira_tools_integration(sample_story, mock_jira):
     
     # Verify mock calls
     mock_jira.create_issue.assert_called_once()
-    mock_jira.search_issues.assert_called_once() 
\ No newline at end of file
+    mock_jira.search_issues.assert_called_once() 
+
+def test_get_session_is_shared():
+    """Test that tool service calls share one pooled session."""
+    from src.tools import http_session
+
+    http_session.close_session()
+    session = http_session.get_session()
+
+    assert http_session.get_session() is session
+    adapter = session.get_adapter("http://tool-service")
+    assert adapter._pool_block is True
+    http_session.close_session()
+
+@pytest.fixture
+def tool_service(monkeypatch):
+    """Point the API connector at a tool service URL, whatever the environment has."""
+    from src.tools import api_connector
+
+    monkeypatch.setenv("TOOL_APP_URL", "http://tool-service")
+    monkeypatch.setattr(api_connector, "_api_base_url", None)
+    return "http://tool-service"
+
+def test_read_file_from_api_uses_pooled_session(monkeypatch, tool_service):
+    """Test that read_file_from_api goes through the pooled session with timeouts."""
+    from src.tools import api_connector, http_session
+
+    mock_session = MagicMock()
+    mock_session.post.return_value.json.return_value = {"content": "hello"}
+    monkeypatch.setattr(http_session, "get_session", lambda: mock_session)
+
+    assert api_connector.read_file_from_api("input/req.txt") == "hello"
+    _, kwargs = mock_session.post.call_args
+    assert kwargs["timeout"] == http_session.get_timeout()
+
+def test_read_files_from_api_bulk(monkeypatch, tool_service):
+    """Test that bulk reads return per-file results from one request."""
+    from src.tools import api_connector, http_session
+
+    mock_session = MagicMock()
+    mock_session.post.return_value.status_code = 200
+    mock_session.post.return_value.json.return_value = {"results": [
+        {"file_path": "a.txt", "content": "A"},
+        {"file_path": "b.txt", "error": "not found"},
+    ]}
+    monkeypatch.setattr(http_session, "get_session", lambda: mock_session)
+    monkeypatch.setattr(api_connector, "_bulk_supported", {})
+
+    results = api_connector.read_files_from_api(["a.txt", "b.txt"])
+
+    assert results["a.txt"] == {"status": "success", "content": "A"}
+    assert results["b.txt"]["status"] == "error"
+    mock_session.post.assert_called_once()
+
+def test_write_file_to_api_reports_error_body(monkeypatch, tool_service):
+    """Test that a 4xx from the tool service includes its status and body in the error."""
+    import requests
+    from src.tools import api_connector, http_session
+
+    rejected = requests.Response()
+    rejected.status_code = 422
+    rejected._content = b'{"detail": "file_path is required"}'
+    mock_session = MagicMock()
+    mock_session.post.return_value = rejected
+    monkeypatch.setattr(http_session, "get_session", lambda: mock_session)
+
+    with pytest.raises(Exception, match="file_path is required"):
+        api_connector.write_file_to_api("", "content")
+
+def test_write_files_to_api_falls_back_per_file(monkeypatch):
+    """Test that bulk writes fall back to single-file calls when unsupported."""
+    from src.tools import api_connector, http_session
+
+    mock_session = MagicMock()
+    mock_session.post.return_value.status_code = 404
+    monkeypatch.setattr(http_session, "get_session", lambda: mock_session)
+    monkeypatch.setattr(api_connector, "_bulk_supported", {})
+    written = []
+    monkeypatch.setattr(api_connector, "write_file_to_api", lambda path, content: written.append(path) or True)
+
+    results = api_connector.write_files_to_api({"a.txt": "A", "b.txt": "B"})
+
+    assert results == {"a.txt": {"status": "success"}, "b.txt": {"status": "success"}}
+    assert sorted(written) == ["a.txt", "b.txt"]
+
+def test_async_file_tools_share_the_sync_layers(monkeypatch, tmp_path):
+    """Test that async reads and writes go through the same backend and write-behind buffer as sync calls."""
+    import asyncio
+    from src.tools import async_tools, file_tools, storage
+
+    monkeypatch.setattr(storage, "_backend", storage.LocalStorageBackend())
+    path = str(tmp_path / "s.json")
+
+    async def run():
+        file_tools.enable_write_behind(True)
+        try:
+            assert await async_tools.write_file(path, "[]")
+            # The queued write is visible to async readers before it is stored
+            return await async_tools.read_file(path)
+        finally:
+            file_tools.enable_write_behind(False)
+
+    assert asyncio.run(run()) == "[]"
+    assert open(path).read() == "[]"
+
+def test_async_semaphore_is_kept_per_event_loop():
+    """Test that loops on different threads each keep their own semaphore."""
+    import asyncio
+    import threading
+    from src.tools import async_tools
+
+    both_running = threading.Barrier(2, timeout=5)
+    seen = []
+
+    async def grab():
+        first = async_tools._get_semaphore()
+        await asyncio.to_thread(both_running.wait)
+        assert async_tools._get_semaphore() is first
+        seen.append(first)
+
+    threads = [threading.Thread(target=asyncio.run, args=(grab(),)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert len(seen) == 2 and seen[0] is not seen[1]
+
+def test_jira_client_is_cached_and_invalidated(monkeypatch):
+    """Test that the Jira client is reused until credentials change or it is invalidated."""
+    from src.tools import jira_client
+
+    monkeypatch.setenv("JIRA_INSTANCE_URL", "https://test.atlassian.net")
+    monkeypatch.setenv("JIRA_USERNAME", "test@example.com")
+    monkeypatch.setenv("JIRA_API_TOKEN", "token-1")
+    jira_client.invalidate_jira_client()
+
+    client = jira_client.get_jira_client()
+    assert jira_client.get_jira_client() is client
+
+    monkeypatch.setenv("JIRA_API_TOKEN", "token-2")
+    rotated = jira_client.get_jira_client()
+    assert rotated is not client
+
+    jira_client.invalidate_jira_client()
+    assert jira_client.get_jira_client() is not rotated
+    jira_client.invalidate_jira_client()
+
+@pytest.fixture
+def story_index(monkeypatch):
+    """Point the story index at a fresh database in the test data directory."""
+    from src.tools import story_index as index_module
+
+    index = index_module.StoryIndex(os.path.join(TEST_DATA_DIR, "story_index.sqlite3"), threshold=0.8)
+    monkeypatch.setattr(index_module, "_index", index)
+    yield index
+    index.close()
+
+@pytest.fixture
+def jira_ledger(monkeypatch, story_index):
+    """Point the Jira ledger at a fresh database in the test data directory."""
+    from src.tools import jira_ledger as ledger_module
+
+    monkeypatch.setenv("JIRA_INSTANCE_URL", "https://test.atlassian.net")
+    monkeypatch.setenv("JIRA_USERNAME", "test@example.com")
+    ledger = ledger_module.JiraLedger(os.path.join(TEST_DATA_DIR, "jira_ledger.sqlite3"))
+    monkeypatch.setattr(ledger_module, "_ledger", ledger)
+    yield ledger
+    ledger.close()
+
+def test_create_jira_stories_bulk_maps_partial_failures(monkeypatch, jira_ledger):
+    """Test that bulk creation returns keys and errors in input order."""
+    from src.tools import api_connector
+    from src.tools.jira_tool import create_jira_stories_bulk
+
+    monkeypatch.setenv("JIRA_INSTANCE_URL", "https://test.atlassian.net")
+    monkeypatch.setenv("JIRA_USERNAME", "test@example.com")
+    monkeypatch.setenv("JIRA_BULK_MAX_ISSUES", "2")
+    mock = MagicMock()
+    mock.create_issues.side_effect = [
+        {"issues": [{"key": "TEST-1"}], "errors": [
+            {"status": 400, "failedElementNumber": 0, "elementErrors": {"errors": {"summary": "too long"}}}
+        ]},
+        {"issues": [{"key": "TEST-2"}], "errors": []},
+    ]
+    monkeypatch.setattr(api_connector, "get_jira_client", lambda settings: mock)
+
+    stories = [{"summary": f"Story {i}", "description": ""} for i in range(3)]
+    results = create_jira_stories_bulk(stories)
+
+    assert results[0] == {"status": "error", "message": "summary: too long"}
+    assert results[1] == {"status": "success", "key": "TEST-1"}
+    assert results[2] == {"status": "success", "key": "TEST-2"}
+    assert mock.create_issues.call_count == 2
+
+def test_create_jira_stories_bulk_does_not_recreate_on_unknown_outcome(monkeypatch, jira_ledger):
+    """Test that a bulk timeout looks stories up and leaves missing ones unresolved, and a 405 falls back."""
+    import requests
+    from src.tools import api_connector, jira_tool
+    from src.tools.jira_tool import create_jira_stories_bulk
+
+    monkeypatch.setenv("JIRA_INSTANCE_URL", "https://test.atlassian.net")
+    monkeypatch.setenv("JIRA_USERNAME", "test@example.com")
+    monkeypatch.setenv("JIRA_BULK_MAX_ISSUES", "2")
+    no_bulk = requests.Response()
+    no_bulk.status_code = 405
+    mock = MagicMock()
+    mock.create_issues.side_effect = [requests.exceptions.ReadTimeout("read timed out"),
+                                      requests.exceptions.HTTPError("405", response=no_bulk)]
+    mock.jql.return_value = {"issues": [{"key": "TEST-1", "fields": {"summary": "Story 0"}}]}
+    mock.create_issue.return_value = {"key": "TEST-3"}
+    monkeypatch.setattr(api_connector, "get_jira_client", lambda settings: mock)
+
+    results = create_jira_stories_bulk([{"summary": f"Story {i}", "description": ""} for i in range(3)])
+
+    assert results[0] == {"status": "success", "key": "TEST-1"}
+    assert results[1]["status"] == "unknown"
+    assert results[2] == {"status": "success", "key": "TEST-3"}
+    # Only the story from the rejected chunk is created one at a time
+    assert mock.create_issue.call_count == 1
+    assert [entry["summary"] for entry in jira_ledger.unresolved()] == ["Story 1"]
+
+    # A rerun before Jira's search finds the story still does not create it
+    rerun = create_jira_stories_bulk([{"summary": "Story 1", "description": ""}])
+    assert rerun[0]["status"] == "unknown"
+    assert mock.create_issues.call_count == 2 and mock.create_issue.call_count == 1
+
+    mock.jql.return_value = {"issues": [{"key": "TEST-2", "fields": {"summary": "Story 1"}}]}
+    assert jira_tool.reconcile_unresolved_stories() == {"found": 1, "missing": 0, "missing_summaries": []}
+    assert jira_ledger.unresolved() == []
+    assert create_jira_stories_bulk([{"summary": "Story 1", "description": ""}])[0]["key"] == "TEST-2"
+
+def test_create_jira_stories_bulk_releases_reservations_on_error(monkeypatch, jira_ledger):
+    """Test that a bulk call that raises leaves no story reserved."""
+    from src.tools import jira_tool
+
+    def broken(stories, throttle=None):
+        raise Exception("Jira client could not be created")
+
+    monkeypatch.setattr(jira_tool, "create_jira_stories_bulk_in_api", broken)
+    stories = [{"summary": f"Story {i}", "description": ""} for i in range(3)]
+
+    with pytest.raises(Exception, match="could not be created"):
+        jira_tool.create_jira_stories_bulk(stories)
+
+    project_key = jira_tool.get_jira_settings().project_key
+    keys = [jira_tool._ledger_key(story, project_key) for story in stories]
+    assert jira_ledger.reserve_many(keys)[0] == set(keys)
+
+def test_parse_retry_after():
+    """Test Retry-After parsing for seconds and invalid values."""
+    from src.tools.rate_limiter import parse_retry_after
+
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+
+def test_create_jira_stories_parallel_retries_throttled(monkeypatch, jira_ledger):
+    """Test that throttled creations back off and retry, keeping input order."""
+    import requests
+    from src.tools import jira_tool
+    from src.tools.rate_limiter import AdaptiveRateLimiter
+
+    throttled = requests.Response()
+    throttled.status_code = 429
+    throttled.headers["Retry-After"] = "0"
+    calls = {"count": 0}
+
+    def fake_create(story):
+        calls["count"] += 1
+        if calls["count"] == 1:
+            raise Exception("Error creating Jira story") from requests.HTTPError(response=throttled)
+        return f"TEST-{story['summary']}"
+
+    monkeypatch.setattr(jira_tool, "create_jira_story_in_api", fake_create)
+    limiter = AdaptiveRateLimiter(rate=100)
+
+    report = jira_tool.create_jira_stories_parallel(
+        [{"summary": "1"}, {"summary": "2"}], max_workers=1, limiter=limiter
+    )
+
+    assert [r["key"] for r in report["results"]] == ["TEST-1", "TEST-2"]
+    assert report["created"] == 2
+    assert report["throttled"] == 1
+
+def test_create_jira_story_retries_throttled(monkeypatch, jira_ledger):
+    """Test that the per-story path also waits on the limiter and retries a 429."""
+    import requests
+    from src.tools import jira_tool, rate_limiter
+
+    throttled = requests.Response()
+    throttled.status_code = 429
+    throttled.headers["Retry-After"] = "0"
+    error = Exception("Error creating Jira story")
+    error.__cause__ = requests.HTTPError(response=throttled)
+    create = MagicMock(side_effect=[error, "TEST-9"])
+    limiter = rate_limiter.AdaptiveRateLimiter(rate=100)
+    monkeypatch.setattr(jira_tool, "create_jira_story_in_api", create)
+    monkeypatch.setattr(jira_tool, "get_jira_rate_limiter", lambda: limiter)
+
+    assert jira_tool.create_jira_story({"summary": "Throttled story", "description": ""}) == "TEST-9"
+    assert create.call_count == 2
+    assert limiter.throttled == 1
+
+def test_create_jira_story_skips_stories_in_ledger(monkeypatch, jira_ledger):
+    """Test that a retried story reuses the issue recorded in the ledger."""
+    from src.tools import jira_tool
+
+    create = MagicMock(return_value="TEST-7")
+    monkeypatch.setattr(jira_tool, "create_jira_story_in_api", create)
+    story = {"summary": "As a user, I want to log in", "description": "Login"}
+
+    assert jira_tool.create_jira_story(story) == "TEST-7"
+    assert jira_tool.create_jira_story(dict(story)) == "TEST-7"
+    create.assert_called_once()
+
+def test_create_jira_stories_parallel_creates_identical_stories_once(monkeypatch, jira_ledger):
+    """Test that the ledger reservation lets only one of two identical stories create an issue."""
+    import threading
+    from src.tools import jira_tool
+    from src.tools.rate_limiter import AdaptiveRateLimiter
+
+    both_started = threading.Barrier(2, timeout=1)
+
+    def slow_create(story):
+        try:
+            both_started.wait()
+        except threading.BrokenBarrierError:
+            pass  # the other worker is waiting on the reservation instead
+        return "TEST-5"
+
+    create = MagicMock(side_effect=slow_create)
+    monkeypatch.setattr(jira_tool, "create_jira_story_in_api", create)
+    story = {"summary": "As a user, I want to reset my password", "description": "Reset"}
+
+    report = jira_tool.create_jira_stories_parallel([story, dict(story)], max_workers=2,
+                                                    limiter=AdaptiveRateLimiter(rate=100))
+
+    assert [r["key"] for r in report["results"]] == ["TEST-5", "TEST-5"]
+    assert (report["created"], report["reused"]) == (1, 1)
+    create.assert_called_once()
+
+def test_iter_file_lines_across_ranged_chunks(monkeypatch):
+    """Test that streamed lines are reassembled across chunk boundaries."""
+    from src.tools import api_connector, file_tools, storage
+
+    monkeypatch.setattr(storage, "_backend", storage.RemoteStorageBackend())
+    text = "1. Login\n2. Logout\n- Reset password"
+
+    def fake_range(file_path, offset, length):
+        content = text[offset:offset + length]
+        return {"content": content, "eof": offset + length >= len(text), "ranged": True}
+
+    monkeypatch.setattr(api_connector, "read_file_range_from_api", fake_range)
+
+    assert list(file_tools.iter_file_lines("input/req.txt", chunk_size=4)) == text.split("\n")
+
+def test_iter_file_chunks_without_range_support(monkeypatch, tool_service):
+    """Test that chunks are sliced locally when the service ignores ranges."""
+    from src.tools import api_connector, http_session
+
+    mock_session = MagicMock()
+    mock_session.post.return_value.json.return_value = {"content": "abcdefg"}
+    monkeypatch.setattr(http_session, "get_session", lambda: mock_session)
+
+    chunks = list(api_connector.iter_file_chunks_from_api("f.txt", chunk_size=3, offset=1))
+
+    assert chunks == ["bcd", "efg"]
+    mock_session.post.assert_called_once()
+
+def test_large_request_bodies_are_compressed(monkeypatch):
+    """Test that bodies over the threshold are gzipped and small ones are not."""
+    import gzip
+    from src.tools import http_session
+
+    monkeypatch.setenv("TOOL_HTTP_COMPRESSION", "gzip")
+    monkeypatch.setenv("TOOL_HTTP_COMPRESS_MIN_BYTES", "100")
+
+    body, headers = http_session.encode_json_body({"content": "x" * 500})
+    assert headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(body)) == {"content": "x" * 500}
+
+    body, headers = http_session.encode_json_body({"file_path": "a.txt"})
+    assert "Content-Encoding" not in headers
+    assert json.loads(body) == {"file_path": "a.txt"}
+
+    monkeypatch.delenv("TOOL_HTTP_COMPRESSION")
+    body, headers = http_session.encode_json_body({"content": "x" * 500})
+    assert "Content-Encoding" not in headers
+
+def test_compressed_body_rejected_is_resent_plain_once_per_host(monkeypatch):
+    """Test that a 422 to a compressed body is retried uncompressed and the host is remembered."""
+    from src.tools import http_session
+
+    monkeypatch.setenv("TOOL_HTTP_COMPRESSION", "gzip")
+    monkeypatch.setenv("TOOL_HTTP_COMPRESS_MIN_BYTES", "100")
+    monkeypatch.setattr(http_session, "_compression_rejected_hosts", set())
+    rejected, accepted = MagicMock(status_code=422), MagicMock(status_code=200)
+    mock_session = MagicMock()
+    mock_session.post.side_effect = [rejected, accepted, accepted]
+    monkeypatch.setattr(http_session, "get_session", lambda: mock_session)
+
+    assert http_session.post_json("http://tools:8000/write-file/", {"content": "x" * 500}) is accepted
+    assert http_session.post_json("http://tools:8000/write-file/", {"content": "y" * 500}) is accepted
+
+    sent = [call.kwargs["headers"] for call in mock_session.post.call_args_list]
+    assert [("Content-Encoding" in headers) for headers in sent] == [True, False, False]
+    assert http_session._compression_rejected_hosts == {"tools:8000"}
+
+@pytest.fixture
+def read_cache(monkeypatch):
+    """Give each test an empty read cache."""
+    from src.tools import read_cache as cache_module
+
+    cache = cache_module.ReadCache(max_bytes=1024, ttl=0)
+    monkeypatch.setattr(cache_module, "_read_cache", cache)
+    return cache
+
+def test_read_file_revalidates_cached_copy(monkeypatch, read_cache):
+    """Test that a cached file is revalidated by ETag instead of re-downloaded."""
+    from src.tools import file_tools
+
+    backend = MagicMock()
+    read = backend.read_file_with_meta
+    read.side_effect = [
+        {"content": "[]", "etag": "v1", "not_modified": False},
+        {"content": None, "etag": "v1", "not_modified": True},
+    ]
+    monkeypatch.setattr(file_tools, "get_storage_backend", lambda: backend)
+
+    assert file_tools.read_file("stories/s.json") == "[]"
+    assert file_tools.read_file("stories/s.json") == "[]"
+    assert read.call_args_list[1].kwargs == {"if_none_match": "v1"}
+    assert read_cache.hits == 1
+
+def test_write_file_invalidates_read_cache(monkeypatch, read_cache):
+    """Test that writing a file drops its cached copy."""
+    from src.tools import file_tools
+
+    read_cache.put("stories/s.json", "[]", "v1")
+    backend = MagicMock()
+    backend.write_file.return_value = True
+    monkeypatch.setattr(file_tools, "get_storage_backend", lambda: backend)
+
+    assert file_tools.write_file("stories/s.json", "[{}]")
+    assert read_cache.get("stories/s.json") is None
+
+def test_read_cache_evicts_least_recently_used():
+    """Test that the read cache stays within its byte budget."""
+    from src.tools.read_cache import ReadCache
+
+    cache = ReadCache(max_bytes=10)
+    cache.put("a", "aaaa", None)
+    cache.put("b", "bbbb", None)
+    cache.get("a")
+    cache.put("c", "cccc", None)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.size_bytes == 8
+
+def test_write_behind_coalesces_and_skips_unchanged():
+    """Test that buffered writes are coalesced and unchanged content is skipped."""
+    from src.tools.write_behind import WriteBehindBuffer
+
+    written = []
+    buffer = WriteBehindBuffer(lambda path, content: written.append((path, content)) or True,
+                               coalesce_delay=0.05)
+    buffer.submit("programs/a.py", "v1")
+    buffer.submit("programs/a.py", "v2")
+    assert buffer.pending_content("programs/a.py") == "v2"
+    assert buffer.flush(timeout=5)
+
+    buffer.submit("programs/a.py", "v2")
+    assert buffer.flush(timeout=5)
+
+    assert written == [("programs/a.py", "v2")]
+    assert buffer.skipped == 1
+
+def test_write_behind_resends_after_other_writes(monkeypatch, read_cache, tmp_path):
+    """Test that a write-behind write is not skipped after the file changed outside the buffer."""
+    from src.tools import file_tools, storage
+
+    monkeypatch.setattr(storage, "_backend", storage.LocalStorageBackend())
+    path = str(tmp_path / "a.py")
+    file_tools.enable_write_behind(True)
+    try:
+        assert file_tools.write_file(path, "v1") and file_tools.flush(timeout=5)
+        assert file_tools.write_files({path: "v2"}) == {path: {"status": "success"}}
+        assert file_tools.write_file(path, "v1") and file_tools.flush(timeout=5)
+    finally:
+        file_tools.enable_write_behind(False)
+
+    assert open(path).read() == "v1"
+
+def test_read_cache_drops_content_fetched_before_invalidation():
+    """Test that a reader cannot cache content it fetched before a concurrent write invalidated it."""
+    from src.tools.read_cache import ReadCache
+
+    cache = ReadCache(max_bytes=1024, ttl=0)
+    token = cache.begin_read()
+    cache.invalidate("stories/s.json")
+    cache.put("stories/s.json", "old", "v1", token)
+
+    assert cache.get("stories/s.json") is None
+
+def test_write_behind_flush_reports_failures():
+    """Test that flush returns False when a buffered write failed."""
+    from src.tools.write_behind import WriteBehindBuffer
+
+    def failing_writer(path, content):
+        raise Exception("tool service down")
+
+    buffer = WriteBehindBuffer(failing_writer, coalesce_delay=0)
+    buffer.submit("input/upload.txt", "requirements")
+
+    assert buffer.flush(timeout=5) is False
+    assert buffer.flush(timeout=5) is True
+
+def test_write_behind_remembers_a_bounded_number_of_paths():
+    """Test that only the most recently written paths keep their content hash."""
+    from src.tools.write_behind import WriteBehindBuffer
+
+    written = []
+    buffer = WriteBehindBuffer(lambda path, content: written.append(path) or True, coalesce_delay=0, max_hashes=2)
+    for name in ("a", "b", "c"):
+        buffer.submit(f"stories_{name}.json", "[]")
+        assert buffer.flush(timeout=5)
+
+    assert list(buffer._written_hashes) == ["stories_b.json", "stories_c.json"]
+    buffer.submit("stories_c.json", "[]")
+    buffer.submit("stories_a.json", "[]")
+    assert buffer.flush(timeout=5)
+    assert written == ["stories_a.json", "stories_b.json", "stories_c.json", "stories_a.json"]
+
+@pytest.mark.parametrize("backend_name", ["local", "mmap"])
+def test_local_storage_backends_round_trip(monkeypatch, read_cache, backend_name):
+    """Test that file_tools works against the local backends without a tool service."""
+    from src.tools import file_tools, storage
+
+    monkeypatch.setenv("STORAGE_BACKEND", backend_name)
+    storage.set_storage_backend(None)
+    file_path = os.path.join(TEST_DATA_DIR, "stories", "stories_local.json")
+    try:
+        assert file_tools.write_file(file_path, "1. Login\n2. Logout ✓")
+        assert file_tools.read_file(file_path) == "1. Login\n2. Logout ✓"
+        assert list(file_tools.iter_file_lines(file_path, chunk_size=5)) == ["1. Login", "2. Logout ✓"]
+        assert storage.get_storage_backend().name == backend_name
+        listed = file_tools.list_files(os.path.dirname(file_path))
+        assert file_path in listed
+        file_tools.write_file(file_path, "1. Login")
+        assert file_tools.list_files(os.path.dirname(file_path))[file_path] != listed[file_path]
+    finally:
+        storage.set_storage_backend(None)
+
+def test_storage_backend_defaults_to_remote(monkeypatch):
+    """Test that an unset STORAGE_BACKEND never silently falls back to the local disk."""
+    from src.tools import storage
+
+    monkeypatch.delenv("STORAGE_BACKEND", raising=False)
+    monkeypatch.delenv("TOOL_APP_URL", raising=False)
+    monkeypatch.setattr(storage, "load_env", lambda: None)
+    storage.set_storage_backend(None)
+    try:
+        assert storage.get_storage_backend().name == "remote"
+    finally:
+        storage.set_storage_backend(None)
+
+def test_requirements_stream_to_jsonl(monkeypatch, read_cache):
+    """Test that requirements are parsed line by line into a JSONL stories file."""
+    from src.tools import storage
+    from src.tools.story_io import iter_stories, parse_stories
+    from src.tools.file_tools import read_file
+    from src.agents.ba_agent import stream_requirements_to_jsonl
+
+    storage.set_storage_backend(storage.LocalStorageBackend())
+    monkeypatch.setattr("src.tools.story_io.DEFAULT_BATCH_SIZE", 2)
+    requirements_path = os.path.join(TEST_DATA_DIR, "requirements.txt")
+    stories_path = os.path.join(TEST_DATA_DIR, "stories", "stories_requirements.jsonl")
+    progress = []
+    try:
+        with open(requirements_path, "w") as f:
+            f.write("Intro\n1. Login\n- Reset password\n\n2. Logout\n")
+        count = stream_requirements_to_jsonl(requirements_path, stories_path,
+                                             on_progress=lambda lines, stories: progress.append((lines, stories)))
+
+        stories = list(iter_stories(stories_path))
+        assert count == 3
+        assert progress == [(2, 1), (3, 2), (5, 3)]
+        assert [s["summary"] for s in stories] == [
+            "As a user, I want to 1. login",
+            "As a user, I want to reset password",
+            "As a user, I want to 2. logout",
+        ]
+        assert parse_stories(read_file(stories_path)) == stories
+    finally:
+        storage.set_storage_backend(None)
+
+def test_jsonl_writer_rerun_with_write_behind(monkeypatch, read_cache, tmp_path):
+    """Test that rewriting a stories file after appends to it replaces it with write-behind on."""
+    from src.tools import file_tools, storage
+    from src.tools.story_io import JsonlStoryWriter
+
+    monkeypatch.setattr(storage, "_backend", storage.LocalStorageBackend())
+    stories_path = str(tmp_path / "stories.jsonl")
+    file_tools.enable_write_behind(True)
+    try:
+        for summaries in (["a", "b", "c"], ["a", "b"]):
+            with JsonlStoryWriter(stories_path, batch_size=1) as writer:
+                for summary in summaries:
+                    writer.write({"summary": summary})
+    finally:
+        file_tools.enable_write_behind(False)
+
+    assert open(stories_path).read() == '{"summary":"a"}\n{"summary":"b"}\n'
+
+def test_remote_append_without_endpoint_writes_stream_once(monkeypatch, read_cache, tool_service):
+    """Test that a remote backend without /append-file/ gets the rest of the stream in one write."""
+    import requests
+    from src.tools import api_connector, storage
+    from src.tools.story_io import JsonlStoryWriter
+
+    files = {}
+
+    def post_json(url, payload):
+        response = MagicMock()
+        response.status_code = 200
+        if url.endswith("/append-file/"):
+            response.status_code = 405
+        elif payload["file_path"] in files:
+            response.json.return_value = {"content": files[payload["file_path"]]}
+        else:
+            response.status_code = 404
+            response.raise_for_status.side_effect = requests.HTTPError(response=response)
+        return response
+
+    monkeypatch.setattr(api_connector, "post_json", post_json)
+    monkeypatch.setattr(api_connector, "_append_supported", None)
+    monkeypatch.setattr(storage, "_backend", storage.RemoteStorageBackend())
+    writes = []
+    monkeypatch.setattr(api_connector, "write_file_to_api",
+                        lambda path, content: writes.append(content) or files.__setitem__(path, content) or True)
+
+    with pytest.raises(FileNotFoundError):
+        storage.get_storage_backend().read_file("stories/missing.jsonl")
+    with JsonlStoryWriter("stories/s.jsonl", batch_size=1) as writer:
+        for summary in ("a", "b", "c"):
+            writer.write({"summary": summary})
+
+    assert files["stories/s.jsonl"] == '{"summary":"a"}\n{"summary":"b"}\n{"summary":"c"}\n'
+    # First batch, the probing append's rewrite, then the held stories once on close
+    assert len(writes) == 3
+
+def test_supervisor_dispatches_known_tools_directly(monkeypatch):
+    """Test that the supervisor calls registered tools without an LLM chat."""
+    pytest.importorskip("autogen")
+    from src.agents import supervisor_agent
+    from src.tools.execution_context import ExecutionContext, use_context
+
+    ba_agent = MagicMock()
+    ba_agent.name = "BA_Agent"
+    ba_agent.function_map = {
+        "process_requirements_wrapper": lambda file_path: f"Generated and saved 2 user stories to /stories/stories_{file_path}"
+    }
+    supervisor = supervisor_agent.SupervisorAgent(ba_agent=ba_agent, executor_agent=MagicMock(function_map={}),
+                                                  direct_dispatch=True)
+
+    with use_context(ExecutionContext("wf_test")) as context:
+        assert supervisor.process_requirements("req.txt") == "/stories/stories_req.txt"
+    assert context["stories_file"] == "stories_req.txt"
+    ba_agent.initiate_chat.assert_not_called()
+
+def test_story_index_flags_near_duplicates(monkeypatch, read_cache, story_index):
+    """Test that reworded stories match earlier files and Jira issues but distinct ones do not."""
+    from src.tools import storage
+    from src.tools.story_index import find_duplicate_stories
+
+    monkeypatch.setattr(storage, "_backend", storage.LocalStorageBackend())
+    stories_dir = os.path.join(TEST_DATA_DIR, "stories")
+    os.makedirs(stories_dir, exist_ok=True)
+    with open(os.path.join(stories_dir, "stories_old.json"), "w") as f:
+        json.dump([{"summary": "As a user, I want to 1. create a user account with email and password"}], f)
+    story_index.add({"summary": "As a user, I want to export the monthly sales report as csv"}, "jira", "SDLC-7")
+
+    new_stories = [
+        {"summary": "As a user, I want to 3. create a user account with email and password"},
+        {"summary": "As a user, I want to export the monthly sales report as a csv"},
+        {"summary": "As a user, I want to reset my password"},
+        {"summary": "As a user, I want to reset my password"},
+    ]
+    duplicates = find_duplicate_stories(new_stories, os.path.join(stories_dir, "stories_new.json"))
+
+    assert sorted(duplicates) == [0, 1, 3]
+    assert duplicates[0][0]["source"].endswith("stories_old.json")
+    assert duplicates[1][0]["issue_key"] == "SDLC-7"
+    assert duplicates[3][0]["similarity"] == 1.0
+
+def test_story_index_ignores_earlier_versions_of_the_same_document(monkeypatch, read_cache, story_index):
+    """Test that a re-upload is not flagged against its own earlier stories file, and carried-over stories are skipped."""
+    from src.tools import storage
+    from src.tools.story_index import find_duplicate_stories
+
+    monkeypatch.setattr(storage, "_backend", storage.LocalStorageBackend())
+    stories_dir = os.path.join(TEST_DATA_DIR, "stories")
+    os.makedirs(stories_dir, exist_ok=True)
+    earlier = os.path.join(stories_dir, "stories_upload_1.json")
+    with open(earlier, "w") as f:
+        json.dump([{"summary": "As a user, I want to create a user account with email and password"}], f)
+    story_index.set_document(earlier, "spec.txt")
+    story_index.add({"summary": "As a user, I want to export the monthly sales report as csv"}, "jira", "SDLC-7")
+
+    new_stories = [
+        {"summary": "As a user, I want to create a user account with email and password"},
+        {"summary": "As a user, I want to export the monthly sales report as csv"},
+    ]
+    source = os.path.join(stories_dir, "stories_upload_2.json")
+
+    assert sorted(find_duplicate_stories(new_stories, source)) == [0, 1]
+    assert find_duplicate_stories(new_stories, source, document_key="spec.txt", skip={1}) == {}
+
+def test_story_compact_round_trip():
+    """Test that templated stories are stored compactly and render the same description."""
+    from src.tools.story_io import dumps, parse_stories
+    from src.agents.ba_agent import requirement_to_story
+
+    story = requirement_to_story("- Reset Password")
+    compact = dumps([story.to_compact()])
+    full = json.dumps([story.to_dict()], indent=2)
+
+    assert "description" not in story.to_compact()
+    assert len(compact) < len(full) / 3
+    assert "I want to reset password\n" in story.description
+    assert "1. The system should implement Reset Password" in story["description"]
+    assert parse_stories(compact) == parse_stories(full) == [story.to_dict()]
+    assert not hasattr(story, "__dict__")
+    with pytest.raises(TypeError):
+        hash(story)
+
+def test_reupload_only_regenerates_edited_requirements():
+    """Test that a re-uploaded document reuses stories and reports the diff."""
+    from src.tools.requirement_store import RequirementStore
+    from src.agents.ba_agent import IncrementalStoryBuilder, iter_requirement_stories
+
+    store = RequirementStore(os.path.join(TEST_DATA_DIR, "requirements.sqlite3"))
+    first = IncrementalStoryBuilder(store)
+    list(iter_requirement_stories(["1. Login", "2. Logout", "3. Reset password"], first))
+    assert first.finish("spec.txt")["previous_version"] is False
+
+    second = IncrementalStoryBuilder(store)
+    stories = list(iter_requirement_stories(["1. Login", "2. Sign out", "3. Reset password", "4. Delete account"], second))
+    diff = second.finish("spec.txt")
+    store.close()
+
+    assert len(stories) == 4
+    assert (second.regenerated, second.reused) == (2, 2)
+    assert diff["changed"] == [{"old": "As a user, I want to 2. logout", "new": "As a user, I want to 2. sign out"}]
+    assert diff["added"] == ["As a user, I want to 4. delete account"]
+    assert diff["removed"] == []
+    assert diff["unchanged"] == 2
+
+def test_approval_broker_wakes_waiters_and_callbacks():
+    """Test that approvals resolve waiters and callbacks directly, with timeout and cancellation."""
+    import threading
+    from src.tools.approval_broker import ApprovalBroker
+
+    broker = ApprovalBroker()
+    broker.request("wf_1", "stories/s.json")
+    assert broker.pending() == {"wf_1": "stories/s.json"}
+    threading.Timer(0.05, broker.resolve, args=("wf_1", "approved")).start()
+    assert broker.wait("wf_1", timeout=5) == "approved"
+    assert broker.pending() == {}
+
+    decisions = []
+    broker.request("wf_2", "stories/s.json")
+    broker.on_decision("wf_2", decisions.append)
+    broker.resolve("wf_2", "rejected")
+    broker.request("wf_3", "stories/s.json")
+    broker.on_decision("wf_3", decisions.append)
+    broker.cancel("wf_3")
+    assert decisions == ["rejected", "cancelled"]
+
+    broker.request("wf_4", "stories/s.json")
+    assert broker.wait("wf_4", timeout=0.01) == "timeout"
+    assert broker.resolve("wf_4", "approved") is False
+
+def test_llm_cache_shares_normalized_completions():
+    """Test that completions are shared across agents by normalized request and evicted by size and TTL."""
+    from src.tools.llm_cache import CompletionStore, LLMCompletionCache
+
+    store = CompletionStore(os.path.join(TEST_DATA_DIR, "llm_cache.sqlite3"), ttl=3600, max_bytes=10_000)
+    ba_cache, jira_cache = LLMCompletionCache(store, "BA_Agent"), LLMCompletionCache(store, "Jira_Agent")
+    request = {"model": "gpt-4", "temperature": 0, "messages": [{"role": "user", "content": "Process req.txt"}]}
+
+    assert ba_cache.get(json.dumps({**request, "cache_seed": 41})) is None
+    ba_cache.set(json.dumps({**request, "cache_seed": 41}), {"choices": ["done"]})
+    reworded = {**request, "messages": [{"role": "user", "content": "Process req.txt  \r\n"}]}
+    assert jira_cache.get(json.dumps(reworded)) == {"choices": ["done"]}
+    indented = {**request, "messages": [{"role": "user", "content": "  Process req.txt"}]}
+    assert ba_cache.get(json.dumps(indented)) is None
+    assert jira_cache.get(json.dumps({**request, "temperature": 1})) is None
+
+    for i in range(60):
+        ba_cache.set(json.dumps({**request, "n": i, "messages": [{"role": "user", "content": str(i)}]}), "x" * 500)
+    stats = store.stats()
+    store.ttl = 1e-9
+    assert ba_cache.get(json.dumps(request)) is None
+    store.close()
+
+    assert stats["by_agent"]["Jira_Agent"] == {"hits": 1, "misses": 1}
+    assert stats["size_bytes"] <= 10_000 + 50 * 600
+    assert stats["evictions"] > 0
+
+def test_history_compaction_fits_budget_and_keeps_tool_pairs():
+    """Test that compaction elides large tool results, summarizes old turns and stays within the token budget."""
+    from src.tools.history_compaction import (HistoryCompactor, SlidingWindow, SummaryCheckpoint,
+                                              ToolResultElision, estimate_tokens)
+
+    file_contents = "Requirement line\n" * 500
+    messages = [{"role": "system", "content": "You are the BA agent."}]
+    for i in range(30):
+        messages.append({"role": "assistant", "name": "BA_Agent", "content": f"Reading file {i}",
+                         "tool_calls": [{"id": f"call_{i}", "function": {"name": "read_file"}}]})
+        messages.append({"role": "tool", "tool_call_id": f"call_{i}", "content": file_contents})
+    original = [dict(m) for m in messages]
+
+    checkpoint = SummaryCheckpoint(every=10, keep_recent=10, max_summaries=2)
+    compactor = HistoryCompactor([ToolResultElision(), checkpoint, SlidingWindow(20)],
+                                 token_budget=3000, agent_name="BA_Agent")
+    compacted = compactor.compact(messages)
+
+    assert messages == original
+    assert compacted[0]["role"] == "system"
+    assert compacted[1]["name"] == "history_summary"
+    assert "Reading file 0" in compacted[1]["content"]
+    assert compacted[-1] == messages[-1]
+    assert compacted[2]["role"] != "tool"
+    assert estimate_tokens(compacted) <= 3000
+    elided = [m for m in compacted[:-1] if "elided" in str(m.get("content"))]
+    assert elided and all(len(m["content"]) < 300 for m in elided)
+    assert compactor.turn_stats[-1]["saved"] == estimate_tokens(messages) - estimate_tokens(compacted) > 0
+    assert len(checkpoint._summaries) == 2
+
+def test_event_stream_delivers_background_events():
+    """Test that events emitted on a background run reach its channel while it runs."""
+    import threading
+    from src.tools.event_stream import (PROGRESS, STORIES, TOOL_FINISH, TOOL_START, ChannelIOStream, emit,
+                                        run_in_background)
+
+    emit(PROGRESS, stage="stories", done=1)  # no channel: ignored
+    release = threading.Event()
+
+    def step(total):
+        emit(TOOL_START, agent="BA_Agent", tool="process_requirements_wrapper")
+        for done in range(1, total + 1):
+            emit(PROGRESS, stage="stories", done=done, total=total)
+        release.wait(5)
+        emit(STORIES, stories=[{"summary": "As a user, I want to log in"}])
+        emit(TOOL_FINISH, agent="BA_Agent", tool="process_requirements_wrapper", status="done", seconds=0.1)
+        return "stories.json"
+
+    run = run_in_background(step, 3)
+    for _ in range(100):
+        if run.poll().progress.get("stories", {}).get("done") == 3:
+            break
+        threading.Event().wait(0.01)
+    assert not run.done()
+    assert run.view.tools["process_requirements_wrapper"]["status"] == "running"
+
+    ChannelIOStream(run.channel).print("Hel", end="", flush=True)
+    ChannelIOStream(run.channel).print("lo", end="", flush=True)
+    release.set()
+    assert run.result(timeout=5) == "stories.json"
+    view = run.poll()
+    assert view.text == "Hello"
+    assert view.stories == [{"summary": "As a user, I want to log in"}]
+    assert view.tools["process_requirements_wrapper"] == {"status": "done", "agent": "BA_Agent", "seconds": 0.1}
+    assert run.channel.closed
+
+def _double(value):
+    return value * 2
+
+def _explode(value):
+    raise ValueError(f"bad value {value}")
+
+def test_job_queue_runs_jobs_on_worker_pool():
+    """Test that queued jobs run on pool workers, with results, failures and cancellation persisted."""
+    from src.tools.job_queue import CANCELLED, FAILED, SUCCEEDED, JobQueue, WorkerPool
+
+    queue = JobQueue(os.path.join(TEST_DATA_DIR, "jobs.sqlite3"))
+    cancelled = queue.submit(f"{__name__}:_double", value=0)
+    assert queue.cancel(cancelled)
+
+    pool = WorkerPool(queue, workers=3, mode="thread").start()
+    try:
+        ok = [queue.submit(f"{__name__}:_double", value=i) for i in range(6)]
+        bad = queue.submit(f"{__name__}:_explode", value=7)
+        results = [queue.wait(job_id, timeout=5) for job_id in ok]
+        failed = queue.wait(bad, timeout=5)
+    finally:
+        pool.stop(timeout=5)
+
+    assert [job["status"] for job in results] == [SUCCEEDED] * 6
+    assert [job["result"] for job in results] == [0, 2, 4, 6, 8, 10]
+    assert failed["status"] == FAILED and "bad value 7" in failed["error"]
+    assert queue.get(cancelled)["status"] == CANCELLED
+    reopened = JobQueue(queue.db_path)
+    assert reopened.get(ok[0])["result"] == 0
+    assert reopened.counts() == {SUCCEEDED: 6, FAILED: 1, CANCELLED: 1}
+    queue.close()
+    reopened.close()
+
+def test_job_queue_keeps_jobs_with_their_submitting_process():
+    """Test that workers only run their own process's jobs, adopted jobs run, dead workers' jobs expire and old jobs are pruned."""
+    from src.tools import job_queue
+    from src.tools.job_queue import FAILED, QUEUED, SUCCEEDED, JobQueue, WorkerPool
+
+    path = os.path.join(TEST_DATA_DIR, "owned_jobs.sqlite3")
+    earlier = JobQueue(path, process_id="restarted-server")
+    orphan = earlier.submit(f"{__name__}:_double", value=4)
+    stuck = earlier.submit(f"{__name__}:_double", value=5)
+    # A worker of the earlier process died holding the job on its last attempt
+    with earlier._lock:
+        earlier._conn.execute("UPDATE jobs SET status = 'running', worker = 'gone', attempts = ?, lease_until = ? "
+                              "WHERE id = ?", (job_queue.MAX_ATTEMPTS, time.time() - 1, stuck))
+
+    queue = JobQueue(path)
+    pool = WorkerPool(queue, workers=2, mode="thread").start()
+    try:
+        assert queue.wait(orphan, timeout=0.5)["status"] == QUEUED
+        assert queue.events(orphan) is None
+        assert queue.adopt(orphan)
+        started = time.monotonic()
+        assert queue.wait(orphan, timeout=5)["result"] == 8
+        assert time.monotonic() - started < 2
+        own = queue.submit(f"{__name__}:_double", value=1)
+        assert queue.wait(own, timeout=5)["status"] == SUCCEEDED
+    finally:
+        pool.stop(timeout=5)
+
+    assert queue.get(orphan)["status"] == SUCCEEDED
+    assert queue.get(stuck)["status"] == FAILED
+    assert not queue.adopt(stuck)
+
+    # Finished jobs older than the retention period are deleted; recent ones are kept
+    with queue._lock:
+        queue._conn.execute("UPDATE jobs SET finished_at = ? WHERE id = ?", (time.time() - 8 * 86400, orphan))
+    assert queue.prune(retention_days=7) == 1
+    assert queue.get(orphan) is None and queue.get(own)["status"] == SUCCEEDED
+    earlier.close()
+    queue.close()
+
+def test_workflow_store_resumes_from_last_checkpoint():
+    """Test that workflow checkpoints merge phase outputs and survive reopening the store."""
+    from src.tools.workflow_store import WorkflowStore
+
+    store = WorkflowStore(os.path.join(TEST_DATA_DIR, "workflows.sqlite3"))
+    store.checkpoint("wf_1", "processing", {"uploaded_file_path": "input/req.txt", "job_id": None})
+    store.checkpoint("wf_1", "processing", {"job_id": "job_a"})
+    store.checkpoint("wf_1", "approval", {"stories_file_path": "stories/s.json", "job_id": None})
+    store.checkpoint("wf_2", "processing", {"uploaded_file_path": "input/other.txt"})
+    store.checkpoint("wf_2", "done", {"jira_success": True})
+    store.close()
+
+    reopened = WorkflowStore(store.db_path)
+    saved = reopened.load("wf_1")
+    assert saved["phase"] == "approval"
+    assert saved["state"] == {"uploaded_file_path": "input/req.txt", "job_id": None, "stories_file_path": "stories/s.json"}
+    assert [checkpoint["phase"] for checkpoint in reopened.history("wf_1")] == ["processing", "processing", "approval"]
+    assert [workflow["workflow_id"] for workflow in reopened.unfinished()] == ["wf_1"]
+    assert reopened.load("wf_missing") is None
+    reopened.close()
+
+def test_agent_pool_isolates_concurrent_workflows():
+    """Test that concurrent workflows lease distinct agents and keep separate execution contexts."""
+    import threading
+    from src.agents.agent_pool import AgentPool
+    from src.tools.execution_context import ExecutionContext, use_context, workflow_state
+
+    built = []
+
+    def create_agent():
+        agent = MagicMock()
+        built.append(agent)
+        return agent
+
+    pool = AgentPool({"ba": create_agent}, max_idle=2)
+    barrier = threading.Barrier(3)
+    leased, seen = {}, {}
+
+    def workflow(workflow_id):
+        with use_context(ExecutionContext(workflow_id)), pool.lease("ba") as agent:
+            workflow_state()["stories_file"] = f"stories_{workflow_id}.json"
+            barrier.wait(5)
+            leased[workflow_id] = agent
+            seen[workflow_id] = workflow_state()["stories_file"]
+
+    threads = [threading.Thread(target=workflow, args=(f"wf_{i}",)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert len({id(agent) for agent in leased.values()}) == 3
+    assert seen == {f"wf_{i}": f"stories_wf_{i}.json" for i in range(3)}
+    assert all(agent.reset.called for agent in built)
+    assert pool.stats() == {"ba": {"created": 3, "leased": 0, "idle": 2}}
+    with pool.lease("ba") as agent:
+        assert agent in built
+    assert pool.stats()["ba"]["created"] == 3
+
+def test_agent_pool_leases_executor_with_supervisor():
+    """Test that each leased supervisor gets its own executor, reset when the lease ends."""
+    pytest.importorskip("autogen")
+    from src.agents.agent_pool import AgentPool
+
+    pool = AgentPool({name: MagicMock for name in ("ba", "executor", "user", "jira")}, max_idle=2)
+    with pool.supervisor() as first, pool.supervisor() as second:
+        assert first.executor_agent is not second.executor_agent
+        executor = first.executor_agent
+    executor.reset.assert_called_once()
+    assert pool.stats()["executor"] == {"created": 2, "leased": 0, "idle": 2}
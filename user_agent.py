@@ -1,11 +1,13 @@
-from autogen import ConversableAgent
-from src.config.settings import LLM_CONFIG
-import streamlit as st
 import json
 import os
 from pathlib import Path
 import logging
 from typing import Dict, Any
+from functools import lru_cache
+from src.tools.file_tools import list_files, read_file
+from src.tools.event_stream import STORIES, emit
+from src.tools.execution_context import workflow_state
+from src.tools.story_io import parse_stories
 
 logger = logging.getLogger(__name__)
 
@@ -16,18 +18,19 @@ def display_stories_from_folder():
         project_root = str(Path(__file__).parent.parent.parent)
         stories_dir = os.path.join(project_root, "stories")
         
-        # Get stories file from session state
-        stories_file = st.session_state.get("stories_file")
+        # Get stories file from the workflow state
+        state = workflow_state()
+        stories_file = state.get("stories_file")
         logger.info(f"Looking for stories file: {stories_file}")
         
         if not stories_file:
             # Try to find the most recent stories file
-            story_files = [f for f in os.listdir(stories_dir) if f.startswith("stories_")]
+            story_files = [name for name in map(os.path.basename, list_files(stories_dir)) if name.startswith("stories_")]
             if story_files:
                 stories_file = sorted(story_files)[-1]  # Get the most recent file
                 logger.info(f"Found most recent stories file: {stories_file}")
-                # Update session state with the found file
-                st.session_state["stories_file"] = stories_file
+                # Update the workflow state with the found file
+                state["stories_file"] = stories_file
             else:
                 logger.warning("No stories file found. Please generate stories first.")
                 return "No stories found"
@@ -36,17 +39,18 @@ def display_stories_from_folder():
         stories_path = os.path.join(stories_dir, stories_file)
         logger.info(f"Reading stories from: {stories_path}")
         
-        if not os.path.exists(stories_path):
-            logger.warning(f"Stories file not found: {stories_path}")
-            return "Stories file not found"
-        
         # Read and display stories
         try:
-            with open(stories_path, 'r') as f:
-                stories = json.load(f)
-                st.json(stories)
-                # Don't return approval message - wait for UI button
-                return "Stories displayed in UI. Waiting for user approval via button click."
+            stories_content = read_file(stories_path)
+            if "Error reading file" in stories_content:
+                logger.warning(f"Stories file not found: {stories_path}")
+                return "Stories file not found"
+            stories = parse_stories(stories_content)
+            # This runs on a worker thread without a Streamlit script context;
+            # the app renders the stories from the event
+            emit(STORIES, stories=[story.to_dict() for story in stories])
+            # Don't return approval message - wait for UI button
+            return "Stories displayed in UI. Waiting for user approval via button click."
         except Exception as e:
             logger.error(f"Error reading stories: {str(e)}")
             return f"Error reading stories: {str(e)}"
@@ -55,11 +59,7 @@ def display_stories_from_folder():
         logger.error(f"Error displaying stories: {str(e)}")
         return f"Error displaying stories: {str(e)}"
 
-# Create the user agent
-user_agent = ConversableAgent(
-    name="User_Agent",
-    llm_config=LLM_CONFIG,
-    system_message="""You are a User Interface agent responsible for displaying stories and handling user approval.
+USER_AGENT_SYSTEM_MESSAGE = """You are a User Interface agent responsible for displaying stories and handling user approval.
 Your tasks are:
 1. Read stories from the stories folder
 2. Display stories in a user-friendly format
@@ -70,18 +70,48 @@ IMPORTANT:
 - When you receive a message containing 'Generated and saved', immediately call display_stories_from_folder
 - Do not automatically approve stories - wait for UI button click
 - Only return 'Stories approved' when st.session_state['stories_approved'] is True
-- For all other messages, process them automatically without human input""",
-    human_input_mode="NEVER",
-    max_consecutive_auto_reply=3,
-    code_execution_config=False
-)
+- For all other messages, process them automatically without human input"""
+
+def create_user_agent():
+    """Build a new User agent with display_stories_from_folder registered as its tool."""
+    # Imported here so autogen is only loaded when an agent is first needed
+    from autogen import ConversableAgent
+    from src.config.settings import LLM_CONFIG
+    from src.tools.event_stream import streaming_llm_config
+    from src.tools.history_compaction import add_history_compaction
+    from src.tools.llm_cache import get_llm_cache
+
+    user_agent = ConversableAgent(
+        name="User_Agent",
+        llm_config=streaming_llm_config(LLM_CONFIG),
+        system_message=USER_AGENT_SYSTEM_MESSAGE,
+        human_input_mode="NEVER",
+        max_consecutive_auto_reply=3,
+        code_execution_config=False
+    )
+
+    # Register the function with the agent
+    @user_agent.register_for_execution()
+    @user_agent.register_for_llm(name="display_stories_from_folder", description="Display stories from the stories folder and wait for UI approval.")
+    def handle_stories() -> str:
+        result = display_stories_from_folder()
+        # Only return approval if UI button was clicked
+        if workflow_state().get("stories_approved", False):
+            return "Stories approved"
+        return result
+
+    user_agent.client_cache = get_llm_cache(user_agent.name)
+    add_history_compaction(user_agent)
+    return user_agent
+
+@lru_cache(maxsize=None)
+def get_user_agent():
+    """Get the shared User agent, building it on first use."""
+    return create_user_agent()
 
-# Register the function with the agent
-@user_agent.register_for_execution()
-@user_agent.register_for_llm(name="display_stories_from_folder", description="Display stories from the stories folder and wait for UI approval.")
-def handle_stories() -> str:
-    result = display_stories_from_folder()
-    # Only return approval if UI button was clicked
-    if st.session_state.get("stories_approved", False):
-        return "Stories approved"
-    return result
+def __getattr__(name):
+    # Keeps `from src.agents.user_agent import user_agent` working without
+    # building the agent at import time.
+    if name == "user_agent":
+        return get_user_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,136 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Phases after which there is nothing left to resume
+FINAL_PHASES = ("done", "cancelled")
+
+
+def _default_store_path() -> str:
+    project_root = str(Path(__file__).parent.parent.parent)
+    return os.getenv("WORKFLOW_STORE_PATH", os.path.join(project_root, "data", "workflows.sqlite3"))
+
+
+class WorkflowStore:
+    """
+    Persistent workflow state, checkpointed at every phase change.
+
+    Each workflow keeps its current phase and the merged outputs of the
+    phases so far, so a refreshed page or restarted server can carry on
+    from the last completed phase. Every checkpoint is also kept as
+    history.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or _default_store_path()
+        if os.path.dirname(self.db_path):
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """CREATE TABLE IF NOT EXISTS workflows (
+                   workflow_id TEXT PRIMARY KEY,
+                   phase TEXT NOT NULL,
+                   state TEXT NOT NULL,
+                   created_at REAL NOT NULL,
+                   updated_at REAL NOT NULL
+               );
+               CREATE TABLE IF NOT EXISTS checkpoints (
+                   workflow_id TEXT NOT NULL,
+                   phase TEXT NOT NULL,
+                   outputs TEXT NOT NULL,
+                   created_at REAL NOT NULL
+               );
+               CREATE INDEX IF NOT EXISTS checkpoints_workflow ON checkpoints (workflow_id, created_at);"""
+        )
+        self._conn.commit()
+        logger.info(f"Workflow store opened at {self.db_path}")
+
+    def checkpoint(self, workflow_id: str, phase: str, outputs: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Record that a workflow reached a phase, merging in the outputs so far.
+
+        Args:
+            workflow_id (str): Workflow to checkpoint.
+            phase (str): The phase the workflow is now in.
+            outputs (Optional[Dict[str, Any]]): JSON-serializable values to
+                merge into the saved state.
+
+        Returns:
+            Dict[str, Any]: The workflow's saved state after the merge.
+        """
+        outputs = outputs or {}
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT state FROM workflows WHERE workflow_id = ?", (workflow_id,)).fetchone()
+            state = json.loads(row[0]) if row else {}
+            state.update(outputs)
+            self._conn.execute(
+                """INSERT INTO workflows (workflow_id, phase, state, created_at, updated_at) VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT(workflow_id) DO UPDATE SET phase = excluded.phase, state = excluded.state,
+                   updated_at = excluded.updated_at""",
+                (workflow_id, phase, json.dumps(state), now, now),
+            )
+            self._conn.execute("INSERT INTO checkpoints VALUES (?, ?, ?, ?)",
+                               (workflow_id, phase, json.dumps(outputs), now))
+            self._conn.commit()
+        logger.info(f"Workflow {workflow_id} checkpointed at phase {phase}")
+        return state
+
+    def load(self, workflow_id: str) -> Optional[Dict[str, Any]]:
+        """Return {"workflow_id", "phase", "state", "updated_at"} for a workflow, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT phase, state, updated_at FROM workflows WHERE workflow_id = ?", (workflow_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"workflow_id": workflow_id, "phase": row[0], "state": json.loads(row[1]), "updated_at": row[2]}
+
+    def history(self, workflow_id: str) -> List[Dict[str, Any]]:
+        """Checkpoints of a workflow, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT phase, outputs, created_at FROM checkpoints WHERE workflow_id = ? ORDER BY created_at, rowid",
+                (workflow_id,),
+            ).fetchall()
+        return [{"phase": phase, "outputs": json.loads(outputs), "created_at": created_at}
+                for phase, outputs, created_at in rows]
+
+    def unfinished(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Most recently updated workflows that have not reached a final phase."""
+        placeholders = ", ".join("?" for _ in FINAL_PHASES)
+        with self._lock:
+            rows = self._conn.execute(
+                f"""SELECT workflow_id, phase, updated_at FROM workflows WHERE phase NOT IN ({placeholders})
+                    ORDER BY updated_at DESC LIMIT ?""",
+                (*FINAL_PHASES, limit),
+            ).fetchall()
+        return [{"workflow_id": workflow_id, "phase": phase, "updated_at": updated_at}
+                for workflow_id, phase, updated_at in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_store: Optional[WorkflowStore] = None
+_store_lock = threading.Lock()
+
+
+def get_workflow_store() -> WorkflowStore:
+    """Get the process-wide workflow store, opening it on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = WorkflowStore()
+    return _store
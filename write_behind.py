@@ -0,0 +1,140 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COALESCE_DELAY = 0.05  # seconds to wait for more writes before flushing
+DEFAULT_MAX_HASHES = 1024  # most recently written paths whose content hash is remembered
+
+
+def _content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class WriteBehindBuffer:
+    """
+    Buffers file writes and flushes them to storage on a background thread.
+
+    Repeated writes to the same path are coalesced so only the latest content
+    is sent, and writes whose content matches the last successful write to
+    that path are skipped. That skip is only safe while the buffer is the
+    sole writer of the path: call forget() whenever the file is changed any
+    other way. Only the max_hashes most recently written paths are
+    remembered; older ones are simply written again. Call flush() as a
+    durability barrier.
+    """
+
+    def __init__(self, writer: Callable[[str, str], bool], coalesce_delay: float = DEFAULT_COALESCE_DELAY,
+                 max_hashes: int = DEFAULT_MAX_HASHES):
+        self._writer = writer
+        self.coalesce_delay = coalesce_delay
+        self.max_hashes = max_hashes
+        self._pending: Dict[str, str] = {}
+        self._written_hashes: "OrderedDict[str, str]" = OrderedDict()
+        self._errors: Dict[str, str] = {}
+        self._in_flight: Dict[str, str] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self.skipped = 0
+        self.coalesced = 0
+
+    def submit(self, file_path: str, content: str) -> None:
+        """Queue a write. Returns immediately."""
+        content_hash = _content_hash(content)
+        with self._cond:
+            if file_path not in self._in_flight and self._written_hashes.get(file_path) == content_hash:
+                # Storage already holds this content; drop any older pending write.
+                if self._pending.pop(file_path, None) is not None:
+                    self.coalesced += 1
+                self.skipped += 1
+                logger.debug(f"Skipping unchanged write to {file_path}")
+                self._cond.notify_all()
+                return
+            if file_path in self._pending:
+                self.coalesced += 1
+            self._pending[file_path] = content
+            self._ensure_thread()
+            self._cond.notify_all()
+
+    def pending_content(self, file_path: str) -> Optional[str]:
+        """Return content queued for a path but not yet written, if any."""
+        with self._cond:
+            if file_path in self._pending:
+                return self._pending[file_path]
+            return self._in_flight.get(file_path)
+
+    def forget(self, file_path: Optional[str] = None) -> None:
+        """
+        Stop treating a path (or every path) as holding the last content written through the buffer.
+
+        The next write to it is sent even if the content is unchanged.
+        """
+        with self._cond:
+            if file_path is None:
+                self._written_hashes.clear()
+            else:
+                self._written_hashes.pop(file_path, None)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every queued write has reached storage.
+
+        Args:
+            timeout (Optional[float]): Max seconds to wait, or None to wait indefinitely.
+
+        Returns:
+            bool: True if all writes since the previous flush succeeded,
+            False on timeout or if any write failed.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify_all()
+            while self._pending or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    logger.warning(f"Write-behind flush timed out with {len(self._pending)} writes pending")
+                    return False
+                self._cond.wait(remaining)
+            errors, self._errors = self._errors, {}
+        for file_path, error in errors.items():
+            logger.error(f"Write-behind write to {file_path} failed: {error}")
+        return not errors
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            # Give callers a moment to overwrite the same paths before sending.
+            time.sleep(self.coalesce_delay)
+            with self._cond:
+                batch, self._pending = self._pending, {}
+                self._in_flight.update(batch)
+
+            for file_path, content in batch.items():
+                try:
+                    ok = self._writer(file_path, content)
+                    error = None if ok else "writer returned False"
+                except Exception as e:
+                    error = str(e)
+                with self._cond:
+                    self._in_flight.pop(file_path, None)
+                    if error is None:
+                        self._written_hashes[file_path] = _content_hash(content)
+                        self._written_hashes.move_to_end(file_path)
+                        while len(self._written_hashes) > self.max_hashes:
+                            self._written_hashes.popitem(last=False)
+                        self._errors.pop(file_path, None)
+                    else:
+                        self._written_hashes.pop(file_path, None)
+                        self._errors[file_path] = error
+                    self._cond.notify_all()